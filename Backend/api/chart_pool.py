@@ -0,0 +1,113 @@
+"""
+Chart rendering in a pool of worker processes.
+
+Drawing a PNG is CPU-bound and holds the GIL, so a heavy chart rendered
+in a request thread stalls every other request of that server process.
+Request threads query the chart's data and hand the drawing to a small
+pool of processes that import matplotlib and seaborn, and render a
+throwaway figure, when they start.
+
+The number of renders queued or running is capped; past the cap, or when
+a render overruns its timeout, ``RenderUnavailable`` is raised and the
+view answers 503 instead of piling up work.
+"""
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds clients are asked to wait after a 503
+RETRY_AFTER = 5
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+class RenderUnavailable(Exception):
+    """The render queue is full, or a render did not finish in time."""
+
+
+def _warm_up():
+    """Worker initializer: set up Django and load matplotlib, seaborn and the font cache."""
+    django.setup()
+    import seaborn  # noqa: F401
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(1, 1))
+    fig.subplots().set_title('warm-up')
+    fig.savefig(io.BytesIO(), format='png')
+
+
+def _render(chart_type, data, dark_mode, image_format):
+    # Imported here: workers load this module before Django is set up
+    from .charts import render_chart
+    return render_chart(chart_type, data, dark_mode, image_format)
+
+
+def get_render_pool():
+    """Return the shared pool of render processes, starting it on first use."""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the server process is multi-threaded
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.CHART_RENDER_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_warm_up
+            )
+            _slots = threading.BoundedSemaphore(settings.CHART_RENDER_QUEUE_DEPTH)
+            # Spawned workers start on demand; start them all now so the
+            # first requests do not wait for interpreters to warm up
+            for _ in range(settings.CHART_RENDER_PROCESSES):
+                _pool.submit(int)
+    return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render(chart_type, data, dark_mode=False, image_format='png'):
+    """
+    Render a chart to PNG or SVG bytes in the pool, or in this thread when
+    ``CHART_RENDER_PROCESSES`` is 0. Raises ``RenderUnavailable`` when
+    ``CHART_RENDER_QUEUE_DEPTH`` renders are already queued or running, or
+    when this one takes longer than ``CHART_RENDER_TIMEOUT`` seconds.
+    """
+    if settings.CHART_RENDER_PROCESSES <= 0:
+        return _render(chart_type, data, dark_mode, image_format)
+
+    pool = get_render_pool()
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise RenderUnavailable('Chart render queue is full')
+    try:
+        future = pool.submit(_render, chart_type, data, dark_mode, image_format)
+    except BrokenProcessPool:
+        slots.release()
+        _discard_pool(pool)
+        raise RenderUnavailable('Chart render processes are restarting')
+    # The slot stays taken until the render ends, even if its caller gave up
+    future.add_done_callback(lambda _: slots.release())
+
+    try:
+        return future.result(timeout=settings.CHART_RENDER_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise RenderUnavailable('Chart render timed out')
+    except BrokenProcessPool:
+        logger.exception("Chart render process died, restarting the pool")
+        _discard_pool(pool)
+        raise RenderUnavailable('Chart render processes are restarting')
@@ -1,59 +1,147 @@
 """
 Chart generation utilities using matplotlib.
+
+Charts are built in two steps: a ``*_data`` function queries the database
+into plain lists, and a ``draw_*`` function turns those into a
+``matplotlib.figure.Figure``. Drawing goes through the object-oriented
+API only and colours each figure from its own theme, never touching
+pyplot or the global style, so charts can render concurrently in threads.
+
+Rendered charts are cached on disk, keyed by the chart, its filters and a
+fingerprint of the data it draws, so an unchanged chart is rendered once.
 """
 import os
 import io
 import base64
-from datetime import datetime, timedelta
+import hashlib
+import threading
+from datetime import timedelta
 import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-import pandas as pd
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models
-from equipment.models import Equipment, EquipmentReading, PlantLocation
+from django.utils import timezone
+from matplotlib.colors import same_color
+from matplotlib.figure import Figure
+from matplotlib.legend import Legend
+from matplotlib.text import Text
+from equipment.models import (
+    Equipment, EquipmentReading, EquipmentStatusRollup, EquipmentType, PlantLocation
+)
+from equipment.stats_cache import increment_counter
+
+
+# Salt for SVG element ids, which are otherwise random on every save
+SVG_HASH_SALT = 'chemdata-charts'
+
+_svg_lock = threading.Lock()
+
+# Per-figure colours, matching matplotlib's 'default' and
+# 'dark_background' styles
+THEMES = {
+    'light': {'background': 'white', 'foreground': 'black', 'grid': '#b0b0b0'},
+    'dark': {'background': 'black', 'foreground': 'white', 'grid': 'white'},
+}
+
+# Colour matplotlib gives text that a chart does not colour itself
+DEFAULT_TEXT_COLOR = 'black'
+
+
+def get_theme(dark_mode=False):
+    return THEMES['dark' if dark_mode else 'light']
+
+
+def style_axes(ax, theme):
+    """Colour an axes' background, spines, ticks and grid from ``theme``."""
+    ax.set_facecolor(theme['background'])
+    for spine in ax.spines.values():
+        spine.set_edgecolor(theme['foreground'])
+    ax.tick_params(
+        which='both', color=theme['foreground'],
+        labelcolor=theme['foreground'], grid_color=theme['grid']
+    )
 
 
-# Set style
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (12, 6)
-plt.rcParams['font.size'] = 10
+def new_figure(theme, figsize, nrows=1, ncols=1):
+    """A themed figure and its axes, detached from pyplot."""
+    fig = Figure(figsize=figsize, facecolor=theme['background'])
+    axes = fig.subplots(nrows, ncols)
+    for ax in fig.axes:
+        style_axes(ax, theme)
+    return fig, axes
+
+
+def finish_figure(fig, theme):
+    """Give text and legends the chart left uncoloured the theme's colours, then lay out."""
+    for text in fig.findobj(Text):
+        if same_color(text.get_color(), DEFAULT_TEXT_COLOR):
+            text.set_color(theme['foreground'])
+    for legend in fig.findobj(Legend):
+        legend.get_frame().set_facecolor(theme['background'])
+    fig.tight_layout()
+    return fig
+
+
+# Image formats charts render to, with their content types
+IMAGE_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def save_figure(fig, image_format='png'):
+    """Render a figure to PNG or SVG bytes."""
+    buffer = io.BytesIO()
+    if image_format != 'svg':
+        fig.savefig(buffer, format=image_format, dpi=100, bbox_inches='tight')
+        return buffer.getvalue()
+
+    # No creation date and fixed element ids, so the same chart always
+    # renders the same bytes. The salt can only be set through rcParams:
+    # set it just for this save, one SVG at a time so each restores the
+    # value it found
+    with _svg_lock, matplotlib.rc_context({'svg.hashsalt': SVG_HASH_SALT}):
+        fig.savefig(buffer, format='svg', dpi=100, bbox_inches='tight', metadata={'Date': None})
+    return buffer.getvalue()
+
+
+def png_to_data_uri(image):
+    return f"data:image/png;base64,{base64.b64encode(image).decode()}"
 
 
 def save_figure_to_base64(fig):
     """Convert matplotlib figure to base64 string."""
-    buffer = io.BytesIO()
-    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.read()).decode()
-    buffer.close()
-    plt.close(fig)
-    return f"data:image/png;base64,{image_base64}"
+    return png_to_data_uri(save_figure(fig))
 
 
-def generate_flowrate_comparison_chart(equipment_queryset=None, dark_mode=False):
-    """Generate flowrate comparison bar chart."""
+def _columns(rows, *names):
+    """Parallel lists, one per name, from ``values_list`` rows."""
+    columns = list(zip(*rows)) or [()] * len(names)
+    return {name: list(column) for name, column in zip(names, columns)}
+
+
+def _label_bars(ax, bars, fmt, **kwargs):
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+                fmt(height),
+                ha='center', va='bottom', **kwargs)
+
+
+# Flowrate comparison
+
+def flowrate_comparison_data(equipment_queryset=None):
     if equipment_queryset is None:
         equipment_queryset = Equipment.objects.filter(is_active=True)
     
-    # Prepare data
-    names = [eq.name for eq in equipment_queryset[:15]]  # Limit to 15 for readability
-    flowrates = [eq.flowrate for eq in equipment_queryset[:15]]
-    
-    # Set colors based on theme
-    if dark_mode:
-        plt.style.use('dark_background')
-        bar_color = '#3b82f6'
-    else:
-        plt.style.use('default')
-        bar_color = '#3b82f6'
-    
-    # Create figure
-    fig, ax = plt.subplots(figsize=(14, 6))
+    # Limit to 15 for readability
+    return _columns(equipment_queryset.values_list('name', 'flowrate')[:15], 'names', 'flowrates')
+
+
+def draw_flowrate_comparison(data, theme):
+    """Flowrate comparison bar chart."""
+    names, flowrates = data['names'], data['flowrates']
+    fig, ax = new_figure(theme, (14, 6))
     
-    bars = ax.bar(range(len(names)), flowrates, color=bar_color, alpha=0.8)
+    bars = ax.bar(range(len(names)), flowrates, color='#3b82f6', alpha=0.8)
     
     ax.set_xlabel('Equipment', fontsize=12, fontweight='bold')
     ax.set_ylabel('Flowrate (L/min)', fontsize=12, fontweight='bold')
@@ -62,38 +150,32 @@ def generate_flowrate_comparison_chart(equipment_queryset=None, dark_mode=False)
     ax.set_xticklabels(names, rotation=45, ha='right')
     
     # Add value labels on bars
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width()/2., height,
-                f'{height:.1f}',
-                ha='center', va='bottom', fontsize=9)
+    _label_bars(ax, bars, lambda height: f'{height:.1f}', fontsize=9)
     
-    plt.tight_layout()
-    return save_figure_to_base64(fig)
+    return finish_figure(fig, theme)
 
 
-def generate_temperature_pressure_trends(equipment_queryset=None, dark_mode=False):
-    """Generate temperature and pressure trend line chart."""
+# Temperature and pressure trends
+
+def temperature_pressure_trends_data(equipment_queryset=None):
     if equipment_queryset is None:
         equipment_queryset = Equipment.objects.filter(is_active=True)
     
-    # Prepare data
-    names = [eq.name for eq in equipment_queryset[:15]]
-    temperatures = [eq.temperature for eq in equipment_queryset[:15]]
-    pressures = [eq.pressure for eq in equipment_queryset[:15]]
-    
-    if dark_mode:
-        plt.style.use('dark_background')
-    else:
-        plt.style.use('default')
-    
-    # Create figure
-    fig, ax1 = plt.subplots(figsize=(14, 6))
+    return _columns(
+        equipment_queryset.values_list('name', 'temperature', 'pressure')[:15],
+        'names', 'temperatures', 'pressures'
+    )
+
+
+def draw_temperature_pressure_trends(data, theme):
+    """Temperature and pressure trend line chart."""
+    names = data['names']
+    fig, ax1 = new_figure(theme, (14, 6))
     
     x = range(len(names))
     
     # Temperature line
-    ax1.plot(x, temperatures, color='#ef4444', marker='o', linewidth=2, 
+    ax1.plot(x, data['temperatures'], color='#ef4444', marker='o', linewidth=2,
              markersize=6, label='Temperature (°C)')
     ax1.set_xlabel('Equipment', fontsize=12, fontweight='bold')
     ax1.set_ylabel('Temperature (°C)', fontsize=12, fontweight='bold', color='#ef4444')
@@ -103,45 +185,42 @@ def generate_temperature_pressure_trends(equipment_queryset=None, dark_mode=Fals
     
     # Pressure line on secondary axis
     ax2 = ax1.twinx()
-    ax2.plot(x, pressures, color='#10b981', marker='s', linewidth=2, 
+    style_axes(ax2, theme)
+    ax2.plot(x, data['pressures'], color='#10b981', marker='s', linewidth=2,
              markersize=6, label='Pressure (bar)')
     ax2.set_ylabel('Pressure (bar)', fontsize=12, fontweight='bold', color='#10b981')
     ax2.tick_params(axis='y', labelcolor='#10b981')
     
-    plt.title('Temperature & Pressure Trends', fontsize=14, fontweight='bold', pad=20)
+    ax2.set_title('Temperature & Pressure Trends', fontsize=14, fontweight='bold', pad=20)
     
     # Combined legend
     lines1, labels1 = ax1.get_legend_handles_labels()
     lines2, labels2 = ax2.get_legend_handles_labels()
     ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
     
-    plt.tight_layout()
-    return save_figure_to_base64(fig)
+    return finish_figure(fig, theme)
 
 
-def generate_equipment_type_distribution(dark_mode=False):
-    """Generate equipment type distribution pie chart."""
-    equipment_types = Equipment.objects.filter(is_active=True).values(
+# Equipment type distribution
+
+def equipment_type_distribution_data():
+    equipment_types = EquipmentStatusRollup.objects.filter(is_active=True).values(
         'equipment_type__name'
-    ).annotate(count=models.Count('id'))
-    
-    if not equipment_types:
-        return None
-    
-    names = [item['equipment_type__name'] for item in equipment_types]
-    counts = [item['count'] for item in equipment_types]
-    
-    if dark_mode:
-        plt.style.use('dark_background')
-    else:
-        plt.style.use('default')
+    ).annotate(count=models.Sum('equipment_count')).order_by('equipment_type__name')
     
+    data = _columns(equipment_types.values_list('equipment_type__name', 'count'), 'names', 'counts')
+    return data if data['names'] else None
+
+
+def draw_equipment_type_distribution(data, theme):
+    """Equipment type distribution pie chart."""
+    names = data['names']
     colors = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6', '#ec4899']
     
-    fig, ax = plt.subplots(figsize=(10, 8))
+    fig, ax = new_figure(theme, (10, 8))
     
     wedges, texts, autotexts = ax.pie(
-        counts, labels=names, autopct='%1.1f%%',
+        data['counts'], labels=names, autopct='%1.1f%%',
         colors=colors[:len(names)], startangle=90,
         textprops={'fontsize': 11}
     )
@@ -152,31 +231,28 @@ def generate_equipment_type_distribution(dark_mode=False):
         autotext.set_fontweight('bold')
     
     ax.set_title('Equipment Type Distribution', fontsize=14, fontweight='bold', pad=20)
-    plt.tight_layout()
-    
-    return save_figure_to_base64(fig)
+    return finish_figure(fig, theme)
 
 
-def generate_pressure_temperature_scatter(equipment_queryset=None, dark_mode=False):
-    """Generate pressure vs temperature scatter plot."""
+# Pressure vs temperature scatter
+
+def pressure_temperature_scatter_data(equipment_queryset=None):
     if equipment_queryset is None:
         equipment_queryset = Equipment.objects.filter(is_active=True)
     
-    pressures = [eq.pressure for eq in equipment_queryset]
-    temperatures = [eq.temperature for eq in equipment_queryset]
-    names = [eq.name for eq in equipment_queryset]
-    
-    if dark_mode:
-        plt.style.use('dark_background')
-        scatter_color = '#8b5cf6'
-    else:
-        plt.style.use('default')
-        scatter_color = '#8b5cf6'
-    
-    fig, ax = plt.subplots(figsize=(12, 8))
+    return _columns(
+        equipment_queryset.values_list('name', 'pressure', 'temperature'),
+        'names', 'pressures', 'temperatures'
+    )
+
+
+def draw_pressure_temperature_scatter(data, theme):
+    """Pressure vs temperature scatter plot."""
+    pressures, temperatures = data['pressures'], data['temperatures']
+    fig, ax = new_figure(theme, (12, 8))
     
-    scatter = ax.scatter(pressures, temperatures, c=scatter_color, 
-                        s=100, alpha=0.6, edgecolors='white', linewidth=1.5)
+    ax.scatter(pressures, temperatures, c='#8b5cf6',
+               s=100, alpha=0.6, edgecolors='white', linewidth=1.5)
     
     ax.set_xlabel('Pressure (bar)', fontsize=12, fontweight='bold')
     ax.set_ylabel('Temperature (°C)', fontsize=12, fontweight='bold')
@@ -190,139 +266,339 @@ def generate_pressure_temperature_scatter(equipment_queryset=None, dark_mode=Fal
         ax.plot(pressures, p(pressures), "r--", alpha=0.8, linewidth=2, label='Trend')
         ax.legend()
     
-    plt.tight_layout()
-    return save_figure_to_base64(fig)
+    return finish_figure(fig, theme)
 
 
-def generate_historical_trends(equipment_id, days=7, dark_mode=False):
-    """Generate historical trends for a specific equipment."""
-    from django.utils import timezone
-    from django.db.models import Count
-    
-    equipment = Equipment.objects.get(id=equipment_id)
+# Historical trends of one equipment
+
+def historical_trends_data(equipment_id, days=7):
+    name = Equipment.objects.values_list('name', flat=True).get(id=equipment_id)
     start_date = timezone.now() - timedelta(days=days)
     
     readings = EquipmentReading.objects.filter(
-        equipment=equipment,
+        equipment_id=equipment_id,
         timestamp__gte=start_date
-    ).order_by('timestamp')
+    ).order_by('timestamp').values_list('timestamp', 'flowrate', 'pressure', 'temperature')
     
-    if not readings.exists():
+    data = _columns(readings, 'timestamps', 'flowrates', 'pressures', 'temperatures')
+    if not data['timestamps']:
         return None
-    
-    timestamps = [r.timestamp for r in readings]
-    flowrates = [r.flowrate for r in readings]
-    pressures = [r.pressure for r in readings]
-    temperatures = [r.temperature for r in readings]
-    
-    if dark_mode:
-        plt.style.use('dark_background')
-    else:
-        plt.style.use('default')
-    
-    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(14, 10))
+    return {'name': name, **data}
+
+
+def draw_historical_trends(data, theme):
+    """Flowrate, pressure and temperature of one equipment over time."""
+    timestamps = data['timestamps']
+    fig, (ax1, ax2, ax3) = new_figure(theme, (14, 10), nrows=3)
     
     # Flowrate
-    ax1.plot(timestamps, flowrates, color='#3b82f6', linewidth=2)
+    ax1.plot(timestamps, data['flowrates'], color='#3b82f6', linewidth=2)
     ax1.set_ylabel('Flowrate (L/min)', fontsize=11, fontweight='bold')
-    ax1.set_title(f'Historical Trends - {equipment.name}', fontsize=14, fontweight='bold')
+    ax1.set_title(f"Historical Trends - {data['name']}", fontsize=14, fontweight='bold')
     ax1.grid(True, alpha=0.3)
     
     # Pressure
-    ax2.plot(timestamps, pressures, color='#10b981', linewidth=2)
+    ax2.plot(timestamps, data['pressures'], color='#10b981', linewidth=2)
     ax2.set_ylabel('Pressure (bar)', fontsize=11, fontweight='bold')
     ax2.grid(True, alpha=0.3)
     
     # Temperature
-    ax3.plot(timestamps, temperatures, color='#ef4444', linewidth=2)
+    ax3.plot(timestamps, data['temperatures'], color='#ef4444', linewidth=2)
     ax3.set_ylabel('Temperature (°C)', fontsize=11, fontweight='bold')
     ax3.set_xlabel('Time', fontsize=11, fontweight='bold')
     ax3.grid(True, alpha=0.3)
     
-    plt.tight_layout()
-    return save_figure_to_base64(fig)
+    return finish_figure(fig, theme)
 
 
-def generate_status_distribution(dark_mode=False):
-    """Generate equipment status distribution chart."""
-    from django.db.models import Count
-    
-    status_data = Equipment.objects.values('status').annotate(
-        count=Count('id')
+# Status distribution
+
+STATUS_COLORS = {
+    'Normal': '#10b981',
+    'Warning': '#f59e0b',
+    'Critical': '#ef4444',
+    'Offline': '#6b7280'
+}
+
+
+def status_distribution_data():
+    status_data = EquipmentStatusRollup.objects.values('status').annotate(
+        count=models.Sum('equipment_count')
     ).order_by('status')
     
-    if not status_data:
+    data = _columns(status_data.values_list('status', 'count'), 'statuses', 'counts')
+    if not data['statuses']:
         return None
+    data['statuses'] = [status.title() for status in data['statuses']]
+    return data
+
+
+def draw_status_distribution(data, theme):
+    """Equipment status distribution bar chart."""
+    statuses = data['statuses']
+    bar_colors = [STATUS_COLORS.get(s, '#3b82f6') for s in statuses]
     
-    statuses = [item['status'].title() for item in status_data]
-    counts = [item['count'] for item in status_data]
-    
-    if dark_mode:
-        plt.style.use('dark_background')
-    else:
-        plt.style.use('default')
-    
-    colors = {
-        'Normal': '#10b981',
-        'Warning': '#f59e0b',
-        'Critical': '#ef4444',
-        'Offline': '#6b7280'
-    }
-    bar_colors = [colors.get(s, '#3b82f6') for s in statuses]
-    
-    fig, ax = plt.subplots(figsize=(10, 6))
+    fig, ax = new_figure(theme, (10, 6))
     
-    bars = ax.bar(statuses, counts, color=bar_colors, alpha=0.8)
+    bars = ax.bar(statuses, data['counts'], color=bar_colors, alpha=0.8)
     
     ax.set_xlabel('Status', fontsize=12, fontweight='bold')
     ax.set_ylabel('Count', fontsize=12, fontweight='bold')
     ax.set_title('Equipment Status Distribution', fontsize=14, fontweight='bold', pad=20)
     
     # Add value labels
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width()/2., height,
-                f'{int(height)}',
-                ha='center', va='bottom', fontsize=11, fontweight='bold')
+    _label_bars(ax, bars, lambda height: f'{int(height)}', fontsize=11, fontweight='bold')
     
-    plt.tight_layout()
-    return save_figure_to_base64(fig)
+    return finish_figure(fig, theme)
 
 
-def generate_plant_location_comparison(dark_mode=False):
-    """Generate comparison chart across plant locations."""
-    from django.db.models import Count, Avg
-    
-    location_stats = PlantLocation.objects.annotate(
-        equipment_count=Count('equipment', filter=models.Q(equipment__is_active=True)),
-        avg_temperature=Avg('equipment__temperature', filter=models.Q(equipment__is_active=True)),
-        avg_pressure=Avg('equipment__pressure', filter=models.Q(equipment__is_active=True))
-    ).filter(equipment_count__gt=0)
-    
-    if not location_stats:
-        return None
-    
-    locations = [loc.name for loc in location_stats]
-    counts = [loc.equipment_count for loc in location_stats]
-    
-    if dark_mode:
-        plt.style.use('dark_background')
-    else:
-        plt.style.use('default')
-    
-    fig, ax = plt.subplots(figsize=(12, 6))
+# Plant location comparison
+
+def plant_location_comparison_data():
+    location_stats = EquipmentStatusRollup.objects.filter(is_active=True).values(
+        'plant_location__name'
+    ).annotate(
+        equipment_count=models.Sum('equipment_count')
+    ).filter(equipment_count__gt=0).order_by('plant_location__name')
+    
+    data = _columns(
+        location_stats.values_list('plant_location__name', 'equipment_count'), 'locations', 'counts'
+    )
+    return data if data['locations'] else None
+
+
+def draw_plant_location_comparison(data, theme):
+    """Equipment count per plant location bar chart."""
+    fig, ax = new_figure(theme, (12, 6))
     
-    bars = ax.bar(locations, counts, color='#3b82f6', alpha=0.8)
+    bars = ax.bar(data['locations'], data['counts'], color='#3b82f6', alpha=0.8)
     
     ax.set_xlabel('Plant Location', fontsize=12, fontweight='bold')
     ax.set_ylabel('Equipment Count', fontsize=12, fontweight='bold')
     ax.set_title('Equipment Distribution by Plant Location', fontsize=14, fontweight='bold', pad=20)
     
-    for bar in bars:
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width()/2., height,
-                f'{int(height)}',
-                ha='center', va='bottom', fontsize=11, fontweight='bold')
+    _label_bars(ax, bars, lambda height: f'{int(height)}', fontsize=11, fontweight='bold')
     
-    plt.tight_layout()
-    return save_figure_to_base64(fig)
+    return finish_figure(fig, theme)
+
+
+# Dispatch by chart type
+
+DRAWERS = {
+    'flowrate_comparison': draw_flowrate_comparison,
+    'temperature_pressure_trends': draw_temperature_pressure_trends,
+    'equipment_type_distribution': draw_equipment_type_distribution,
+    'pressure_temperature_scatter': draw_pressure_temperature_scatter,
+    'status_distribution': draw_status_distribution,
+    'plant_location_comparison': draw_plant_location_comparison,
+    'historical_trends': draw_historical_trends,
+}
+
+CHART_TYPES = list(DRAWERS)
+
+
+def chart_data(chart_type, queryset=None, equipment_id=None, days=7):
+    """
+    Query the data behind a chart as plain lists, or None when there is
+    nothing to draw.
+    """
+    if chart_type == 'flowrate_comparison':
+        return flowrate_comparison_data(queryset)
+    elif chart_type == 'temperature_pressure_trends':
+        return temperature_pressure_trends_data(queryset)
+    elif chart_type == 'equipment_type_distribution':
+        return equipment_type_distribution_data()
+    elif chart_type == 'pressure_temperature_scatter':
+        return pressure_temperature_scatter_data(queryset)
+    elif chart_type == 'status_distribution':
+        return status_distribution_data()
+    elif chart_type == 'plant_location_comparison':
+        return plant_location_comparison_data()
+    elif chart_type == 'historical_trends':
+        return historical_trends_data(equipment_id, days) if equipment_id else None
+    raise ValueError(f'Unknown chart type: {chart_type}')
+
+
+def render_chart(chart_type, data, dark_mode=False, image_format='png'):
+    """Draw ``data`` as ``chart_type`` and return the image bytes. Safe to call from any thread."""
+    return save_figure(DRAWERS[chart_type](data, get_theme(dark_mode)), image_format)
+
+
+def generate_chart(chart_type, dark_mode=False, **params):
+    """Query and render a chart as a base64 data URI, or None when there is nothing to draw."""
+    data = chart_data(chart_type, **params)
+    if data is None:
+        return None
+    return png_to_data_uri(render_chart(chart_type, data, dark_mode))
+
+
+def generate_flowrate_comparison_chart(equipment_queryset=None, dark_mode=False):
+    """Generate flowrate comparison bar chart."""
+    return generate_chart('flowrate_comparison', dark_mode, queryset=equipment_queryset)
+
+
+def generate_temperature_pressure_trends(equipment_queryset=None, dark_mode=False):
+    """Generate temperature and pressure trend line chart."""
+    return generate_chart('temperature_pressure_trends', dark_mode, queryset=equipment_queryset)
+
+
+def generate_equipment_type_distribution(dark_mode=False):
+    """Generate equipment type distribution pie chart."""
+    return generate_chart('equipment_type_distribution', dark_mode)
+
+
+def generate_pressure_temperature_scatter(equipment_queryset=None, dark_mode=False):
+    """Generate pressure vs temperature scatter plot."""
+    return generate_chart('pressure_temperature_scatter', dark_mode, queryset=equipment_queryset)
+
+
+def generate_historical_trends(equipment_id, days=7, dark_mode=False):
+    """Generate historical trends for a specific equipment."""
+    return generate_chart('historical_trends', dark_mode, equipment_id=equipment_id, days=days)
+
+
+def generate_status_distribution(dark_mode=False):
+    """Generate equipment status distribution chart."""
+    return generate_chart('status_distribution', dark_mode)
+
+
+def generate_plant_location_comparison(dark_mode=False):
+    """Generate comparison chart across plant locations."""
+    return generate_chart('plant_location_comparison', dark_mode)
+
+
+# Chart cache
+
+# Bump when the rendering code changes so cached charts are not reused
+CHART_CACHE_VERSION = 2
+
+CHART_CACHE_DIR = os.path.join(settings.CHART_OUTPUT_DIR, 'cache')
+
+CHART_HITS_KEY = 'charts:hits'
+
+CHART_MISSES_KEY = 'charts:misses'
+
+CHART_EVICTIONS_KEY = 'charts:evictions'
+
+
+def _latest(queryset, field='updated_at'):
+    """Row count and newest ``field`` of ``queryset``: changes whenever its rows do."""
+    totals = queryset.order_by().aggregate(count=models.Count('pk'), latest=models.Max(field))
+    return f"{totals['count']}@{totals['latest']}"
+
+
+def chart_fingerprint(chart_type, queryset, equipment_id=None, days=7):
+    """
+    A cheap fingerprint of the data behind a chart, from the row counts and
+    last update times of the tables it is drawn from.
+    """
+    if chart_type == 'historical_trends':
+        start_date = timezone.now() - timedelta(days=days)
+        sources = [
+            _latest(Equipment.objects.filter(pk=equipment_id)),
+            _latest(EquipmentReading.objects.filter(
+                equipment_id=equipment_id, timestamp__gte=start_date
+            ), 'timestamp'),
+        ]
+    elif chart_type in ('status_distribution', 'equipment_type_distribution', 'plant_location_comparison'):
+        sources = [_latest(EquipmentStatusRollup.objects.all())]
+        if chart_type == 'equipment_type_distribution':
+            sources.append(_latest(EquipmentType.objects.all()))
+        elif chart_type == 'plant_location_comparison':
+            sources.append(_latest(PlantLocation.objects.all()))
+    else:
+        sources = [_latest(queryset)]
+    return '|'.join(sources)
+
+
+def chart_cache_key(chart_type, fingerprint, dark_mode=False, **filters):
+    """Cache key of a chart: its type, filters, theme and data fingerprint."""
+    params = ':'.join(f'{name}={filters[name]}' for name in sorted(filters))
+    raw = f'v{CHART_CACHE_VERSION}:{chart_type}:{params}:dark={dark_mode}:{fingerprint}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cache_entries():
+    """Cached chart files as ``(mtime, size, path)``, least recently used first."""
+    entries = []
+    try:
+        with os.scandir(CHART_CACHE_DIR) as scan:
+            for entry in scan:
+                if not entry.name.endswith(tuple(f'.{ext}' for ext in IMAGE_FORMATS)):
+                    continue
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, entry.path))
+    except FileNotFoundError:
+        pass
+    return sorted(entries)
+
+
+def _evict(max_bytes):
+    """Delete the least recently used charts until the cache fits ``max_bytes``."""
+    entries = _cache_entries()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            increment_counter(CHART_EVICTIONS_KEY)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cached_chart(key, render, image_format='png'):
+    """
+    Return ``(image, hit)`` for ``key``, calling ``render()`` for the image
+    bytes on a miss.
+
+    Charts are stored as image files named after their key. A hit refreshes
+    the file's modification time, which orders eviction. ``None`` (nothing
+    to draw) is never cached.
+    """
+    path = os.path.join(CHART_CACHE_DIR, f'{key}.{image_format}')
+    try:
+        with open(path, 'rb') as f:
+            image = f.read()
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    else:
+        increment_counter(CHART_HITS_KEY)
+        return image, True
+
+    increment_counter(CHART_MISSES_KEY)
+    image = render()
+    if image is None:
+        return None, False
+
+    # Write under a temporary name and rename, so readers in other
+    # processes never see a partial file
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(image)
+    os.replace(temporary, path)
+    _evict(settings.CHART_CACHE_MAX_BYTES)
+    return image, False
+
+
+def chart_cache_counters():
+    """Hit, miss and eviction counts, and the size of the chart cache on disk."""
+    hits = cache.get(CHART_HITS_KEY, 0)
+    misses = cache.get(CHART_MISSES_KEY, 0)
+    lookups = hits + misses
+    entries = _cache_entries()
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        'evictions': cache.get(CHART_EVICTIONS_KEY, 0),
+        'entries': len(entries),
+        'bytes': sum(size for _, size, _ in entries),
+        'max_bytes': settings.CHART_CACHE_MAX_BYTES,
+    }
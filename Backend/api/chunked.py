@@ -0,0 +1,180 @@
+"""
+Resumable chunked uploads.
+
+A session is opened with the file name and size, the client PUTs raw byte
+ranges at the offset the server last confirmed, and finalizing moves the
+assembled file into upload storage and queues it like a regular upload.
+Chunks are copied from the request stream straight to disk.
+"""
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from equipment.models import UploadHistory, UploadSession
+from .tasks import enqueue_upload
+from .uploadhandlers import hash_file, find_duplicate_upload
+
+
+# Suggested chunk size handed to clients
+CHUNK_SIZE = 5 * 1024 * 1024
+
+# Bytes copied from the request stream per read
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class OffsetMismatch(Exception):
+    """Chunk does not start at the session's confirmed offset."""
+
+
+class AlreadyFinalized(Exception):
+    """Another request finalized the session first; carries its upload."""
+
+    def __init__(self, upload):
+        super().__init__(upload)
+        self.upload = upload
+
+
+def part_path(session):
+    return os.path.join(settings.UPLOAD_SESSION_DIR, f'{session.pk}.part')
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _store(path, file_name):
+    """
+    Move an assembled part file into upload storage; returns the stored name.
+    Runs in a transaction; ``_unstore`` puts the part file back if it fails.
+    """
+    field = UploadHistory._meta.get_field('file_path')
+    name = default_storage.get_available_name(field.generate_filename(None, file_name))
+
+    if isinstance(default_storage, FileSystemStorage):
+        target = default_storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        file_move_safe(path, target)
+        return name
+
+    with open(path, 'rb') as f:
+        name = default_storage.save(name, File(f))
+    transaction.on_commit(lambda: _remove(path))
+    return name
+
+
+def _unstore(name, path):
+    """Undo ``_store`` after its transaction failed, so the session can be finalized again."""
+    if isinstance(default_storage, FileSystemStorage):
+        file_move_safe(default_storage.path(name), path)
+    else:
+        default_storage.delete(name)
+
+
+def write_chunk(session, stream, offset, length):
+    """
+    Append ``length`` bytes from ``stream`` at ``offset``; returns the new offset.
+
+    Raises OffsetMismatch unless ``offset`` is the confirmed offset, which is
+    what lets an interrupted client resume by asking for the session status.
+    """
+    if offset != session.received_bytes:
+        raise OffsetMismatch(session.received_bytes)
+    if offset + length > session.file_size:
+        raise ValueError('Chunk extends past the declared file size')
+
+    path = part_path(session)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                raise ValueError('Request body ended before the declared chunk length')
+            f.write(data)
+            remaining -= len(data)
+        # Drop bytes of an earlier attempt that was never confirmed
+        f.truncate()
+
+    # Only confirm if no concurrent request moved the offset meanwhile
+    if not UploadSession.objects.filter(
+        pk=session.pk, received_bytes=offset
+    ).update(received_bytes=offset + length):
+        session.refresh_from_db()
+        raise OffsetMismatch(session.received_bytes)
+
+    session.received_bytes = offset + length
+    return session.received_bytes
+
+
+def finalize_session(session, force=False):
+    """
+    Turn a complete session into an ``UploadHistory`` and queue it.
+
+    Returns ``(upload, duplicate)``; identical content that was uploaded
+    before short-circuits to the earlier upload unless ``force`` is set.
+    Raises AlreadyFinalized if a concurrent request finalized it first.
+    """
+    if session.received_bytes != session.file_size:
+        raise ValueError(
+            f'Upload incomplete: {session.received_bytes} of {session.file_size} bytes received'
+        )
+
+    # The part file is complete and no longer written, so it is hashed
+    # before the session is claimed
+    path = part_path(session)
+    try:
+        with open(path, 'rb') as f:
+            content_hash = hash_file(File(f))
+    except FileNotFoundError:
+        # Moved away by a concurrent finalize; the claim below will fail
+        content_hash = None
+
+    # A finalize that fails leaves the session and its part file as they were
+    stored_name = None
+    try:
+        with transaction.atomic():
+            # Claim the session with a conditional UPDATE: a concurrent finalize
+            # waits on it until this transaction commits, then matches no row
+            if not UploadSession.objects.filter(
+                pk=session.pk, upload__isnull=True
+            ).update(updated_at=timezone.now()):
+                session.refresh_from_db()
+                raise AlreadyFinalized(session.upload)
+            if content_hash is None:
+                raise ValueError('Upload data is missing; start a new upload')
+
+            if not force:
+                previous = find_duplicate_upload(content_hash)
+                if previous is not None:
+                    session.upload = previous
+                    session.save(update_fields=['upload', 'updated_at'])
+                    transaction.on_commit(lambda: _remove(path))
+                    return previous, True
+
+            stored_name = _store(path, session.file_name)
+            upload = UploadHistory.objects.create(
+                file_name=session.file_name,
+                file_path=stored_name,
+                file_size=session.file_size,
+                content_hash=content_hash,
+                sheets=session.sheets,
+                status='pending',
+                uploaded_by=session.uploaded_by
+            )
+            session.upload = upload
+            session.save(update_fields=['upload', 'updated_at'])
+            enqueue_upload(upload.id)
+    except Exception:
+        if stored_name is not None:
+            _unstore(stored_name, path)
+        raise
+
+    return upload, False
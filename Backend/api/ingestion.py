@@ -0,0 +1,447 @@
+"""
+Set-based ingestion of uploaded equipment data.
+"""
+import io
+
+import pandas as pd
+from django.db import connection, transaction
+from openpyxl import load_workbook
+from django.utils import timezone
+
+from equipment.models import (
+    EquipmentType, PlantLocation, Equipment, EquipmentReading
+)
+from equipment.status import RangeTable
+from equipment.alerts import detect_alerts, raise_alerts
+from equipment.aggregates import record_readings
+from equipment.rollup import STATE_FIELDS, conflict_target, equipment_state, update_rollup
+from equipment.stats_cache import invalidate_dashboard
+
+
+COLUMN_MAPPING = {
+    'equipment name': 'name',
+    'equipment_name': 'name',
+    'equipment': 'name',
+    'equipment type': 'type',
+    'equipment_type': 'type',
+    'category': 'type',
+    'plant location': 'location',
+    'plant_location': 'location',
+    'plant': 'location',
+    'site': 'location'
+}
+
+REQUIRED_COLUMNS = {'name', 'type'}
+
+DEFAULT_LOCATION = 'Main Plant'
+
+# Ranges given to equipment types that are first seen in an upload
+DEFAULT_TYPE_RANGES = {
+    'min_flowrate': 0, 'max_flowrate': 200,
+    'min_pressure': 0, 'max_pressure': 15,
+    'min_temperature': 0, 'max_temperature': 200
+}
+
+DEFAULT_LOCATION_CAPACITY = 100
+
+# Rows per INSERT statement (keeps SQLite under its bound-variable limit)
+BATCH_SIZE = 500
+
+# Rows read, validated and committed together when streaming a file
+CHUNK_SIZE = 10000
+
+READING_COLUMNS = ['equipment_id', 'flowrate', 'pressure', 'temperature', 'status']
+
+EQUIPMENT_UPDATE_FIELDS = [
+    'equipment_type', 'flowrate', 'pressure', 'temperature',
+    'status', 'is_active', 'updated_at'
+]
+
+
+def normalize_columns(df):
+    """Lower-case the header and map known aliases onto canonical names."""
+    df.columns = df.columns.str.strip().str.lower()
+    df.rename(columns=COLUMN_MAPPING, inplace=True)
+
+    missing_columns = REQUIRED_COLUMNS - set(df.columns)
+    if missing_columns:
+        raise ValueError(
+            f"Missing columns. Found: {list(df.columns)}. Expected: {list(REQUIRED_COLUMNS)}"
+        )
+    return df
+
+
+def parse_sheet_names(value):
+    """Turn an upload's ``sheets`` option into a list of names, '*' or None."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    if value in ('*', 'all'):
+        return '*'
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _frame(rows, header, first_row):
+    df = pd.DataFrame(rows, columns=header)
+    df.index = pd.RangeIndex(first_row, first_row + len(rows))
+    return normalize_columns(df)
+
+
+def select_worksheets(workbook, sheets):
+    """Worksheets named by ``sheets``: a list of names, '*' for all, None for the first."""
+    if sheets is None:
+        return workbook.worksheets[:1]
+    if sheets == '*':
+        return workbook.worksheets
+    unknown = [name for name in sheets if name not in workbook.sheetnames]
+    if unknown:
+        raise ValueError(
+            f"Unknown sheets: {unknown}. Available: {workbook.sheetnames}"
+        )
+    return [workbook[name] for name in sheets]
+
+
+def _read_excel_chunks(file_obj, sheets, chunk_size):
+    """
+    Stream rows from an XLSX workbook with openpyxl's read-only iterator.
+
+    Only the current chunk of rows is materialised; see ``select_worksheets``
+    for ``sheets``.
+    """
+    workbook = load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        worksheets = select_worksheets(workbook, sheets)
+        for position, worksheet in enumerate(worksheets):
+            total = worksheet.max_row or 0
+            header = None
+            rows = []
+            first_row = 0
+            seen = 0
+
+            for values in worksheet.iter_rows(values_only=True):
+                seen += 1
+                if all(v is None for v in values):
+                    continue
+                if header is None:
+                    header = ['' if v is None else str(v) for v in values]
+                    continue
+                rows.append(values[:len(header)])
+                if len(rows) == chunk_size:
+                    done = min(seen / total, 1.0) if total else 0
+                    yield _frame(rows, header, first_row), (position + done) / len(worksheets)
+                    first_row += len(rows)
+                    rows = []
+
+            if header is None:
+                if sheets == '*':
+                    continue  # blank sheets are fine when ingesting everything
+                raise ValueError(f"Sheet '{worksheet.title}' has no header row")
+            if rows:
+                yield _frame(rows, header, first_row), (position + 1) / len(worksheets)
+    finally:
+        workbook.close()
+
+
+def read_chunks(file_obj, filename, file_size=None, chunk_size=CHUNK_SIZE, sheets=None):
+    """
+    Yield ``(chunk, fraction_done)`` pairs of normalised DataFrames.
+
+    CSV and XLSX files are streamed so only one chunk is held in memory at a
+    time. Legacy XLS workbooks have no streaming reader and are loaded whole.
+    """
+    filename = filename.lower()
+    if filename.endswith('.csv'):
+        reader = pd.read_csv(file_obj, encoding='utf-8-sig', chunksize=chunk_size)
+        with reader:
+            for chunk in reader:
+                fraction = file_obj.tell() / file_size if file_size else 0
+                yield normalize_columns(chunk), min(fraction, 1.0)
+        return
+
+    if filename.endswith('.xlsx'):
+        yield from _read_excel_chunks(file_obj, sheets, chunk_size)
+        return
+
+    if sheets is None:
+        sheet_name = 0
+    elif sheets == '*':
+        sheet_name = None
+    else:
+        sheet_name = sheets
+    frames = pd.read_excel(file_obj, sheet_name=sheet_name)
+    if isinstance(frames, pd.DataFrame):
+        frames = {None: frames}
+    for position, df in enumerate(frames.values()):
+        df = normalize_columns(df)
+        total = len(df)
+        for start in range(0, total, chunk_size):
+            end = min(start + chunk_size, total)
+            yield df.iloc[start:end], (position + end / total) / len(frames)
+
+
+def _text_column(df, column):
+    """Column as stripped strings, with blank cells as ''."""
+    if column not in df:
+        return pd.Series('', index=df.index, dtype=object)
+    values = df[column]
+    return values.astype(str).str.strip().mask(values.isna(), '')
+
+
+def _numeric_column(df, column, default=0.0):
+    """Column coerced to float; blanks and unparseable cells become ``default``."""
+    if column not in df:
+        return pd.Series(default, index=df.index, dtype=float)
+    return pd.to_numeric(df[column], errors='coerce').fillna(default).astype(float)
+
+
+def validate_rows(df):
+    """
+    Validate and coerce a chunk column by column, without touching the DB.
+
+    Returns ``(rows, errors)``: a DataFrame of the valid rows with ``row``,
+    ``name``, ``type``, ``location`` and the numeric reading columns, and a
+    list of ``(row_number, message)`` for the rejected ones.
+    """
+    rows = pd.DataFrame({
+        'row': df.index + 1,
+        'name': _text_column(df, 'name'),
+        'type': _text_column(df, 'type'),
+        'location': _text_column(df, 'location'),
+        'flowrate': _numeric_column(df, 'flowrate'),
+        'pressure': _numeric_column(df, 'pressure'),
+        'temperature': _numeric_column(df, 'temperature'),
+    }, index=df.index)
+
+    # Empty cells in Excel and CSV fall back to the default location
+    blank_location = (rows['location'] == '') | (rows['location'].str.lower() == 'nan')
+    rows.loc[blank_location, 'location'] = DEFAULT_LOCATION
+
+    missing = (rows['name'] == '') | (rows['type'] == '')
+    errors = [
+        (row, "Skipping row: Name or Type is empty")
+        for row in rows.loc[missing, 'row'].tolist()
+    ]
+    return rows[~missing], errors
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _resolve_by_name(model, names, defaults):
+    """Fetch ``model`` rows by name, creating the missing ones in bulk."""
+    resolved = {obj.name: obj for obj in model.objects.filter(name__in=names)}
+
+    missing = [name for name in names if name not in resolved]
+    if missing:
+        model.objects.bulk_create(
+            [model(name=name, **defaults) for name in missing],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        for obj in model.objects.filter(name__in=missing):
+            resolved[obj.name] = obj
+
+    return resolved
+
+
+def _existing_equipment(names):
+    """
+    The equipment already stored under ``names`` as a DataFrame indexed by
+    name, with its id and the fields the status rollup depends on.
+    """
+    rows = []
+    for batch in _chunks(names):
+        rows.extend(Equipment.objects.filter(name__in=batch).values_list('name', 'id', *STATE_FIELDS))
+    return pd.DataFrame(rows, columns=['name', 'id', *STATE_FIELDS]).set_index('name')
+
+
+def _copy_readings(readings, now):
+    """
+    Load readings on PostgreSQL: ``COPY`` into a temporary staging table,
+    then move them into the readings table with a single ``INSERT ... SELECT``.
+    """
+    table = connection.ops.quote_name(EquipmentReading._meta.db_table)
+    buffer = io.StringIO()
+    readings[READING_COLUMNS].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    copy_sql = f"COPY reading_staging ({', '.join(READING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE IF NOT EXISTS reading_staging ("
+            "equipment_id bigint, flowrate double precision, pressure double precision, "
+            "temperature double precision, status varchar(20)"
+            ") ON COMMIT DROP"
+        )
+        cursor.execute("TRUNCATE reading_staging")
+
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(copy_sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                while data := buffer.read(1 << 20):
+                    copy.write(data)
+
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(READING_COLUMNS)}, timestamp, created_at) "
+            f"SELECT {', '.join(READING_COLUMNS)}, %s, %s FROM reading_staging",
+            [now, now]
+        )
+
+
+def insert_readings(readings, now=None, method=None):
+    """
+    Insert a DataFrame of readings (``READING_COLUMNS``) in bulk.
+
+    ``method`` is 'copy' (PostgreSQL only) or 'bulk'; by default COPY is
+    used on PostgreSQL and batched inserts everywhere else.
+    """
+    if readings.empty:
+        return
+    now = now or timezone.now()
+    if method is None:
+        method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+
+    if method == 'copy':
+        if connection.vendor != 'postgresql':
+            raise ValueError(f"COPY is not supported on {connection.vendor}")
+        _copy_readings(readings, now)
+        return
+
+    EquipmentReading.objects.bulk_create(
+        [
+            EquipmentReading(
+                equipment_id=r.equipment_id,
+                flowrate=r.flowrate,
+                pressure=r.pressure,
+                temperature=r.temperature,
+                status=r.status,
+                timestamp=now
+            )
+            for r in readings[READING_COLUMNS].itertuples(index=False)
+        ],
+        batch_size=BATCH_SIZE
+    )
+
+
+def location_conflicts(rows, row_locations, owners):
+    """
+    Boolean mask of rows naming equipment that belongs to another location.
+
+    Equipment names are globally unique, so a name already claimed by
+    another plant location (``owners``: name -> location, or earlier in
+    these rows) cannot be upserted from this row.
+    """
+    claimed = rows['name'].map(owners).fillna(
+        row_locations.groupby(rows['name']).transform('first')
+    )
+    return claimed != row_locations
+
+
+def ingest_dataframe(df):
+    """
+    Write a normalised DataFrame of equipment rows to the database.
+
+    Types and locations are resolved once per distinct value, equipment is
+    upserted by name and readings are bulk inserted, so the number of queries
+    grows with the number of batches rather than the number of rows.
+    On PostgreSQL readings are loaded with ``COPY``. Readings out of range
+    raise alerts, at most one open alert per equipment and parameter.
+    Returns the same per-row accounting the upload history records.
+    """
+    rows, errors = validate_rows(df)
+    return ingest_rows(rows, errors, len(df))
+
+
+def ingest_rows(rows, errors, records_processed):
+    """Write rows already checked by ``validate_rows``; see ``ingest_dataframe``."""
+    errors = list(errors)
+
+    with transaction.atomic():
+        types = _resolve_by_name(
+            EquipmentType, set(rows['type'].unique()), DEFAULT_TYPE_RANGES
+        )
+        locations = _resolve_by_name(
+            PlantLocation, set(rows['location'].unique()),
+            {'capacity': DEFAULT_LOCATION_CAPACITY}
+        )
+        existing = _existing_equipment(set(rows['name'].unique()))
+
+        location_ids = rows['location'].map({name: loc.id for name, loc in locations.items()})
+        conflict = location_conflicts(
+            rows, location_ids,
+            existing['plant_location_id'].to_dict()
+        )
+        errors.extend(
+            (row, f"Equipment '{name}' already exists at another plant location")
+            for row, name in zip(rows.loc[conflict, 'row'].tolist(), rows.loc[conflict, 'name'].tolist())
+        )
+        accepted = rows[~conflict]
+
+        # Every reading keeps its own status; the equipment takes the last one.
+        # Starting from the status stored before this chunk, each reading is
+        # held by the ones before it, as if they had been uploaded one by one.
+        ranges = RangeTable.from_types(types.values())
+        accepted = accepted.assign(
+            equipment_type_id=accepted['type'].map({name: t.id for name, t in types.items()})
+        )
+        previous = accepted['name'].map(existing['status']).fillna('normal')
+        statuses = ranges.evaluate(
+            accepted['equipment_type_id'],
+            accepted['flowrate'], accepted['pressure'], accepted['temperature'],
+            previous=previous, groups=accepted['name']
+        )
+        accepted = accepted.assign(status=statuses)
+
+        # Later rows for the same equipment win, as they did row by row
+        now = timezone.now()
+        latest = {
+            r.name: Equipment(
+                name=r.name,
+                equipment_type=types[r.type],
+                plant_location=locations[r.location],
+                flowrate=r.flowrate,
+                pressure=r.pressure,
+                temperature=r.temperature,
+                status=r.status,
+                is_active=True,
+                updated_at=now,
+            )
+            for r in accepted.drop_duplicates('name', keep='last').itertuples(index=False)
+        }
+
+        Equipment.objects.bulk_create(
+            list(latest.values()),
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            update_fields=EQUIPMENT_UPDATE_FIELDS,
+            **conflict_target(['name'])
+        )
+        invalidate_dashboard()
+        update_rollup(
+            existing.loc[existing.index.isin(latest.keys()), STATE_FIELDS],
+            equipment_state(latest.values(), key='name')
+        )
+        equipment_ids = _existing_equipment(latest.keys())['id']
+
+        readings = accepted.assign(equipment_id=accepted['name'].map(equipment_ids))
+        insert_readings(readings, now)
+        record_readings(readings.assign(
+            plant_location_id=readings['location'].map({name: loc.id for name, loc in locations.items()}),
+            timestamp=now
+        ))
+        alerts_created, alerts_updated = raise_alerts(detect_alerts(ranges, readings, previous))
+
+    errors.sort()
+    return {
+        'records_processed': records_processed,
+        'records_success': len(accepted),
+        'records_failed': records_processed - len(accepted),
+        'alerts_created': alerts_created,
+        'alerts_updated': alerts_updated,
+        'errors': [f"Row {row}: {message}" for row, message in errors],
+    }
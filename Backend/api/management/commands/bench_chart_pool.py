@@ -0,0 +1,91 @@
+"""
+Benchmark how chart rendering affects the latency of other requests.
+
+Renders heavy charts from several threads, once in the request threads
+and once in the render process pool, while a probe thread times a small
+CPU-bound task standing in for a light request. Rendering inline holds
+the GIL and stalls the probe; the pool should leave it flat.
+
+Usage: python manage.py bench_chart_pool --renders 12 --points 20000
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from api import chart_pool
+from .stress_charts import sample_data
+
+
+# Seconds between probe requests
+PROBE_INTERVAL = 0.005
+
+
+def _probe(stop, latencies):
+    """Time a small task from when it is due, so waiting for the GIL counts."""
+    payload = {'values': list(range(5000))}
+    while not stop.is_set():
+        due = time.perf_counter() + PROBE_INTERVAL
+        time.sleep(PROBE_INTERVAL)
+        json.dumps(payload)
+        latencies.append(time.perf_counter() - due)
+
+
+class Command(BaseCommand):
+    help = 'Compare light-request latency while charts render inline and in the process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=12)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--points', type=int, default=20000, help='Points per historical trends series')
+
+    def handle(self, *args, **options):
+        data = sample_data()['historical_trends']
+        rng = np.random.default_rng(0)
+        points = options['points']
+        start = data['timestamps'][0]
+        data = {
+            'name': data['name'],
+            'timestamps': [start + timedelta(minutes=m) for m in range(points)],
+            'flowrates': rng.uniform(20, 220, points).tolist(),
+            'pressures': rng.uniform(1, 16, points).tolist(),
+            'temperatures': rng.uniform(20, 210, points).tolist(),
+        }
+
+        # Start the pool before timing, as a running server would have
+        chart_pool.get_render_pool()
+        chart_pool.render('historical_trends', data)
+
+        for label, processes in (('inline', 0), ('pool', None)):
+            overrides = {'CHART_RENDER_QUEUE_DEPTH': options['renders']}
+            if processes is not None:
+                overrides['CHART_RENDER_PROCESSES'] = processes
+            with override_settings(**overrides):
+                self._run(label, data, options)
+
+    def _run(self, label, data, options):
+        latencies = []
+        stop = threading.Event()
+        probe = threading.Thread(target=_probe, args=(stop, latencies))
+        probe.start()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(
+                lambda i: chart_pool.render('historical_trends', data, bool(i % 2)),
+                range(options['renders'])
+            ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        probe.join()
+
+        p50, p99, worst = np.percentile(np.array(latencies) * 1000, [50, 99, 100])
+        self.stdout.write(
+            f"{label}: {options['renders']} renders in {elapsed:.1f}s; light request "
+            f"p50 {p50:.2f}ms, p99 {p99:.2f}ms, max {worst:.2f}ms over {len(latencies)} samples"
+        )
@@ -0,0 +1,148 @@
+"""
+Benchmark the dashboard statistics endpoint.
+
+Seeds a synthetic fleet with a year of hourly and daily reading
+aggregates, checks how many queries the endpoint issues on a cache miss
+and on a hit, and reports latency percentiles for both. Everything seeded
+is rolled back.
+
+Usage: python manage.py bench_dashboard --equipment 100000 --timeframe 90d
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.ingestion import DEFAULT_TYPE_RANGES
+from api.views import dashboard_stats
+from equipment.models import EquipmentType, PlantLocation, Equipment, Alert, ReadingAggregate
+from equipment.rollup import rebuild_rollup
+
+# Queries the endpoint may issue on a cache miss and on a hit; a
+# timeframe adds one query over the reading aggregates
+EXPECTED_QUERIES = {'miss': 1, 'hit': 0}
+
+# Days of reading aggregates seeded
+HISTORY_DAYS = 365
+
+
+class Command(BaseCommand):
+    help = 'Assert the query count and measure the latency of /api/dashboard/stats/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--equipment', type=int, default=100000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--timeframe', default='all', help="'all', '24h', '7d', '30d', '90d'...")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username='bench-dashboard')
+            location = self._seed(options['equipment'])
+            try:
+                self._run(user, location, options['requests'], options['timeframe'])
+            finally:
+                transaction.set_rollback(True)
+
+    def _seed(self, equipment):
+        equipment_type = EquipmentType.objects.create(name='bench-type', **DEFAULT_TYPE_RANGES)
+        location = PlantLocation.objects.create(name='bench-location')
+        rng = np.random.default_rng(0)
+        statuses = np.array(['normal', 'warning', 'critical', 'offline'])[
+            rng.choice(4, equipment, p=[0.7, 0.15, 0.1, 0.05])
+        ]
+        Equipment.objects.bulk_create([
+            Equipment(
+                name=f'bench-{i}', equipment_type=equipment_type, plant_location=location,
+                flowrate=f, pressure=p, temperature=t, status=s
+            )
+            for i, (f, p, t, s) in enumerate(zip(
+                rng.uniform(20, 220, equipment).round(2).tolist(),
+                rng.uniform(1, 16, equipment).round(2).tolist(),
+                rng.uniform(20, 210, equipment).round(2).tolist(),
+                statuses.tolist(),
+            ))
+        ], batch_size=2000)
+
+        ids = list(Equipment.objects.filter(plant_location=location).values_list('id', flat=True))
+        Alert.objects.bulk_create([
+            Alert(
+                equipment_id=pk, title='bench', description='bench',
+                parameter='pressure', value=20, threshold=15
+            )
+            for pk in ids[::100]
+        ], batch_size=2000)
+        rebuild_rollup(type_ids=[equipment_type.id])
+
+        # One reading per equipment per hour, far too many to scan raw
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        starts = [('hour', now - timedelta(hours=h), 1) for h in range(HISTORY_DAYS * 24)]
+        starts += [('day', now.replace(hour=0) - timedelta(days=d), 24) for d in range(HISTORY_DAYS)]
+        ReadingAggregate.objects.bulk_create([
+            ReadingAggregate(
+                plant_location=location, equipment_type=equipment_type,
+                bucket=bucket, bucket_start=start,
+                reading_count=equipment * hours, normal_count=equipment * hours,
+                sum_flowrate=120.0 * equipment * hours, min_flowrate=20, max_flowrate=220,
+                sum_pressure=8.5 * equipment * hours, min_pressure=1, max_pressure=16,
+                sum_temperature=115.0 * equipment * hours, min_temperature=20, max_temperature=210,
+            )
+            for bucket, start, hours in starts
+        ], batch_size=2000)
+        return location
+
+    def _request(self, factory, user, params, extra_queries):
+        request = factory.get('/api/dashboard/stats/', params)
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = dashboard_stats(request)
+            elapsed = time.perf_counter() - start
+
+        if response.status_code != 200:
+            raise CommandError(f'Dashboard stats returned {response.status_code}')
+        outcome = response['X-Cache'].lower()
+        expected = EXPECTED_QUERIES[outcome] + (extra_queries if outcome == 'miss' else 0)
+        if len(queries) != expected:
+            raise CommandError(
+                f'Dashboard stats ran {len(queries)} queries on a cache {outcome}, expected {expected}'
+            )
+        return response, outcome, elapsed
+
+    def _run(self, user, location, requests, timeframe):
+        factory = APIRequestFactory()
+        variants = [
+            {'timeframe': timeframe},
+            {'timeframe': timeframe, 'plant_location': location.id},
+        ]
+        extra_queries = 0 if timeframe == 'all' else 1
+        for expected in ('miss', 'hit'):
+            cache.clear()
+            if expected == 'hit':
+                for params in variants:
+                    self._request(factory, user, params, extra_queries)
+
+            timings = []
+            for i in range(requests):
+                if expected == 'miss':
+                    cache.clear()
+                response, outcome, elapsed = self._request(
+                    factory, user, variants[i % len(variants)], extra_queries
+                )
+                if outcome != expected:
+                    raise CommandError(f'Expected a cache {expected}, got a {outcome}')
+                timings.append(elapsed)
+
+            queries = EXPECTED_QUERIES[expected] + (extra_queries if expected == 'miss' else 0)
+            p50, p95, p99 = np.percentile(np.array(timings) * 1000, [50, 95, 99])
+            self.stdout.write(
+                f"{connection.vendor} cache {expected}, timeframe {timeframe}: "
+                f"{response.data['total_equipment']} equipment, {queries} queries per request, "
+                f"p50 {p50:.1f}ms, p95 {p95:.1f}ms, p99 {p99:.1f}ms over {requests} requests"
+            )
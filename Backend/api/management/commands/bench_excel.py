@@ -0,0 +1,65 @@
+"""
+Compare streaming XLSX ingestion with loading the workbook through pandas.
+
+Usage: python manage.py bench_excel --rows 100000 --sheets 3
+"""
+import os
+import tempfile
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook
+
+from api.ingestion import read_chunks, normalize_columns
+from .bench_ingest import generate_frame
+from .bench_ingest_memory import RssSampler, current_rss_mb
+
+
+def write_workbook(path, rows, sheets):
+    """Write ``sheets`` sheets of ``rows`` generated rows each."""
+    workbook = Workbook(write_only=True)
+    for index in range(sheets):
+        df = generate_frame(rows, seed=index)
+        worksheet = workbook.create_sheet(f'Shift {index + 1}')
+        worksheet.append(list(df.columns))
+        for values in df.itertuples(index=False):
+            worksheet.append(list(values))
+    workbook.save(path)
+
+
+class Command(BaseCommand):
+    help = 'Time and peak RSS of pd.read_excel versus the read-only XLSX stream.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Rows per sheet')
+        parser.add_argument('--sheets', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.xlsx')
+            write_workbook(path, options['rows'], options['sheets'])
+            self.stdout.write(
+                f"{options['sheets']} sheet(s) x {options['rows']:,} rows, "
+                f"{os.path.getsize(path) / 2 ** 20:.1f} MB"
+            )
+
+            def full_load():
+                frames = pd.read_excel(path, sheet_name=None, engine='openpyxl')
+                return sum(len(normalize_columns(df)) for df in frames.values())
+
+            def streaming():
+                with open(path, 'rb') as f:
+                    return sum(len(chunk) for chunk, _ in read_chunks(f, path, sheets='*'))
+
+            # Streaming first so the full load cannot inflate its baseline
+            for label, run in (('read-only stream', streaming), ('pd.read_excel', full_load)):
+                baseline = current_rss_mb()
+                start = time.perf_counter()
+                with RssSampler() as sampler:
+                    rows = run()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{label:>17}: {rows:,} rows in {elapsed:.1f}s, "
+                    f"peak +{sampler.peak - baseline:.0f} MB"
+                )
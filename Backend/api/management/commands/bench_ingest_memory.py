@@ -0,0 +1,101 @@
+"""
+Show that streaming ingestion keeps peak memory flat as files grow.
+
+Usage: python manage.py bench_ingest_memory --sizes 64 256 1024 [--write]
+
+Each size generates a CSV of roughly that many MB in a temporary directory
+and streams it through ``read_chunks`` and row validation, sampling the
+process RSS while it runs. With ``--write`` the chunks are also ingested into
+the configured database, so point it at a scratch database.
+"""
+import os
+import resource
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ingestion import read_chunks, validate_rows, ingest_dataframe
+from .bench_ingest import generate_frame
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        # No procfs: fall back to the lifetime peak (KB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler(threading.Thread):
+    """Record the highest RSS seen while a block runs."""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, current_rss_mb())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+def write_csv(path, size_mb):
+    """Append generated blocks to ``path`` until it reaches ``size_mb``."""
+    target = size_mb * 2 ** 20
+    block = generate_frame(100000)
+    with open(path, 'w', newline='') as f:
+        block.to_csv(f, index=False)
+        while f.tell() < target:
+            block.to_csv(f, index=False, header=False)
+
+
+class Command(BaseCommand):
+    help = 'Measure peak RSS of streaming CSV ingestion for growing file sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[64, 256, 1024],
+                            help='File sizes to generate, in MB')
+        parser.add_argument('--write', action='store_true',
+                            help='Also write the rows to the database')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            for size_mb in options['sizes']:
+                path = os.path.join(tmp, f'bench_{size_mb}mb.csv')
+                write_csv(path, size_mb)
+                file_size = os.path.getsize(path)
+
+                baseline = current_rss_mb()
+                rows = 0
+                start = time.perf_counter()
+                with RssSampler() as sampler, open(path, 'rb') as f:
+                    for chunk, _ in read_chunks(f, path, file_size):
+                        if options['write']:
+                            ingest_dataframe(chunk)
+                        else:
+                            validate_rows(chunk)
+                        rows += len(chunk)
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{file_size / 2 ** 20:7.0f} MB  {rows:>10,} rows  {elapsed:7.1f}s  "
+                    f"baseline {baseline:6.0f} MB  peak {sampler.peak:6.0f} MB  "
+                    f"(+{sampler.peak - baseline:.0f} MB)"
+                )
+                os.remove(path)
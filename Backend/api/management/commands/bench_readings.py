@@ -0,0 +1,67 @@
+"""
+Compare reading load strategies on the configured database.
+
+Runs every strategy the backend supports (batched INSERTs everywhere, COPY
+on PostgreSQL) over the same synthetic readings. Point DB_ENGINE at another
+backend and run it again to compare backends.
+
+Usage: python manage.py bench_readings --rows 1000000
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.ingestion import DEFAULT_TYPE_RANGES, insert_readings
+from equipment.models import EquipmentType, PlantLocation, Equipment
+
+
+class Command(BaseCommand):
+    help = 'Measure reading insert throughput per strategy. Changes are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--equipment', type=int, default=100)
+
+    def handle(self, *args, **options):
+        methods = ['bulk']
+        if connection.vendor == 'postgresql':
+            methods.append('copy')
+
+        for method in methods:
+            with transaction.atomic():
+                readings = self._readings(options['rows'], options['equipment'])
+                start = time.perf_counter()
+                insert_readings(readings, method=method)
+                elapsed = time.perf_counter() - start
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{connection.vendor}/{method}: {len(readings)} readings in {elapsed:.2f}s "
+                f"({len(readings) / elapsed:,.0f} rows/s)"
+            )
+
+    def _readings(self, rows, equipment):
+        equipment_type = EquipmentType.objects.create(name='bench-type', **DEFAULT_TYPE_RANGES)
+        location = PlantLocation.objects.create(name='bench-location')
+        Equipment.objects.bulk_create([
+            Equipment(
+                name=f'bench-{i}', equipment_type=equipment_type,
+                plant_location=location, flowrate=0, pressure=0, temperature=0
+            )
+            for i in range(equipment)
+        ])
+        ids = np.array(list(
+            Equipment.objects.filter(plant_location=location).values_list('id', flat=True)
+        ))
+
+        rng = np.random.default_rng(0)
+        return pd.DataFrame({
+            'equipment_id': ids[rng.integers(0, len(ids), rows)],
+            'flowrate': rng.uniform(20, 220, rows).round(2),
+            'pressure': rng.uniform(1, 16, rows).round(2),
+            'temperature': rng.uniform(20, 210, rows).round(2),
+            'status': 'normal',
+        })
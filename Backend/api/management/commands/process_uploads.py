@@ -0,0 +1,27 @@
+"""
+Process queued uploads outside the web server.
+
+Usage: python manage.py process_uploads [--loop] [--interval 5]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.tasks import process_pending_uploads
+
+
+class Command(BaseCommand):
+    help = 'Process pending uploads once, or keep polling with --loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending_uploads()
+            if processed:
+                self.stdout.write(f'Processed {processed} upload(s)')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+"""
+Rebuild the hourly and daily reading aggregates from the readings table.
+
+Writers keep the aggregates current and the migration that adds them fills
+them from existing readings; run this after deleting or importing
+readings by other means.
+
+Usage: python manage.py rebuild_reading_aggregates [--days 90]
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from equipment.aggregates import rebuild_aggregates
+from equipment.stats_cache import invalidate_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Re-aggregate readings into hourly and daily buckets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only rebuild the last N days')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.now() - timedelta(days=options['days'])
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            buckets = rebuild_aggregates(since)
+            invalidate_dashboard()
+        self.stdout.write(f'{buckets} bucket(s) rebuilt in {time.perf_counter() - start:.2f}s')
@@ -0,0 +1,36 @@
+"""
+Rebuild the equipment status rollup from the equipment table.
+
+Writers keep the rollup current; run this after loading equipment by
+other means (raw SQL, fixtures) or with --check to report drift.
+
+Usage: python manage.py rebuild_rollup [--check]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from equipment.rollup import rebuild_rollup, rollup_drift
+from equipment.stats_cache import invalidate_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Re-aggregate the equipment status rollup, or report where it has drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drifted groups')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = rollup_drift()
+            for key, (stored, actual) in sorted(drift.items(), key=str):
+                self.stdout.write(f'{key}: stored {stored}, actual {actual}')
+            self.stdout.write(f'{len(drift)} group(s) drifted')
+            return
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            groups = rebuild_rollup()
+            invalidate_dashboard()
+        self.stdout.write(f'{groups} group(s) rebuilt in {time.perf_counter() - start:.2f}s')
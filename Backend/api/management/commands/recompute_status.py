@@ -0,0 +1,35 @@
+"""
+Recompute the status of every equipment from its current readings.
+
+Usage: python manage.py recompute_status [--type Pump] [--batch-size 2000]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from equipment.models import Equipment
+from equipment.status import BATCH_SIZE, recompute_status
+
+
+class Command(BaseCommand):
+    help = 'Re-evaluate equipment status against the current type ranges.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', help='Only equipment of this type (name)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = Equipment.objects.all()
+        if options['type']:
+            queryset = queryset.filter(equipment_type__name=options['type'])
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            changed = recompute_status(queryset, options['batch_size'])
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f'{changed} status(es) changed in {elapsed:.2f}s ({len(queries)} queries)'
+        )
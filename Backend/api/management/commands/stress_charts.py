@@ -0,0 +1,113 @@
+"""
+Render every chart concurrently and check the output is deterministic.
+
+Each chart type is drawn once per theme and image format on one thread
+to get reference images, then again many times from a thread pool with
+all of them interleaved. Every concurrent render must match its
+reference byte for byte, and matplotlib's global rcParams must come out
+untouched.
+
+Usage: python manage.py stress_charts --threads 8 --rounds 10
+"""
+import hashlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import matplotlib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.charts import CHART_TYPES, IMAGE_FORMATS, render_chart
+
+
+def sample_data(seed=0):
+    """Synthetic data for every chart type, shaped like ``chart_data`` output."""
+    rng = np.random.default_rng(seed)
+    names = [f'EQ-{i}' for i in range(15)]
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    timestamps = [start + timedelta(hours=h) for h in range(24 * 7)]
+    return {
+        'flowrate_comparison': {
+            'names': names,
+            'flowrates': rng.uniform(20, 220, 15).round(2).tolist(),
+        },
+        'temperature_pressure_trends': {
+            'names': names,
+            'temperatures': rng.uniform(20, 210, 15).round(2).tolist(),
+            'pressures': rng.uniform(1, 16, 15).round(2).tolist(),
+        },
+        'equipment_type_distribution': {
+            'names': ['Compressor', 'HeatExchanger', 'Pump', 'Reactor', 'Valve'],
+            'counts': rng.integers(5, 50, 5).tolist(),
+        },
+        'pressure_temperature_scatter': {
+            'names': [f'EQ-{i}' for i in range(300)],
+            'pressures': rng.uniform(1, 16, 300).round(2).tolist(),
+            'temperatures': rng.uniform(20, 210, 300).round(2).tolist(),
+        },
+        'status_distribution': {
+            'statuses': ['Critical', 'Normal', 'Offline', 'Warning'],
+            'counts': rng.integers(1, 100, 4).tolist(),
+        },
+        'plant_location_comparison': {
+            'locations': ['Plant A', 'Plant B', 'Plant C', 'Plant D'],
+            'counts': rng.integers(10, 200, 4).tolist(),
+        },
+        'historical_trends': {
+            'name': 'EQ-0',
+            'timestamps': timestamps,
+            'flowrates': rng.uniform(20, 220, len(timestamps)).round(2).tolist(),
+            'pressures': rng.uniform(1, 16, len(timestamps)).round(2).tolist(),
+            'temperatures': rng.uniform(20, 210, len(timestamps)).round(2).tolist(),
+        },
+    }
+
+
+def _digest(data, job):
+    chart_type, dark_mode, image_format = job
+    return hashlib.sha256(render_chart(chart_type, data[chart_type], dark_mode, image_format)).hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Render charts from a thread pool and assert the images match single-threaded renders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--rounds', type=int, default=10)
+
+    def handle(self, *args, **options):
+        data = sample_data()
+        jobs = [
+            (chart_type, dark_mode, image_format)
+            for chart_type in CHART_TYPES for dark_mode in (False, True) for image_format in IMAGE_FORMATS
+        ]
+        rc_before = dict(matplotlib.rcParams)
+
+        start = time.perf_counter()
+        reference = {job: _digest(data, job) for job in jobs}
+        sequential = time.perf_counter() - start
+
+        # Interleave chart types, themes and formats so a leaked style would show
+        queue = jobs * options['rounds']
+        random.Random(0).shuffle(queue)
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            start = time.perf_counter()
+            digests = list(pool.map(lambda job: _digest(data, job), queue))
+            concurrent = time.perf_counter() - start
+
+        mismatches = sorted({job for job, digest in zip(queue, digests) if digest != reference[job]})
+        if mismatches:
+            raise CommandError('Concurrent renders differ from the reference: ' + ', '.join(
+                f"{chart_type} ({'dark' if dark_mode else 'light'} {image_format})"
+                for chart_type, dark_mode, image_format in mismatches
+            ))
+        changed = [key for key, value in matplotlib.rcParams.items() if rc_before.get(key) != value]
+        if changed:
+            raise CommandError(f"Rendering changed global rcParams: {', '.join(changed)}")
+
+        self.stdout.write(
+            f"{len(queue)} renders on {options['threads']} threads matched {len(jobs)} references; "
+            f"{len(jobs) / sequential:.1f} charts/s sequential, {len(queue) / concurrent:.1f} charts/s concurrent"
+        )
@@ -0,0 +1,163 @@
+"""
+Dry-run previews of uploads.
+
+Only the header and a sample of rows are read, so a preview costs the
+same whatever the size of the file. The sample goes through the same
+column mapping and validation as a real upload and nothing is written.
+"""
+import io
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from equipment.models import Equipment
+from .ingestion import (
+    COLUMN_MAPPING, normalize_columns, select_worksheets,
+    validate_rows, location_conflicts
+)
+
+
+# Rows sampled when the request does not say
+SAMPLE_SIZE = 1000
+
+MAX_SAMPLE_SIZE = 10000
+
+INGESTED_COLUMNS = {'name', 'type', 'location', 'flowrate', 'pressure', 'temperature'}
+
+
+def _sample_csv(file_obj, sample_size, file_size):
+    """
+    Read the header and up to ``sample_size`` lines of a CSV file.
+
+    Returns ``(sample, estimated_rows)``. The row count is extrapolated from
+    the average line length of the sample unless the whole file was read.
+    ``file_size`` may exceed what was received when a client only sends the
+    head of a file; the trailing partial line is then dropped.
+    """
+    received = file_obj.size
+    file_size = max(file_size or 0, received)
+    header = file_obj.readline()
+    lines = []
+    while len(lines) < sample_size:
+        line = file_obj.readline()
+        if not line:
+            break
+        lines.append(line)
+
+    truncated = file_size > received
+    if truncated and lines and not lines[-1].endswith(b'\n'):
+        lines.pop()
+
+    sample = pd.read_csv(io.BytesIO(header + b''.join(lines)), encoding='utf-8-sig')
+
+    body_bytes = sum(len(line) for line in lines)
+    if not truncated and file_obj.tell() >= received:
+        estimated_rows = len(sample)
+    elif body_bytes:
+        estimated_rows = round((file_size - len(header)) * len(lines) / body_bytes)
+    else:
+        estimated_rows = None
+    return sample, estimated_rows
+
+
+def _sample_xlsx(file_obj, sample_size, sheets):
+    """Read the header and up to ``sample_size`` rows of the first selected sheet."""
+    workbook = load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        worksheets = select_worksheets(workbook, sheets)
+
+        # The sheet dimensions are stored up front, so this costs nothing
+        estimated_rows = sum(max((ws.max_row or 1) - 1, 0) for ws in worksheets)
+
+        header = None
+        rows = []
+        for values in worksheets[0].iter_rows(values_only=True):
+            if all(v is None for v in values):
+                continue
+            if header is None:
+                header = ['' if v is None else str(v) for v in values]
+                continue
+            rows.append(values[:len(header)])
+            if len(rows) == sample_size:
+                break
+    finally:
+        workbook.close()
+
+    if header is None:
+        raise ValueError(f"Sheet '{worksheets[0].title}' has no header row")
+    return pd.DataFrame(rows, columns=header), estimated_rows
+
+
+def read_sample(file_obj, filename, sample_size=SAMPLE_SIZE, file_size=None, sheets=None):
+    """Return ``(sample, estimated_rows)`` for an uploaded file without reading all of it."""
+    filename = filename.lower()
+    if filename.endswith('.csv'):
+        return _sample_csv(file_obj, sample_size, file_size)
+    if filename.endswith('.xlsx'):
+        return _sample_xlsx(file_obj, sample_size, sheets)
+
+    # Legacy XLS has no streaming reader, so the workbook is still parsed whole
+    if isinstance(sheets, list):
+        sheet_name = sheets[0]
+    else:
+        sheet_name = 0
+    return pd.read_excel(file_obj, sheet_name=sheet_name, nrows=sample_size), None
+
+
+def preview_file(file_obj, filename, sample_size=SAMPLE_SIZE, file_size=None, sheets=None):
+    """
+    Map and validate a sample of an upload and project the outcome for the
+    whole file. Only reads from the database.
+    """
+    sample, estimated_rows = read_sample(file_obj, filename, sample_size, file_size, sheets)
+
+    columns = [str(c) for c in sample.columns]
+    mapped = {}
+    for column in columns:
+        key = column.strip().lower()
+        canonical = COLUMN_MAPPING.get(key, key)
+        if canonical in INGESTED_COLUMNS:
+            mapped[column] = canonical
+
+    result = {
+        'columns': columns,
+        'mapped_columns': mapped,
+        'ignored_columns': [c for c in columns if c not in mapped],
+        'sample_rows': len(sample),
+        'estimated_total_rows': estimated_rows,
+    }
+
+    try:
+        df = normalize_columns(sample)
+    except ValueError as e:
+        result.update({'valid': False, 'error': str(e)})
+        return result
+
+    rows, errors = validate_rows(df)
+
+    # Names already owned by another location would be rejected on ingest
+    owners = dict(
+        Equipment.objects.filter(
+            name__in=set(rows['name'].unique())
+        ).values_list('name', 'plant_location__name')
+    )
+    conflict = location_conflicts(rows, rows['location'], owners)
+    errors.extend(
+        (row, f"Equipment '{name}' already exists at another plant location")
+        for row, name in zip(rows.loc[conflict, 'row'].tolist(), rows.loc[conflict, 'name'].tolist())
+    )
+    errors.sort()
+
+    error_rate = len(errors) / len(sample) if len(sample) else 0.0
+    result.update({
+        'valid': True,
+        'valid_rows': len(sample) - len(errors),
+        'invalid_rows': len(errors),
+        'error_rate': round(error_rate, 4),
+        'estimated_failed_rows': (
+            round(estimated_rows * error_rate) if estimated_rows is not None else None
+        ),
+        'errors': [f"Row {row}: {message}" for row, message in errors[:10]],
+        'preview': rows.head(5).drop(columns='row').to_dict('records'),
+    })
+    return result
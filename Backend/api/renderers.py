@@ -0,0 +1,32 @@
+"""
+Renderers for binary chart images.
+
+The charts view negotiates between these and JSON, through the Accept
+header or ``?format=png|svg|json``. Images are passed through as bytes;
+anything else (an error, or DRF's own authentication and permission
+responses) is rendered as JSON so clients can still read it.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ImageRenderer(BaseRenderer):
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+
+class PNGRenderer(ImageRenderer):
+    media_type = 'image/png'
+    format = 'png'
+
+
+class SVGRenderer(ImageRenderer):
+    media_type = 'image/svg+xml'
+    format = 'svg'
@@ -30,6 +30,7 @@ class EquipmentTypeSerializer(serializers.ModelSerializer):
             'min_flowrate', 'max_flowrate',
             'min_pressure', 'max_pressure',
             'min_temperature', 'max_temperature',
+            'critical_band', 'hysteresis',
             'equipment_count', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -129,12 +130,12 @@ class AlertSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'equipment', 'equipment_name',
             'title', 'description', 'severity', 'status',
-            'parameter', 'value', 'threshold',
+            'parameter', 'value', 'threshold', 'occurrences', 'last_seen_at',
             'acknowledged_by', 'acknowledged_by_name', 'acknowledged_at',
             'resolved_by', 'resolved_by_name', 'resolved_at',
             'resolution_notes', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'occurrences', 'last_seen_at', 'created_at', 'updated_at']
 
 
 class UploadHistorySerializer(serializers.ModelSerializer):
@@ -145,12 +146,12 @@ class UploadHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = UploadHistory
         fields = [
-            'id', 'file_name', 'file_path', 'file_size',
-            'status', 'records_processed', 'records_success', 'records_failed',
-            'error_log', 'uploaded_by', 'uploaded_by_name',
+            'id', 'file_name', 'file_path', 'file_size', 'content_hash', 'sheets',
+            'status', 'progress', 'records_processed', 'records_success', 'records_failed',
+            'error_log', 'batch', 'uploaded_by', 'uploaded_by_name',
             'created_at', 'completed_at'
         ]
-        read_only_fields = ['id', 'created_at', 'completed_at']
+        read_only_fields = ['id', 'content_hash', 'progress', 'batch', 'created_at', 'completed_at']
 
 
 class DashboardStatsSerializer(serializers.Serializer):
@@ -165,3 +166,10 @@ class DashboardStatsSerializer(serializers.Serializer):
     avg_temperature = serializers.FloatField()
     max_flowrate = serializers.FloatField()
     active_alerts = serializers.IntegerField()
+    timeframe = serializers.CharField()
+    
+    # Readings taken within the timeframe; absent for 'all'
+    reading_count = serializers.IntegerField(required=False)
+    normal_readings = serializers.IntegerField(required=False)
+    warning_readings = serializers.IntegerField(required=False)
+    critical_readings = serializers.IntegerField(required=False)
@@ -0,0 +1,290 @@
+"""
+Background processing of uploaded files.
+
+``UploadHistory`` rows in the ``pending`` state form the job queue. Uploads
+are handed to an in-process thread pool as soon as they are committed, and
+``manage.py process_uploads`` drains anything left behind (e.g. after a
+restart) or can run as a dedicated worker. A job is claimed with a
+conditional UPDATE, so the same upload is never processed twice. Workers
+stamp ``claimed_at`` as they make progress; ``process_uploads`` takes over
+uploads whose worker has gone quiet for ``UPLOAD_CLAIM_TIMEOUT`` seconds,
+resuming after the chunks already committed.
+
+Files of a batch upload are parsed and validated in parallel by a pool of
+processes, which spool each validated chunk to a temporary file; their rows
+are then written one file at a time, reading back one chunk at a time.
+"""
+import logging
+import os
+import pickle
+import tempfile
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import multiprocessing
+import threading
+
+import django
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from equipment.models import UploadHistory
+from .ingestion import read_chunks, parse_sheet_names, validate_rows, ingest_rows
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_parse_pool = None
+
+
+def get_executor():
+    """Return the shared upload worker pool, starting it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.UPLOAD_WORKERS,
+                thread_name_prefix='upload-worker'
+            )
+    return _executor
+
+
+def get_parse_pool():
+    """Return the shared pool of parser processes, starting it on first use."""
+    global _parse_pool
+    with _executor_lock:
+        if _parse_pool is None:
+            # Spawned rather than forked: the server process is multi-threaded
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=settings.UPLOAD_PARSE_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup
+            )
+    return _parse_pool
+
+
+def enqueue_upload(upload_id):
+    """Schedule an upload for processing once the current transaction commits."""
+    transaction.on_commit(lambda: get_executor().submit(_run_job, process_upload, upload_id))
+
+
+def enqueue_batch(batch_id):
+    """Schedule every pending file of a batch once the current transaction commits."""
+    transaction.on_commit(lambda: get_executor().submit(_run_job, process_batch, batch_id))
+
+
+def _claimable(reclaim=False):
+    claimable = Q(status='pending')
+    if reclaim:
+        stale = timezone.now() - timedelta(seconds=settings.UPLOAD_CLAIM_TIMEOUT)
+        claimable |= Q(status='processing') & (Q(claimed_at__lt=stale) | Q(claimed_at__isnull=True))
+    return claimable
+
+
+def claim_upload(upload_id, reclaim=False):
+    """
+    Atomically move an upload from pending to processing. With ``reclaim``,
+    also take over an upload whose worker stopped reporting progress.
+    """
+    return UploadHistory.objects.filter(
+        _claimable(reclaim), pk=upload_id
+    ).update(status='processing', claimed_at=timezone.now()) == 1
+
+
+def _run_job(job, job_id):
+    close_old_connections()
+    try:
+        job(job_id)
+    except Exception:
+        logger.exception("Upload job %s(%s) crashed", job.__name__, job_id)
+    finally:
+        connection.close()
+
+
+def parse_file(name, file_name, file_size, sheets=None):
+    """
+    Read and validate a stored upload without touching the database.
+
+    Each chunk is pickled to a temporary file as ``(rows, errors,
+    records_processed, fraction_done)`` so only one is held in memory;
+    returns the file paths in order. Runs in a parser process for batch
+    uploads.
+    """
+    paths = []
+    try:
+        with default_storage.open(name, 'rb') as f:
+            for chunk, fraction in read_chunks(f, file_name, file_size, sheets=sheets):
+                rows, errors = validate_rows(chunk)
+                fd, path = tempfile.mkstemp(prefix='upload-chunk-', suffix='.pickle')
+                paths.append(path)
+                with os.fdopen(fd, 'wb') as out:
+                    pickle.dump((rows, errors, len(chunk), fraction), out, pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        _remove_files(paths)
+        raise
+    return paths
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _stream_file(upload_history):
+    with upload_history.file_path.open('rb') as f:
+        for chunk, fraction in read_chunks(
+            f, upload_history.file_name, upload_history.file_size,
+            sheets=parse_sheet_names(upload_history.sheets)
+        ):
+            rows, errors = validate_rows(chunk)
+            yield rows, errors, len(chunk), fraction
+
+
+def _discard_parsed(future):
+    if not future.cancelled() and future.exception() is None:
+        _remove_files(future.result())
+
+
+def _from_future(future):
+    """Load the chunks a parser process spooled, deleting each once read."""
+    paths = future.result()
+    try:
+        for path in paths:
+            with open(path, 'rb') as f:
+                chunk = pickle.load(f)
+            os.remove(path)
+            yield chunk
+    finally:
+        # Left over when writing the upload failed part way
+        _remove_files(paths)
+
+
+def _write_upload(upload_history, chunks, claimed=()):
+    """
+    Ingest validated chunks for an upload, one transaction per chunk.
+
+    The counters and row errors are committed with each chunk, so a
+    reclaimed upload skips the chunks its previous worker already wrote
+    and keeps their errors. Uploads in ``claimed``,
+    waiting their turn behind this one, have their claims renewed with it.
+    """
+    try:
+        records_processed = upload_history.records_processed
+        records_success = upload_history.records_success
+        records_failed = upload_history.records_failed
+        errors = upload_history.error_log.splitlines()
+        records_read = 0
+
+        for rows, chunk_errors, chunk_processed, fraction in chunks:
+            records_read += chunk_processed
+            if records_read <= upload_history.records_processed:
+                continue
+
+            with transaction.atomic():
+                result = ingest_rows(rows, chunk_errors, chunk_processed)
+                records_processed += result['records_processed']
+                records_success += result['records_success']
+                records_failed += result['records_failed']
+                errors.extend(result['errors'][:100 - len(errors)])
+
+                now = timezone.now()
+                UploadHistory.objects.filter(pk=upload_history.pk).update(
+                    records_processed=records_processed,
+                    records_success=records_success,
+                    records_failed=records_failed,
+                    progress=min(int(fraction * 100), 99),
+                    error_log='\n'.join(errors),
+                    claimed_at=now
+                )
+                UploadHistory.objects.filter(
+                    pk__in=claimed, status='processing'
+                ).update(claimed_at=now)
+
+        upload_history.status = 'completed' if records_failed == 0 else 'failed'
+        upload_history.progress = 100
+        upload_history.records_processed = records_processed
+        upload_history.records_success = records_success
+        upload_history.records_failed = records_failed
+        upload_history.error_log = '\n'.join(errors)
+
+    except Exception as e:
+        upload_history.refresh_from_db()
+        upload_history.status = 'failed'
+        upload_history.error_log = str(e)
+
+    upload_history.completed_at = timezone.now()
+    upload_history.save()
+
+
+def process_upload(upload_id, reclaim=False):
+    """
+    Stream a pending upload through ingestion, one chunk per transaction,
+    reporting progress as it goes. ``reclaim`` also takes over an upload
+    left processing by a dead worker; see ``claim_upload``.
+
+    Returns False if another worker already claimed the upload.
+    """
+    if not claim_upload(upload_id, reclaim):
+        return False
+
+    upload_history = UploadHistory.objects.get(pk=upload_id)
+    _write_upload(upload_history, _stream_file(upload_history))
+    return True
+
+
+def process_batch(batch_id):
+    """
+    Process the pending files of a batch: parse them in parallel across the
+    parser processes and write each one as soon as it is parsed, so only the
+    database phase is serialised. Returns how many files ran.
+    """
+    pending = UploadHistory.objects.filter(
+        batch_id=batch_id, status='pending'
+    ).order_by('id').values_list('id', flat=True)
+    claimed = [upload_id for upload_id in pending if claim_upload(upload_id)]
+    uploads = UploadHistory.objects.filter(pk__in=claimed)
+
+    try:
+        pool = get_parse_pool()
+        futures = {
+            pool.submit(
+                parse_file, upload.file_path.name, upload.file_name,
+                upload.file_size, parse_sheet_names(upload.sheets)
+            ): upload
+            for upload in uploads
+        }
+    except Exception:
+        logger.exception("Parser processes unavailable, parsing batch %s in this thread", batch_id)
+        for upload in uploads:
+            _write_upload(upload, _stream_file(upload), claimed)
+        return len(claimed)
+
+    written = 0
+    try:
+        for future in as_completed(futures):
+            # Forget each file's future once written, so only the files still
+            # being parsed or waiting their turn are referenced
+            _write_upload(futures.pop(future), _from_future(future), claimed)
+            written += 1
+    finally:
+        for future in futures:
+            future.add_done_callback(_discard_parsed)
+    return written
+
+
+def process_pending_uploads():
+    """
+    Process every pending upload in this thread, and any whose worker died
+    while processing it; returns how many ran.
+    """
+    pending = list(UploadHistory.objects.filter(
+        _claimable(reclaim=True)
+    ).order_by('created_at').values_list('id', flat=True))
+    return sum(process_upload(upload_id, reclaim=True) for upload_id in pending)
@@ -0,0 +1,532 @@
+"""
+Tests for upload ingestion, equipment status and alerts, the dashboard
+statistics and the tables behind them, and chart rendering.
+"""
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pandas as pd
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import chunked, tasks
+from api.charts import IMAGE_FORMATS, chart_fingerprint, render_chart
+from api.chunked import finalize_session, part_path
+from api.ingestion import (
+    DEFAULT_LOCATION, DEFAULT_TYPE_RANGES, ingest_dataframe, normalize_columns,
+    validate_rows
+)
+from api.management.commands.stress_charts import sample_data
+from api.views import _compute_dashboard_stats, dashboard_stats
+from equipment import alerts
+from equipment.aggregates import rebuild_aggregates, window_totals
+from equipment.models import (
+    EquipmentType, PlantLocation, Equipment, EquipmentReading, EquipmentStatusRollup, Alert,
+    ReadingAggregate, UploadHistory, UploadSession
+)
+from equipment.rollup import conflict_target, rebuild_rollup, rollup_drift
+from equipment.stats_cache import GENERATION_KEY, cached_stats, invalidate_dashboard
+from equipment.status import RangeTable
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def fleet(db):
+    """Five pieces of equipment of two types at two locations, with one open alert."""
+    types = [
+        EquipmentType.objects.create(name=name, **DEFAULT_TYPE_RANGES)
+        for name in ('Pump', 'Valve')
+    ]
+    locations = [PlantLocation.objects.create(name=name) for name in ('Plant A', 'Plant B')]
+    equipment = []
+    # Status follows the readings on save; the last one is offline
+    for i, pressure in enumerate([2.0, 5.0, 15.5, 40.0, 2.0]):
+        equipment.append(Equipment.objects.create(
+            name=f'EQ-{i}',
+            equipment_type=types[i % 2],
+            plant_location=locations[i % 2],
+            flowrate=10.0 * (i + 1),
+            pressure=pressure,
+            temperature=50.0,
+            is_active=i < 4
+        ))
+    Alert.objects.create(
+        equipment=equipment[3],
+        title='Pressure above safe range',
+        description='',
+        severity='critical',
+        parameter='pressure',
+        value=20.0,
+        threshold=15.0
+    )
+    return types, locations
+
+
+def test_stats_take_one_query(fleet, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        stats = _compute_dashboard_stats('all', 'all')
+
+    active = Equipment.objects.filter(is_active=True)
+    assert stats['total_equipment'] == 4
+    for status in ('normal', 'warning', 'critical'):
+        assert stats[f'{status}_count'] == active.filter(status=status).count()
+    assert stats['max_flowrate'] == 40.0
+    assert stats['avg_pressure'] == round((2.0 + 5.0 + 15.5 + 40.0) / 4, 2)
+    assert stats['active_alerts'] == 1
+
+
+def test_filtered_stats_take_one_query(fleet, django_assert_num_queries):
+    types, locations = fleet
+    with django_assert_num_queries(1):
+        stats = _compute_dashboard_stats(locations[0].id, types[0].id)
+
+    assert stats['total_equipment'] == 2
+    # The open alert belongs to another location but is counted plant-wide
+    assert stats['active_alerts'] == 1
+
+    # Still counted when the filters match no equipment at all
+    empty = PlantLocation.objects.create(name='Plant C')
+    with django_assert_num_queries(1):
+        stats = _compute_dashboard_stats(empty.id, 'all')
+    assert (stats['total_equipment'], stats['active_alerts']) == (0, 1)
+
+
+def test_cache_hit_takes_no_queries(fleet, django_assert_num_queries):
+    user = User.objects.create(username='viewer')
+    factory = APIRequestFactory()
+
+    def get():
+        request = factory.get('/api/dashboard/stats/', {'plant_location': fleet[1][0].id})
+        force_authenticate(request, user=user)
+        return dashboard_stats(request)
+
+    with django_assert_num_queries(1):
+        miss = get()
+    with django_assert_num_queries(0):
+        hit = get()
+
+    assert miss['X-Cache'] == 'MISS'
+    assert hit['X-Cache'] == 'HIT'
+    assert hit.data == miss.data
+
+
+def test_cached_stats_miss_after_invalidation_or_eviction(db, django_capture_on_commit_callbacks):
+    computed = []
+
+    def compute():
+        computed.append(len(computed))
+        return {'n': len(computed)}
+
+    assert cached_stats(compute, location='all') == ({'n': 1}, False)
+    assert cached_stats(compute, location='all') == ({'n': 1}, True)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        invalidate_dashboard()
+    assert cached_stats(compute, location='all') == ({'n': 2}, False)
+
+    # Losing the generation must not bring back an older one's entries
+    cache.delete(GENERATION_KEY)
+    assert cached_stats(compute, location='all') == ({'n': 3}, False)
+    assert cached_stats(compute, location='all') == ({'n': 3}, True)
+
+
+def test_range_edit_changes_the_chart_fingerprint(fleet):
+    pump = fleet[0][0]
+    equipment = Equipment.objects.get(name='EQ-2')
+    Equipment.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+    before = chart_fingerprint('historical_trends', None, equipment_id=equipment.id)
+
+    # Widening the range clears the warning of EQ-2 in one UPDATE
+    pump.max_pressure = 20
+    pump.save()
+
+    equipment.refresh_from_db()
+    assert equipment.status == 'normal'
+    assert chart_fingerprint('historical_trends', None, equipment_id=equipment.id) != before
+
+
+def _rollup():
+    return sorted(EquipmentStatusRollup.objects.values_list(
+        'plant_location_id', 'equipment_type_id', 'status', 'is_active',
+        'equipment_count', 'sum_pressure', 'min_pressure', 'max_pressure'
+    ))
+
+
+def test_rollup_deltas_match_a_rescan(fleet):
+    types, locations = fleet
+    assert rollup_drift() == {}
+
+    # Moves between status groups, new equipment, and groups losing an extreme
+    ingest_dataframe(_upload(
+        ['EQ-0', 'Pump', 'Plant A', 10, 16.0, 50],
+        ['EQ-1', 'Valve', 'Plant B', 20, 40.0, 50],
+        ['EQ-5', 'Pump', 'Plant A', 15, 3.0, 50],
+    ))
+    assert rollup_drift() == {}
+
+    equipment = Equipment.objects.get(name='EQ-3')
+    equipment.is_active = False
+    equipment.save()
+    Equipment.objects.get(name='EQ-2').delete()
+    assert rollup_drift() == {}
+
+    # Range edits rescan the groups of the type
+    types[1].max_pressure = 50
+    types[1].save()
+    assert rollup_drift() == {}
+
+    incremental = _rollup()
+    rebuild_rollup()
+    assert _rollup() == incremental
+
+
+def test_rollup_drift_reports_and_rebuild_repairs(fleet):
+    EquipmentStatusRollup.objects.filter(status='normal').update(equipment_count=99)
+    drift = rollup_drift()
+    assert drift and all(stored['equipment_count'] == 99 for stored, actual in drift.values())
+
+    rebuild_rollup()
+    assert rollup_drift() == {}
+
+
+def _buckets():
+    return sorted(ReadingAggregate.objects.values_list(
+        'plant_location_id', 'equipment_type_id', 'bucket', 'bucket_start',
+        'reading_count', 'warning_count', 'sum_pressure', 'min_pressure', 'max_pressure'
+    ))
+
+
+def test_reading_aggregates_bucket_by_hour_and_day(fleet):
+    equipment = Equipment.objects.get(name='EQ-0')
+    day = datetime(2026, 3, 10, tzinfo=dt_timezone.utc)
+    for hours, pressure, status in [
+        (22.5, 1.0, 'normal'), (23.2, 2.0, 'normal'),
+        (24.1, 3.0, 'normal'), (36, 4.0, 'normal'),
+        (49.75, 16.0, 'warning'),
+    ]:
+        EquipmentReading.objects.create(
+            equipment=equipment, flowrate=10, pressure=pressure, temperature=50,
+            status=status, timestamp=day + timedelta(hours=hours)
+        )
+
+    assert ReadingAggregate.objects.filter(bucket='hour').count() == 5
+    assert ReadingAggregate.objects.filter(bucket='day').count() == 3
+
+    # The whole middle day from its daily bucket, the ragged ends from hourly ones
+    totals = window_totals(day + timedelta(hours=23), day + timedelta(hours=50))
+    assert (totals['reading_count'], totals['warning_count']) == (4, 1)
+    assert totals['avg_pressure'] == (2.0 + 3.0 + 4.0 + 16.0) / 4
+    assert totals['max_flowrate'] == 10
+
+    # Within a day only hourly buckets, from the start of the first hour
+    totals = window_totals(day + timedelta(hours=24.5), day + timedelta(hours=37))
+    assert totals['reading_count'] == 2
+
+    incremental = _buckets()
+    rebuild_aggregates()
+    assert _buckets() == incremental
+
+
+def _upload(*rows):
+    return pd.DataFrame(rows, columns=['name', 'type', 'location', 'flowrate', 'pressure', 'temperature'])
+
+
+@pytest.mark.django_db
+def test_ingest_upserts_equipment_by_name():
+    result = ingest_dataframe(_upload(
+        ['P-1', 'Pump', 'Plant A', 10, 2, 50],
+        ['P-2', 'Pump', 'Plant A', 20, 3, 60],
+        ['P-1', 'Pump', 'Plant A', 11, 4, 55],
+    ))
+    assert (result['records_processed'], result['records_success'], result['records_failed']) == (3, 3, 0)
+    assert Equipment.objects.count() == 2
+    # Later rows for the same equipment win
+    assert Equipment.objects.get(name='P-1').pressure == 4
+
+    result = ingest_dataframe(_upload(
+        ['P-2', 'Pump', 'Plant A', 25, 5, 65],
+        ['P-3', 'Valve', 'Plant A', 30, 1, 40],
+    ))
+    assert result['records_success'] == 2
+    assert Equipment.objects.count() == 3
+    p2 = Equipment.objects.get(name='P-2')
+    assert (p2.flowrate, p2.pressure, p2.temperature) == (25, 5, 65)
+    assert EquipmentReading.objects.count() == 5
+
+
+@pytest.mark.django_db
+def test_ingest_rejects_rows_of_equipment_at_another_location():
+    ingest_dataframe(_upload(['P-1', 'Pump', 'Plant A', 10, 2, 50]))
+    result = ingest_dataframe(_upload(
+        ['P-1', 'Pump', 'Plant B', 12, 2, 50],
+        ['P-2', 'Pump', 'Plant B', 12, 2, 50],
+    ))
+
+    assert (result['records_success'], result['records_failed']) == (1, 1)
+    assert result['errors'] == ["Row 1: Equipment 'P-1' already exists at another plant location"]
+    assert Equipment.objects.get(name='P-1').flowrate == 10
+
+
+
+def test_status_bands_and_hysteresis():
+    # Pressure 0-15 bar: critical 3.75 bar past a limit, deadband 0.75 bar
+    ranges = RangeTable.from_types([EquipmentType(id=1, **DEFAULT_TYPE_RANGES)])
+
+    def statuses(pressures, previous):
+        n = len(pressures)
+        return ranges.evaluate([1] * n, [10] * n, pressures, [50] * n, previous=previous).tolist()
+
+    assert statuses([5, 16, 19, -1], ['normal'] * 4) == ['normal', 'warning', 'critical', 'warning']
+    assert statuses([14.5, 14.0], ['warning'] * 2) == ['warning', 'normal']
+    assert statuses([18.5, 17.5, 14.5], ['critical'] * 3) == ['critical', 'warning', 'warning']
+    assert ranges.evaluate([1], [10], [5], [50], [False]).tolist() == ['offline']
+
+
+def test_chunk_of_readings_ends_in_the_status_of_separate_uploads(db):
+    EquipmentType.objects.create(name='Pump', **DEFAULT_TYPE_RANGES, hysteresis=0.05)
+
+    ingest_dataframe(_upload(
+        ['P-1', 'Pump', 'Plant A', 10, 16.0, 50],
+        ['P-1', 'Pump', 'Plant A', 10, 14.625, 50],
+    ))
+    for pressure in (16.0, 14.625):
+        ingest_dataframe(_upload(['P-2', 'Pump', 'Plant A', 10, pressure, 50]))
+
+    # 14.625 bar is back in range but within the deadband of the warning
+    assert Equipment.objects.get(name='P-1').status == 'warning'
+    assert Equipment.objects.get(name='P-2').status == 'warning'
+    for name in ('P-1', 'P-2'):
+        assert list(EquipmentReading.objects.filter(
+            equipment__name=name
+        ).order_by('id').values_list('status', flat=True)) == ['warning', 'warning']
+
+
+def test_alerts_follow_the_status_hysteresis(db):
+    EquipmentType.objects.create(name='Pump', **DEFAULT_TYPE_RANGES, hysteresis=0.05)
+
+    ingest_dataframe(_upload(['P-1', 'Pump', 'Plant A', 10, 16.0, 50]))
+    # Held in warning by the deadband, so still offending
+    result = ingest_dataframe(_upload(['P-1', 'Pump', 'Plant A', 10, 14.625, 50]))
+    assert (result['alerts_created'], result['alerts_updated']) == (0, 1)
+    result = ingest_dataframe(_upload(['P-1', 'Pump', 'Plant A', 10, 14.0, 50]))
+    assert (result['alerts_created'], result['alerts_updated']) == (0, 0)
+
+    # The same readings in one upload count the same
+    ingest_dataframe(_upload(
+        ['P-2', 'Pump', 'Plant A', 10, 16.0, 50],
+        ['P-2', 'Pump', 'Plant A', 10, 14.625, 50],
+        ['P-2', 'Pump', 'Plant A', 10, 14.0, 50],
+    ))
+    for name in ('P-1', 'P-2'):
+        alert = Alert.objects.get(equipment__name=name)
+        assert (alert.parameter, alert.severity, alert.occurrences) == ('pressure', 'warning', 2)
+        assert (alert.value, alert.threshold) == (14.625, 15)
+        assert alert.title == 'Pressure above safe range'
+
+
+def test_repeat_violations_fold_into_the_open_alert(db):
+    result = ingest_dataframe(_upload(
+        ['P-1', 'Pump', 'Plant A', 10, 16.0, 50],
+        ['P-1', 'Pump', 'Plant A', 10, 16.5, 50],
+    ))
+    assert (result['alerts_created'], result['alerts_updated']) == (1, 0)
+    result = ingest_dataframe(_upload(['P-1', 'Pump', 'Plant A', 10, 20.0, 50]))
+    assert (result['alerts_created'], result['alerts_updated']) == (0, 1)
+
+    alert = Alert.objects.get()
+    assert (alert.severity, alert.value, alert.occurrences) == ('critical', 20.0, 3)
+
+    # Once resolved, the next violation opens a new alert
+    Alert.objects.update(status='resolved')
+    result = ingest_dataframe(_upload(['P-1', 'Pump', 'Plant A', 10, 16.0, 50]))
+    assert (result['alerts_created'], result['alerts_updated']) == (1, 0)
+    assert Alert.objects.filter(status='open').get().severity == 'warning'
+
+
+def test_alert_opened_concurrently_is_folded_into(db, monkeypatch):
+    ingest_dataframe(_upload(['P-1', 'Pump', 'Plant A', 10, 16.0, 50]))
+
+    # Another upload opens the alert after this one looked for it
+    open_alerts = alerts._open_alerts
+    lookups = []
+
+    def stale_then_current(equipment_ids):
+        lookups.append(equipment_ids)
+        return open_alerts(equipment_ids) if len(lookups) > 1 else {}
+
+    monkeypatch.setattr(alerts, '_open_alerts', stale_then_current)
+    result = ingest_dataframe(_upload(
+        ['P-1', 'Pump', 'Plant A', 10, 16.0, 50],
+        ['P-2', 'Pump', 'Plant A', 10, 16.0, 50],
+    ))
+
+    assert len(lookups) == 2
+    assert (result['alerts_created'], result['alerts_updated']) == (1, 1)
+    assert Alert.objects.count() == 2
+    assert Alert.objects.get(equipment__name='P-1').occurrences == 2
+
+
+def test_validate_rows_coerces_columns_and_reports_rejected_rows():
+    df = normalize_columns(pd.read_csv(io.StringIO(
+        'Equipment Name,Category,Site,Flowrate,Pressure,Temperature\n'
+        ' P-1 ,Pump,,12.5,abc,\n'
+        ',Pump,Plant A,1,2,3\n'
+        'P-3,,Plant A,1,2,3\n'
+        'P-4,Valve, Plant B ,7,8,-9\n'
+    )))
+    rows, errors = validate_rows(df)
+
+    assert rows['row'].tolist() == [1, 4]
+    assert rows['name'].tolist() == ['P-1', 'P-4']
+    assert rows['location'].tolist() == [DEFAULT_LOCATION, 'Plant B']
+    # Unparseable and blank numbers become 0
+    assert rows[['flowrate', 'pressure', 'temperature']].values.tolist() == [[12.5, 0, 0], [7, 8, -9]]
+    assert rows['pressure'].dtype == float
+    assert errors == [(2, 'Skipping row: Name or Type is empty'), (3, 'Skipping row: Name or Type is empty')]
+
+
+def test_normalize_columns_requires_name_and_type():
+    with pytest.raises(ValueError, match='Missing columns'):
+        normalize_columns(pd.DataFrame(columns=['Equipment Name', 'Flowrate']))
+
+
+def test_upsert_leaves_out_the_conflict_target_where_unsupported(monkeypatch):
+    assert conflict_target(['name']) == (
+        {'unique_fields': ['name']} if connection.features.supports_update_conflicts_with_target else {}
+    )
+    monkeypatch.setattr(connection.features, 'supports_update_conflicts_with_target', False)
+    assert conflict_target(['name']) == {}
+
+
+@pytest.mark.django_db
+def test_reclaimed_upload_resumes_and_keeps_row_errors(settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = tmp_path
+    read_chunks = tasks.read_chunks
+    monkeypatch.setattr(tasks, 'read_chunks', lambda *args, **kwargs: read_chunks(*args, chunk_size=2, **kwargs))
+
+    content = b'name,type,pressure\nP-1,,2\nP-2,Pump,2\nP-3,Pump,2\nP-4,Pump,2\n'
+    upload = UploadHistory(file_name='readings.csv', file_size=len(content))
+    upload.file_path.save('readings.csv', ContentFile(content))
+
+    # The first worker dies after committing the first chunk
+    stream_file = tasks._stream_file
+
+    def dies_after_one_chunk(upload_history):
+        chunks = stream_file(upload_history)
+        yield next(chunks)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(tasks, '_stream_file', dies_after_one_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        tasks.process_upload(upload.pk)
+    monkeypatch.setattr(tasks, '_stream_file', stream_file)
+
+    # Not stale yet, so nothing is reclaimed
+    assert tasks.process_pending_uploads() == 0
+    UploadHistory.objects.filter(pk=upload.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+    assert tasks.process_pending_uploads() == 1
+
+    upload.refresh_from_db()
+    assert upload.status == 'failed'
+    assert (upload.records_processed, upload.records_success, upload.records_failed) == (4, 3, 1)
+    assert upload.error_log == 'Row 1: Skipping row: Name or Type is empty'
+    assert EquipmentReading.objects.count() == 3
+
+
+
+SESSION_CONTENT = b'name,type\nP-1,Pump\n'
+
+
+@pytest.fixture
+def complete_session(db, settings, tmp_path, monkeypatch):
+    """A chunked upload session whose part file has been received in full."""
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.UPLOAD_SESSION_DIR = tmp_path / 'partial'
+    settings.UPLOAD_SESSION_DIR.mkdir()
+    monkeypatch.setattr(chunked, 'enqueue_upload', lambda upload_id: None)
+    session = UploadSession.objects.create(
+        file_name='equipment.csv',
+        file_size=len(SESSION_CONTENT),
+        received_bytes=len(SESSION_CONTENT),
+        uploaded_by=User.objects.create(username='uploader')
+    )
+    with open(part_path(session), 'wb') as f:
+        f.write(SESSION_CONTENT)
+    return session
+
+
+def test_failed_finalize_keeps_the_session_data(
+    complete_session, settings, monkeypatch, django_capture_on_commit_callbacks
+):
+    create = UploadHistory.objects.create
+
+    def fail(**kwargs):
+        raise DatabaseError('insert failed')
+
+    monkeypatch.setattr(UploadHistory.objects, 'create', fail)
+    with pytest.raises(DatabaseError):
+        finalize_session(complete_session)
+    complete_session.refresh_from_db()
+    assert complete_session.upload is None
+    assert os.path.exists(part_path(complete_session))
+    assert not [path for path in settings.MEDIA_ROOT.rglob('*') if path.is_file()]
+
+    # Finalizing again succeeds with the data kept
+    monkeypatch.setattr(UploadHistory.objects, 'create', create)
+    with django_capture_on_commit_callbacks(execute=True):
+        upload, duplicate = finalize_session(complete_session)
+    assert not duplicate
+    assert upload.file_path.read() == SESSION_CONTENT
+    assert not os.path.exists(part_path(complete_session))
+
+
+def test_duplicate_finalize_removes_the_part_file_on_commit(
+    complete_session, django_capture_on_commit_callbacks
+):
+    previous = UploadHistory.objects.create(
+        file_name='earlier.csv',
+        file_path='uploads/earlier.csv',
+        file_size=len(SESSION_CONTENT),
+        content_hash=hashlib.sha256(SESSION_CONTENT).hexdigest(),
+        status='completed'
+    )
+    with django_capture_on_commit_callbacks() as callbacks:
+        upload, duplicate = finalize_session(complete_session)
+        assert os.path.exists(part_path(complete_session))
+    assert (upload, duplicate) == (previous, True)
+
+    for callback in callbacks:
+        callback()
+    assert not os.path.exists(part_path(complete_session))
+
+
+def test_charts_rendered_concurrently_match_a_single_thread():
+    data = sample_data()
+    jobs = [
+        (chart_type, dark_mode, image_format)
+        for chart_type in ('status_distribution', 'plant_location_comparison')
+        for dark_mode in (False, True) for image_format in IMAGE_FORMATS
+    ]
+
+    def render(job):
+        chart_type, dark_mode, image_format = job
+        return render_chart(chart_type, data[chart_type], dark_mode, image_format)
+
+    reference = {job: render(job) for job in jobs}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        rendered = list(pool.map(render, jobs * 3))
+    assert rendered == [reference[job] for job in jobs * 3]
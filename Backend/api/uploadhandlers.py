@@ -0,0 +1,60 @@
+"""
+Upload handlers and helpers for content hashing.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+from equipment.models import UploadHistory
+
+
+HASH_ALGORITHM = 'sha256'
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Hash uploaded files while they stream in.
+
+    Sits in front of the memory/temporary-file handlers and passes every
+    chunk through unchanged. Digests end up in
+    ``request.upload_content_hashes`` keyed by form field name.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.new(HASH_ALGORITHM)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        hashes = getattr(self.request, 'upload_content_hashes', {})
+        hashes[self.field_name] = self.hasher.hexdigest()
+        self.request.upload_content_hashes = hashes
+        return None
+
+
+def hash_file(file_obj):
+    """Hash a Django ``File`` chunk by chunk."""
+    hasher = hashlib.new(HASH_ALGORITHM)
+    for chunk in file_obj.chunks():
+        hasher.update(chunk)
+    file_obj.seek(0)
+    return hasher.hexdigest()
+
+
+def find_duplicate_upload(content_hash):
+    """
+    Latest upload with the same content, if any.
+
+    Archived uploads and uploads that failed before any row was processed
+    (unreadable file, server error) are not reused.
+    """
+    return UploadHistory.objects.filter(
+        content_hash=content_hash
+    ).exclude(
+        status='archived'
+    ).exclude(
+        status='failed', records_processed=0
+    ).order_by('-created_at').first()
@@ -6,7 +6,11 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     EquipmentTypeViewSet, PlantLocationViewSet, EquipmentViewSet,
     EquipmentReadingViewSet, AlertViewSet, UploadHistoryViewSet,
-    dashboard_stats, charts, upload_csv, export_data
+    dashboard_stats, dashboard_cache_stats, charts, chart_cache_stats, chart_series,
+    upload_csv, export_data,
+    upload_session_init, upload_session_status,
+    upload_session_chunk, upload_session_finalize,
+    upload_batch, upload_batch_status, upload_preview
 )
 
 # Create router
@@ -24,7 +28,17 @@ urlpatterns = [
     
     # Custom endpoints
     path('dashboard/stats/', dashboard_stats, name='dashboard-stats'),
+    path('dashboard/stats/cache/', dashboard_cache_stats, name='dashboard-cache-stats'),
     path('charts/', charts, name='charts'),
+    path('charts/cache/', chart_cache_stats, name='chart-cache-stats'),
+    path('charts/series/<str:chart_type>/', chart_series, name='chart-series'),
     path('upload/', upload_csv, name='upload-csv'),
+    path('upload/preview/', upload_preview, name='upload-preview'),
+    path('upload/sessions/', upload_session_init, name='upload-session-init'),
+    path('upload/sessions/<uuid:session_id>/', upload_session_status, name='upload-session-status'),
+    path('upload/sessions/<uuid:session_id>/chunk/', upload_session_chunk, name='upload-session-chunk'),
+    path('upload/sessions/<uuid:session_id>/finalize/', upload_session_finalize, name='upload-session-finalize'),
+    path('upload/batch/', upload_batch, name='upload-batch'),
+    path('upload/batch/<uuid:batch_id>/', upload_batch_status, name='upload-batch-status'),
     path('export/', export_data, name='export-data'),
 ]
@@ -2,18 +2,35 @@
 API Views for equipment monitoring system.
 """
 from rest_framework import viewsets, status, filters
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Count, Avg, Max, Q
+from rest_framework.renderers import JSONRenderer
+from django.core.files import File
+from django.http import HttpResponseNotModified
+from django.db import transaction
+from django.db.models import Count, Avg, Max, Sum, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+from django.shortcuts import get_object_or_404
 from datetime import timedelta
+import os
+import zipfile
 import pandas as pd
 
 from equipment.models import (
     EquipmentType, PlantLocation, Equipment,
-    EquipmentReading, Alert, UploadHistory
+    EquipmentReading, EquipmentStatusRollup, Alert,
+    UploadHistory, UploadSession, UploadBatch
 )
+from equipment.status import RangeTable, apply_status
+from equipment.alerts import detect_alerts, raise_alerts
+from equipment.aggregates import parse_timeframe, record_readings, window_totals
+from equipment.rollup import equipment_state, update_rollup
+from equipment.stats_cache import cached_stats, cache_counters, invalidate_dashboard
 from .serializers import (
     EquipmentTypeSerializer, PlantLocationSerializer,
     EquipmentListSerializer, EquipmentDetailSerializer,
@@ -21,13 +38,20 @@ from .serializers import (
     UploadHistorySerializer, DashboardStatsSerializer
 )
 from .charts import (
-    generate_flowrate_comparison_chart,
-    generate_temperature_pressure_trends,
-    generate_equipment_type_distribution,
-    generate_pressure_temperature_scatter,
-    generate_historical_trends,
-    generate_status_distribution,
-    generate_plant_location_comparison
+    CHART_TYPES, chart_data, chart_fingerprint, chart_cache_key, cached_chart,
+    chart_cache_counters, png_to_data_uri
+)
+from .renderers import PNGRenderer, SVGRenderer
+from .chart_pool import (
+    RETRY_AFTER as CHART_RETRY_AFTER, RenderUnavailable, render as render_chart_image
+)
+from .tasks import enqueue_upload, enqueue_batch
+from .uploadhandlers import hash_file, find_duplicate_upload
+from .ingestion import parse_sheet_names
+from .preview import SAMPLE_SIZE, MAX_SAMPLE_SIZE, preview_file
+from .chunked import (
+    CHUNK_SIZE as UPLOAD_CHUNK_SIZE, OffsetMismatch, AlreadyFinalized,
+    write_chunk, finalize_session
 )
 
 
@@ -144,31 +168,72 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     def bulk_update(self, request):
         """Bulk update equipment readings."""
         data = request.data.get('equipment', [])
-        updated_count = 0
         
+        items = {}
         for item in data:
             try:
-                equipment = Equipment.objects.get(id=item['id'])
-                equipment.flowrate = item.get('flowrate', equipment.flowrate)
-                equipment.pressure = item.get('pressure', equipment.pressure)
-                equipment.temperature = item.get('temperature', equipment.temperature)
-                equipment.save()
-                
-                # Create reading record
-                EquipmentReading.objects.create(
+                items[int(item['id'])] = item
+            except (KeyError, TypeError, ValueError):
+                continue
+        
+        # One query to load, one vectorised status pass, batched writes
+        now = timezone.now()
+        equipment_list = list(Equipment.objects.filter(id__in=items.keys()))
+        before = equipment_state(equipment_list)
+        for equipment in equipment_list:
+            item = items[equipment.id]
+            equipment.flowrate = item.get('flowrate', equipment.flowrate)
+            equipment.pressure = item.get('pressure', equipment.pressure)
+            equipment.temperature = item.get('temperature', equipment.temperature)
+            equipment.updated_at = now
+        ranges = RangeTable.load({equipment.equipment_type_id for equipment in equipment_list})
+        apply_status(equipment_list, ranges)
+        
+        with transaction.atomic():
+            Equipment.objects.bulk_update(
+                equipment_list,
+                ['flowrate', 'pressure', 'temperature', 'status', 'updated_at'],
+                batch_size=500
+            )
+            update_rollup(before, equipment_state(equipment_list))
+            invalidate_dashboard()
+            
+            # Create reading records
+            EquipmentReading.objects.bulk_create([
+                EquipmentReading(
                     equipment=equipment,
                     flowrate=equipment.flowrate,
                     pressure=equipment.pressure,
                     temperature=equipment.temperature,
-                    status=equipment.status
+                    status=equipment.status,
+                    timestamp=now
                 )
-                updated_count += 1
-            except Equipment.DoesNotExist:
-                continue
+                for equipment in equipment_list
+            ], batch_size=500)
+            record_readings(pd.DataFrame(
+                [
+                    (e.plant_location_id, e.equipment_type_id, e.status,
+                     e.flowrate, e.pressure, e.temperature)
+                    for e in equipment_list
+                ],
+                columns=['plant_location_id', 'equipment_type_id', 'status', 'flowrate', 'pressure', 'temperature']
+            ).assign(timestamp=now))
+            
+            # Raise alerts for readings out of range
+            alerts_created, alerts_updated = raise_alerts(detect_alerts(ranges, pd.DataFrame(
+                [
+                    (e.id, e.equipment_type_id, e.name, e.flowrate, e.pressure, e.temperature)
+                    for e in equipment_list
+                ],
+                columns=['equipment_id', 'equipment_type_id', 'name', 'flowrate', 'pressure', 'temperature']
+            ), previous=before['status'].to_numpy()))
         
+        updated_count = len(equipment_list)
         return Response({
             'message': f'Updated {updated_count} equipment records',
-            'updated_count': updated_count
+            'updated_count': updated_count,
+            'alerts_created': alerts_created,
+            'alerts_updated': alerts_updated
         })
 
 
@@ -271,6 +336,103 @@ class AlertViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(alert)
         return Response(serializer.data)
+    
+    def _bulk_selection(self, request):
+        """
+        Alerts picked by a bulk action: ``ids`` and/or ``equipment``,
+        ``severity``, ``created_after`` and ``created_before`` in the body.
+        Returns ``(queryset, error)``.
+        """
+        data = request.data
+        alerts = Alert.objects.all()
+        selected = False
+        
+        ids = data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list):
+                return None, 'ids must be a list of integers'
+            try:
+                alerts = alerts.filter(id__in=[int(i) for i in ids])
+            except (TypeError, ValueError):
+                return None, 'ids must be a list of integers'
+            selected = True
+        
+        if data.get('equipment'):
+            try:
+                alerts = alerts.filter(equipment_id=int(data['equipment']))
+            except (TypeError, ValueError):
+                return None, 'equipment must be an integer'
+            selected = True
+        
+        if data.get('severity'):
+            severities = [value for value, _ in Alert.SEVERITY_CHOICES]
+            if data['severity'] not in severities:
+                return None, f"severity must be one of: {', '.join(severities)}"
+            alerts = alerts.filter(severity=data['severity'])
+            selected = True
+        
+        for field, lookup in (('created_after', 'created_at__gte'), ('created_before', 'created_at__lte')):
+            if not data.get(field):
+                continue
+            value = parse_datetime(str(data[field]))
+            if value is None:
+                return None, f'{field} must be an ISO 8601 datetime'
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            alerts = alerts.filter(**{lookup: value})
+            selected = True
+        
+        # An empty body must not touch every alert in the plant
+        if not selected:
+            return None, 'Provide ids or at least one filter'
+        return alerts, None
+    
+    @action(detail=False, methods=['post'])
+    def bulk_acknowledge(self, request):
+        """Acknowledge every open alert in the selection with one UPDATE."""
+        alerts, error = self._bulk_selection(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        now = timezone.now()
+        matched = alerts.count()
+        acknowledged = alerts.filter(status='open').update(
+            status='acknowledged',
+            acknowledged_by=request.user,
+            acknowledged_at=now,
+            updated_at=now
+        )
+        if acknowledged:
+            invalidate_dashboard()
+        return Response({
+            'matched': matched,
+            'acknowledged': acknowledged,
+            'skipped': matched - acknowledged
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk_resolve(self, request):
+        """Resolve every unresolved alert in the selection with one UPDATE."""
+        alerts, error = self._bulk_selection(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        now = timezone.now()
+        matched = alerts.count()
+        resolved = alerts.exclude(status='resolved').update(
+            status='resolved',
+            resolved_by=request.user,
+            resolved_at=now,
+            resolution_notes=request.data.get('resolution_notes', ''),
+            updated_at=now
+        )
+        if resolved:
+            invalidate_dashboard()
+        return Response({
+            'matched': matched,
+            'resolved': resolved,
+            'skipped': matched - resolved
+        })
 
 
 class UploadHistoryViewSet(viewsets.ModelViewSet):
@@ -293,114 +455,262 @@ class UploadHistoryViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(status=upload_status)
         
         return queryset
+    
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """Get processing progress for an upload."""
+        upload = self.get_object()
+        
+        return Response({
+            'upload_id': upload.id,
+            'status': upload.status,
+            'progress': upload.progress,
+            'records_processed': upload.records_processed,
+            'records_success': upload.records_success,
+            'records_failed': upload.records_failed,
+            'errors': upload.error_log.splitlines()[:10] if upload.completed_at else []
+        })
+
+
+def _compute_dashboard_stats(plant_location, equipment_type, timeframe='all'):
+    """
+    Dashboard statistics for the filtered equipment. Status counts come
+    from the status rollup. With a timeframe other than 'all' the reading
+    statistics cover the readings taken within it, read from the hourly
+    and daily reading aggregates; otherwise the equipment's current readings.
+    """
+    rollup = EquipmentStatusRollup.objects.filter(is_active=True)
+    
+    if plant_location != 'all':
+        rollup = rollup.filter(plant_location_id=plant_location)
+    
+    if equipment_type != 'all':
+        rollup = rollup.filter(equipment_type_id=equipment_type)
+    
+    # Per-status counts and reading totals summed over the rollup groups
+    open_alerts = Alert.objects.filter(status='open').order_by().values('status').annotate(
+        n=Count('id')
+    ).values('n')
+    aggregations = rollup.aggregate(
+        total_equipment=Sum('equipment_count'),
+        normal_count=Sum('equipment_count', filter=Q(status='normal')),
+        warning_count=Sum('equipment_count', filter=Q(status='warning')),
+        critical_count=Sum('equipment_count', filter=Q(status='critical')),
+        offline_count=Sum('equipment_count', filter=Q(status='offline')),
+        sum_pressure=Sum('sum_pressure'),
+        sum_temperature=Sum('sum_temperature'),
+        max_flowrate=Max('max_flowrate'),
+        # The plant-wide open alert count rides along in the same query.
+        # aggregate() only takes aggregates, hence the Max over the (constant)
+        # subquery; Max is NULL when no rollup rows match the filters, hence
+        # the bare subquery as the fallback.
+        active_alerts=Coalesce(Max(Subquery(open_alerts)), Subquery(open_alerts))
+    )
+    
+    total = aggregations['total_equipment'] or 0
+    stats = {
+        'total_equipment': total,
+        'normal_count': aggregations['normal_count'] or 0,
+        'warning_count': aggregations['warning_count'] or 0,
+        'critical_count': aggregations['critical_count'] or 0,
+        'offline_count': aggregations['offline_count'] or 0,
+        'avg_pressure': round(aggregations['sum_pressure'] / total, 2) if total else 0,
+        'avg_temperature': round(aggregations['sum_temperature'] / total, 2) if total else 0,
+        'max_flowrate': round(aggregations['max_flowrate'] or 0, 2),
+        'active_alerts': aggregations['active_alerts'] or 0,
+        'timeframe': timeframe
+    }
+    
+    window = parse_timeframe(timeframe)
+    if window is not None:
+        totals = window_totals(
+            timezone.now() - window,
+            plant_location=None if plant_location == 'all' else plant_location,
+            equipment_type=None if equipment_type == 'all' else equipment_type
+        )
+        stats.update({
+            'avg_pressure': round(totals['avg_pressure'] or 0, 2),
+            'avg_temperature': round(totals['avg_temperature'] or 0, 2),
+            'max_flowrate': round(totals['max_flowrate'] or 0, 2),
+            'reading_count': totals['reading_count'],
+            'normal_readings': totals['normal_count'],
+            'warning_readings': totals['warning_count'],
+            'critical_readings': totals['critical_count'],
+        })
+    return DashboardStatsSerializer(stats).data
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
-    """Get dashboard statistics."""
+    """
+    Get dashboard statistics, served from the cache until equipment or
+    alerts change. ``timeframe`` ('24h', '7d', '30d', '90d' or 'all')
+    limits the reading statistics to recent readings.
+    """
     
     # Get filter parameters
-    timeframe = request.query_params.get('timeframe', 'all')
-    plant_location = request.query_params.get('plant_location', None)
-    equipment_type = request.query_params.get('equipment_type', None)
+    timeframe = request.query_params.get('timeframe') or 'all'
+    plant_location = request.query_params.get('plant_location') or 'all'
+    equipment_type = request.query_params.get('equipment_type') or 'all'
+    
+    try:
+        parse_timeframe(timeframe)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    stats, hit = cached_stats(
+        lambda: _compute_dashboard_stats(plant_location, equipment_type, timeframe),
+        timeframe=timeframe,
+        plant_location=plant_location,
+        equipment_type=equipment_type
+    )
     
-    # Base queryset
+    response = Response(stats)
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_cache_stats(request):
+    """Hit and miss counters of the dashboard statistics cache."""
+    return Response(cache_counters())
+
+
+# Longest history a chart may cover, in days
+CHART_MAX_DAYS = 3650
+
+
+def _integer_param(request, name):
+    try:
+        return int(request.query_params[name])
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+
+
+def _chart_filters(request):
+    """
+    Equipment queryset and filter values shared by the chart endpoints.
+    Raises ValueError naming the parameter when one is malformed.
+    """
     queryset = Equipment.objects.filter(is_active=True)
     
-    # Apply filters
-    if plant_location and plant_location != 'all':
+    plant_location = request.query_params.get('plant_location') or 'all'
+    equipment_type = request.query_params.get('equipment_type') or 'all'
+    equipment_id = None
+    days = 7
+    
+    if plant_location != 'all':
+        plant_location = _integer_param(request, 'plant_location')
         queryset = queryset.filter(plant_location_id=plant_location)
     
-    if equipment_type and equipment_type != 'all':
+    if equipment_type != 'all':
+        equipment_type = _integer_param(request, 'equipment_type')
         queryset = queryset.filter(equipment_type_id=equipment_type)
     
-    # Calculate statistics
-    total_equipment = queryset.count()
-    normal_count = queryset.filter(status='normal').count()
-    warning_count = queryset.filter(status='warning').count()
-    critical_count = queryset.filter(status='critical').count()
-    offline_count = queryset.filter(status='offline').count()
-    
-    # Aggregations
-    aggregations = queryset.aggregate(
-        avg_pressure=Avg('pressure'),
-        avg_temperature=Avg('temperature'),
-        max_flowrate=Max('flowrate')
-    )
+    if request.query_params.get('equipment_id'):
+        equipment_id = _integer_param(request, 'equipment_id')
     
-    # Active alerts
-    active_alerts = Alert.objects.filter(status='open').count()
+    if request.query_params.get('days'):
+        days = _integer_param(request, 'days')
+        if not 1 <= days <= CHART_MAX_DAYS:
+            raise ValueError(f'days must be between 1 and {CHART_MAX_DAYS}')
     
-    stats = {
-        'total_equipment': total_equipment,
-        'normal_count': normal_count,
-        'warning_count': warning_count,
-        'critical_count': critical_count,
-        'offline_count': offline_count,
-        'avg_pressure': round(aggregations['avg_pressure'] or 0, 2),
-        'avg_temperature': round(aggregations['avg_temperature'] or 0, 2),
-        'max_flowrate': round(aggregations['max_flowrate'] or 0, 2),
-        'active_alerts': active_alerts
+    return queryset, {
+        'plant_location': plant_location,
+        'equipment_type': equipment_type,
+        'equipment_id': equipment_id,
+        'days': days,
     }
-    
-    serializer = DashboardStatsSerializer(stats)
-    return Response(serializer.data)
+
+
+def _if_none_match(request, etag):
+    if_none_match = request.headers.get('If-None-Match', '')
+    return etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+
+
+def _chart_cache_headers(response, etag):
+    # Clients may keep charts but must revalidate them, cheaply, by ETag
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Accept'])
+    return response
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([PNGRenderer, SVGRenderer, JSONRenderer])
 def charts(request):
-    """Generate and return charts."""
+    """
+    Generate and return charts.
+    
+    Returns the image itself: PNG by default, SVG with ``?format=svg`` or
+    ``Accept: image/svg+xml``. ``?format=json`` or ``Accept:
+    application/json`` returns ``{'chart': <PNG data URI>, 'type': ...}``
+    instead. Responses carry an ETag; a matching If-None-Match gets a 304
+    without reading or rendering the chart.
+    """
     
+    representation = request.accepted_renderer.format
+    image_format = 'svg' if representation == 'svg' else 'png'
     chart_type = request.query_params.get('type', 'flowrate_comparison')
     dark_mode = request.query_params.get('dark_mode', 'false').lower() == 'true'
     
-    # Get filtered equipment queryset
-    queryset = Equipment.objects.filter(is_active=True)
-    
-    plant_location = request.query_params.get('plant_location', None)
-    equipment_type = request.query_params.get('equipment_type', None)
-    
-    if plant_location and plant_location != 'all':
-        queryset = queryset.filter(plant_location_id=plant_location)
+    if chart_type not in CHART_TYPES:
+        return Response(
+            {'error': 'Invalid chart type'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    if equipment_type and equipment_type != 'all':
-        queryset = queryset.filter(equipment_type_id=equipment_type)
+    try:
+        queryset, filters = _chart_filters(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    equipment_id, days = filters['equipment_id'], filters['days']
     
-    chart_data = None
+    def render():
+        # Query here, draw in the render processes
+        data = chart_data(chart_type, queryset, equipment_id, days)
+        if data is None:
+            return None
+        return render_chart_image(chart_type, data, dark_mode, image_format)
     
     try:
-        if chart_type == 'flowrate_comparison':
-            chart_data = generate_flowrate_comparison_chart(queryset, dark_mode)
-        elif chart_type == 'temperature_pressure_trends':
-            chart_data = generate_temperature_pressure_trends(queryset, dark_mode)
-        elif chart_type == 'equipment_type_distribution':
-            chart_data = generate_equipment_type_distribution(dark_mode)
-        elif chart_type == 'pressure_temperature_scatter':
-            chart_data = generate_pressure_temperature_scatter(queryset, dark_mode)
-        elif chart_type == 'status_distribution':
-            chart_data = generate_status_distribution(dark_mode)
-        elif chart_type == 'plant_location_comparison':
-            chart_data = generate_plant_location_comparison(dark_mode)
-        elif chart_type == 'historical_trends':
-            equipment_id = request.query_params.get('equipment_id')
-            days = int(request.query_params.get('days', 7))
-            if equipment_id:
-                chart_data = generate_historical_trends(equipment_id, days, dark_mode)
-        else:
-            return Response(
-                {'error': 'Invalid chart type'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        key = chart_cache_key(
+            chart_type,
+            chart_fingerprint(chart_type, queryset, equipment_id, days),
+            dark_mode,
+            format=image_format,
+            **filters
+        )
+        etag = f'"{key}-{representation}"'
+        if _if_none_match(request, etag):
+            return _chart_cache_headers(HttpResponseNotModified(), etag)
         
-        if chart_data is None:
+        image, hit = cached_chart(key, render, image_format)
+        
+        if image is None:
             return Response(
                 {'error': 'Unable to generate chart'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        return Response({'chart': chart_data, 'type': chart_type})
+        if representation == 'json':
+            response = Response({'chart': png_to_data_uri(image), 'type': chart_type})
+        else:
+            response = Response(image)
+            response['Content-Disposition'] = f'inline; filename="{chart_type}.{image_format}"'
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return _chart_cache_headers(response, etag)
+    
+    except RenderUnavailable as e:
+        response = Response(
+            {'error': f'{e}, try again shortly'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        response['Retry-After'] = str(CHART_RETRY_AFTER)
+        return response
     
     except Exception as e:
         return Response(
@@ -408,18 +718,77 @@ def charts(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def chart_cache_stats(request):
+    """Hit, miss and eviction counters and disk usage of the chart cache."""
+    return Response(chart_cache_counters())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def chart_series(request, chart_type):
+    """
+    The data behind a chart as parallel arrays, for clients that draw
+    charts themselves: ``{'type': ..., 'count': <rows>, 'series':
+    {'names': [...], 'flowrates': [...], ...}}``. Takes the same filters
+    as ``/api/charts/`` and is revalidated by ETag the same way.
+    """
+    if chart_type not in CHART_TYPES:
+        return Response(
+            {'error': 'Invalid chart type'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        queryset, filters = _chart_filters(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    equipment_id, days = filters['equipment_id'], filters['days']
+    if chart_type == 'historical_trends' and equipment_id is None:
+        return Response(
+            {'error': 'equipment_id is required for historical_trends'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        key = chart_cache_key(
+            chart_type,
+            chart_fingerprint(chart_type, queryset, equipment_id, days),
+            format='series',
+            **filters
+        )
+        etag = f'"{key}"'
+        if _if_none_match(request, etag):
+            return _chart_cache_headers(HttpResponseNotModified(), etag)
+        
+        series = chart_data(chart_type, queryset, equipment_id, days) or {}
+    except Equipment.DoesNotExist:
+        return Response(
+            {'error': 'Equipment not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    columns = [values for values in series.values() if isinstance(values, list)]
+    response = Response({
+        'type': chart_type,
+        'count': len(columns[0]) if columns else 0,
+        'series': series,
+    })
+    return _chart_cache_headers(response, etag)
+
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 import pandas as pd
-import math
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def upload_csv(request):
-    """Upload and process CSV / Excel file with equipment data"""
+    """Upload a CSV / Excel file with equipment data and queue it for processing"""
 
     # ---------- File validation ----------
     if 'file' not in request.FILES:
@@ -437,152 +806,382 @@ def upload_csv(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # ---------- Create upload history ----------
+    if str(request.data.get('dry_run', 'false')).lower() == 'true':
+        return _preview_response(request, uploaded_file)
+
+    # ---------- Short-circuit identical re-uploads ----------
+    content_hash = getattr(request, 'upload_content_hashes', {}).get('file') or hash_file(uploaded_file)
+    force = str(request.data.get('force', 'false')).lower() == 'true'
+
+    if not force:
+        previous = find_duplicate_upload(content_hash)
+        if previous is not None:
+            return Response({
+                'message': 'Identical file already uploaded',
+                'upload_id': previous.id,
+                'status': previous.status,
+                'duplicate': True
+            }, status=status.HTTP_200_OK)
+
+    # ---------- Create upload history and queue it ----------
     upload_history = UploadHistory.objects.create(
         file_name=uploaded_file.name,
         file_path=uploaded_file,
         file_size=uploaded_file.size,
-        status='processing',
+        content_hash=content_hash,
+        sheets=request.data.get('sheets', '')[:255],
+        status='pending',
         uploaded_by=request.user
     )
+    enqueue_upload(upload_history.id)
 
+    return Response({
+        'message': 'File queued for processing',
+        'upload_id': upload_history.id,
+        'status': upload_history.status
+    }, status=status.HTTP_202_ACCEPTED)
+
+def _preview_response(request, uploaded_file):
     try:
-        # ---------- IMPORTANT: reset file pointer ----------
-        uploaded_file.seek(0)
+        sample_size = int(request.data.get('sample_size', SAMPLE_SIZE))
+        file_size = int(request.data.get('file_size') or uploaded_file.size)
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'sample_size and file_size must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    sample_size = max(1, min(sample_size, MAX_SAMPLE_SIZE))
 
-        # ---------- Read file ----------
-        if filename.endswith('.csv'):
-            df = pd.read_csv(uploaded_file, encoding='utf-8-sig')
-        else:
-            df = pd.read_excel(uploaded_file, engine="openpyxl")
-
-        # Normalize column names
-        df.columns = df.columns.str.strip().str.lower()
-        
-        column_mapping = {
-            'equipment name': 'name',
-            'equipment_name': 'name',
-            'equipment': 'name',
-            'equipment type': 'type',
-            'equipment_type': 'type',
-            'category': 'type',
-            'plant location': 'location',
-            'plant_location': 'location',
-            'plant': 'location',
-            'site': 'location'
-        }
-        df.rename(columns=column_mapping, inplace=True)
-
-        # ---------- Required columns ----------
-        required_columns = {'name', 'type'}
-        missing_columns = required_columns - set(df.columns)
-
-        if missing_columns:
-            raise ValueError(
-                f"Missing columns. Found: {list(df.columns)}. Expected: {list(required_columns)}"
-            )
+    try:
+        result = preview_file(
+            uploaded_file, uploaded_file.name, sample_size, file_size,
+            sheets=parse_sheet_names(request.data.get('sheets', ''))
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Could not read file: {e}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-        # ---------- Safe float helper ----------
-        def safe_float(value, default=0):
-            try:
-                if value is None or (isinstance(value, float) and math.isnan(value)):
-                    return default
-                return float(value)
-            except Exception:
-                return default
-
-        # ---------- Processing stats ----------
-        records_processed = 0
-        records_success = 0
-        records_failed = 0
-        errors = []
-
-        # ---------- Process rows ----------
-        for index, row in df.iterrows():
-            records_processed += 1
+    return Response({'file_name': uploaded_file.name, 'dry_run': True, **result})
 
-            try:
-                name_val = str(row.get('name', '')).strip()
-                type_val = str(row.get('type', '')).strip()
-                
-                # FIX: Default to 'Main Plant' if location is missing
-                loc_val = str(row.get('location', 'Main Plant')).strip()
-                if loc_val.lower() == 'nan'or not loc_val: # Handle empty cells in Excel
-                    loc_val = 'Main Plant'
-
-                if not name_val or not type_val:
-                    raise ValueError("Skipping row: Name or Type is empty")
-                
-                eq_type, _ = EquipmentType.objects.get_or_create(
-                    name=type_val,
-                    defaults={
-                        'min_flowrate': 0, 'max_flowrate': 200,
-                        'min_pressure': 0, 'max_pressure': 15,
-                        'min_temperature': 0, 'max_temperature': 200
-                    }
-                )
 
-                plant_loc, _ = PlantLocation.objects.get_or_create(
-                    name=loc_val,
-                    defaults={'capacity': 100}
-                )
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_preview(request):
+    """
+    Dry run: map and validate the header and a sample of rows and project
+    the error rate for the whole file, without writing anything.
 
-                # Update or Create Equipment
-                equipment,_ = Equipment.objects.update_or_create(
-                    name=name_val,
-                    plant_location=plant_loc,
-                    defaults={
-                        'equipment_type': eq_type,
-                        'flowrate': safe_float(row.get('flowrate') or 0),
-                        'pressure': safe_float(row.get('pressure') or 0),
-                        'temperature': safe_float(row.get('temperature') or 0),
-                        'is_active': True,
-                        'status': 'normal'
-                    }
-                )
-                # Reading
-                EquipmentReading.objects.create(
-                    equipment=equipment,
-                    flowrate=equipment.flowrate,
-                    pressure=equipment.pressure,
-                    temperature=equipment.temperature,
-                    status=equipment.status
-                )
+    Clients may send just the head of a large CSV along with its real
+    ``file_size`` to get an estimate without uploading the whole file.
+    """
+    if 'file' not in request.FILES:
+        return Response(
+            {'error': 'No file provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    uploaded_file = request.FILES['file']
+    if not uploaded_file.name.lower().endswith(('.csv', '.xls', '.xlsx')):
+        return Response(
+            {'error': 'Only CSV, XLS, and XLSX files are supported'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-                records_success += 1
+    return _preview_response(request, uploaded_file)
 
-            except Exception as row_error:
-                records_failed += 1
-                errors.append(f"Row {index + 1}: {str(row_error)}")
 
-        # ---------- Finalize upload ----------
-        upload_history.status = 'completed' if records_failed == 0 else 'failed'
-        upload_history.records_processed = records_processed
-        upload_history.records_success = records_success
-        upload_history.records_failed = records_failed
-        upload_history.error_log = '\n'.join(errors[:100])
-        upload_history.completed_at = timezone.now()
-        upload_history.save()
+def _session_state(session):
+    return {
+        'session_id': str(session.pk),
+        'file_name': session.file_name,
+        'file_size': session.file_size,
+        'offset': session.received_bytes,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'upload_id': session.upload_id
+    }
 
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_session_init(request):
+    """Open a resumable chunked upload."""
+    file_name = str(request.data.get('file_name', ''))
+
+    if not file_name.lower().endswith(('.csv', '.xls', '.xlsx')):
+        return Response(
+            {'error': 'Only CSV, XLS, and XLSX files are supported'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        file_size = int(request.data.get('file_size'))
+        if file_size <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'file_size must be a positive integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    session = UploadSession.objects.create(
+        file_name=file_name[:255],
+        file_size=file_size,
+        sheets=str(request.data.get('sheets', ''))[:255],
+        uploaded_by=request.user
+    )
+    return Response(_session_state(session), status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def upload_session_status(request, session_id):
+    """Get the confirmed offset of a chunked upload, e.g. to resume it."""
+    session = get_object_or_404(UploadSession, pk=session_id, uploaded_by=request.user)
+    return Response(_session_state(session))
+
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def upload_session_chunk(request, session_id):
+    """
+    Write the raw request body at the offset given by the Upload-Offset header.
+
+    The body is streamed to disk; a mismatching offset returns 409 with the
+    offset the client should resume from.
+    """
+    session = get_object_or_404(UploadSession, pk=session_id, uploaded_by=request.user)
+
+    if session.upload_id is not None:
+        return Response(
+            {'error': 'Upload already finalized'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return Response(
+            {'error': 'Upload-Offset header is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        new_offset = write_chunk(session, request._request, offset, length)
+    except OffsetMismatch:
+        return Response(
+            {'error': 'Offset mismatch', **_session_state(session)},
+            status=status.HTTP_409_CONFLICT
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'session_id': str(session.pk), 'offset': new_offset})
+
+
+def _already_finalized(upload):
+    return Response({
+        'message': 'Upload already finalized',
+        'upload_id': upload.id,
+        'status': upload.status
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_session_finalize(request, session_id):
+    """Assemble a complete chunked upload and queue it for processing."""
+    session = get_object_or_404(UploadSession, pk=session_id, uploaded_by=request.user)
+
+    if session.upload_id is not None:
+        return _already_finalized(session.upload)
+
+    force = str(request.data.get('force', 'false')).lower() == 'true'
+    try:
+        upload, duplicate = finalize_session(session, force=force)
+    except AlreadyFinalized as e:
+        return _already_finalized(e.upload)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if duplicate:
         return Response({
-            'message': 'File processed successfully',
-            'upload_id': upload_history.id,
-            'records_processed': records_processed,
-            'records_success': records_success,
-            'records_failed': records_failed,
-            'errors': errors[:10]
+            'message': 'Identical file already uploaded',
+            'upload_id': upload.id,
+            'status': upload.status,
+            'duplicate': True
         }, status=status.HTTP_200_OK)
 
-    except Exception as e:
-        upload_history.status = 'failed'
-        upload_history.error_log = str(e)
-        upload_history.completed_at = timezone.now()
-        upload_history.save()
+    return Response({
+        'message': 'File queued for processing',
+        'upload_id': upload.id,
+        'status': upload.status
+    }, status=status.HTTP_202_ACCEPTED)
+
+# Files accepted in one batch, counting the members of zip archives
+BATCH_MAX_FILES = 100
+
+# Largest data file a zip archive may unpack to, and the most all of an
+# archive's data files may unpack to together (bytes)
+BATCH_MAX_MEMBER_SIZE = 200 * 1024 * 1024
+BATCH_MAX_ARCHIVE_SIZE = 1024 * 1024 * 1024
+
+DATA_FILE_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+
+
+def _batch_files(uploaded_files):
+    """
+    Yield ``(name, file, size)`` for every data file, unpacking zip archives.
+
+    Raises ValueError before unpacking an archive whose data files are
+    larger than ``BATCH_MAX_MEMBER_SIZE`` or, together, than
+    ``BATCH_MAX_ARCHIVE_SIZE`` once decompressed.
+    """
+    for uploaded_file in uploaded_files:
+        if not uploaded_file.name.lower().endswith('.zip'):
+            yield uploaded_file.name, uploaded_file, uploaded_file.size
+            continue
+
+        archive = zipfile.ZipFile(uploaded_file)
+        members = []
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith('__MACOSX/') or name.startswith('.'):
+                continue
+            if name.lower().endswith(DATA_FILE_EXTENSIONS):
+                members.append((name, info))
+
+        # Reading a member stops at its declared size, so the headers bound
+        # what is written to disk
+        for name, info in members:
+            if info.file_size > BATCH_MAX_MEMBER_SIZE:
+                raise ValueError(
+                    f'{uploaded_file.name}: {name} unpacks to more than '
+                    f'{BATCH_MAX_MEMBER_SIZE // (1024 * 1024)}MB'
+                )
+        if sum(info.file_size for _, info in members) > BATCH_MAX_ARCHIVE_SIZE:
+            raise ValueError(
+                f'{uploaded_file.name} unpacks to more than '
+                f'{BATCH_MAX_ARCHIVE_SIZE // (1024 * 1024)}MB'
+            )
+
+        for name, info in members:
+            yield name, File(archive.open(info), name=name), info.file_size
+
+
+def _batch_summary(batch):
+    uploads = batch.uploads.order_by('id')
+    totals = uploads.aggregate(
+        files=Count('id'),
+        pending=Count('id', filter=Q(status__in=['pending', 'processing'])),
+        completed=Count('id', filter=Q(status='completed')),
+        failed=Count('id', filter=Q(status='failed')),
+        records_processed=Sum('records_processed'),
+        records_success=Sum('records_success'),
+        records_failed=Sum('records_failed'),
+        progress=Avg('progress')
+    )
+
+    if totals['pending']:
+        batch_status = 'processing'
+    elif totals['failed']:
+        batch_status = 'failed'
+    else:
+        batch_status = 'completed'
+
+    return {
+        'batch_id': str(batch.pk),
+        'status': batch_status,
+        'files': totals['files'],
+        'completed': totals['completed'],
+        'failed': totals['failed'],
+        'progress': int(totals['progress'] or 0),
+        'records_processed': totals['records_processed'] or 0,
+        'records_success': totals['records_success'] or 0,
+        'records_failed': totals['records_failed'] or 0,
+        'uploads': UploadHistorySerializer(uploads, many=True).data
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_batch(request):
+    """Upload several CSV / Excel files (or zip archives of them) as one batch"""
 
+    uploaded_files = request.FILES.getlist('files')
+    if not uploaded_files:
         return Response(
-            {'error': f'Failed to process file: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {'error': 'No files provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    unsupported = [
+        f.name for f in uploaded_files
+        if not f.name.lower().endswith(DATA_FILE_EXTENSIONS + ('.zip',))
+    ]
+    if unsupported:
+        return Response(
+            {'error': f'Only CSV, XLS, XLSX and ZIP files are supported: {unsupported}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    force = str(request.data.get('force', 'false')).lower() == 'true'
+    sheets = request.data.get('sheets', '')[:255]
+    duplicates = []
+
+    try:
+        with transaction.atomic():
+            batch = UploadBatch.objects.create(uploaded_by=request.user)
+            queued = 0
+
+            for name, data_file, size in _batch_files(uploaded_files):
+                queued += 1
+                if queued > BATCH_MAX_FILES:
+                    raise ValueError(f'A batch can hold at most {BATCH_MAX_FILES} files')
+
+                content_hash = hash_file(data_file)
+                previous = None if force else find_duplicate_upload(content_hash)
+                if previous is not None:
+                    duplicates.append({'file_name': name, 'upload_id': previous.id})
+                    continue
+
+                UploadHistory.objects.create(
+                    file_name=name,
+                    file_path=data_file,
+                    file_size=size,
+                    content_hash=content_hash,
+                    sheets=sheets,
+                    status='pending',
+                    batch=batch,
+                    uploaded_by=request.user
+                )
+
+            if not queued:
+                raise ValueError('No CSV, XLS or XLSX files found')
+            enqueue_batch(batch.pk)
+
+    except zipfile.BadZipFile:
+        return Response(
+            {'error': 'Invalid zip archive'},
+            status=status.HTTP_400_BAD_REQUEST
         )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    summary = _batch_summary(batch)
+    summary['duplicates'] = duplicates
+    return Response(summary, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def upload_batch_status(request, batch_id):
+    """Aggregate progress of a batch upload and its files."""
+    batch = get_object_or_404(UploadBatch, pk=batch_id, uploaded_by=request.user)
+    return Response(_batch_summary(batch))
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
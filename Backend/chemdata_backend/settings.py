@@ -154,6 +154,52 @@ CORS_ALLOW_CREDENTIALS = True
 CHART_OUTPUT_DIR = MEDIA_ROOT / 'charts'
 os.makedirs(CHART_OUTPUT_DIR, exist_ok=True)
 
+# Rendered charts are cached on disk under CHART_OUTPUT_DIR; the least
+# recently used are evicted once they take more than this many bytes
+CHART_CACHE_MAX_BYTES = config('CHART_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+
+# Processes that render charts off the request threads (0 renders in the
+# request thread), how many renders may be queued or running before
+# requests get a 503, and how long a request waits for its render (seconds)
+CHART_RENDER_PROCESSES = config('CHART_RENDER_PROCESSES', default=os.cpu_count() or 1, cast=int)
+CHART_RENDER_QUEUE_DEPTH = config('CHART_RENDER_QUEUE_DEPTH', default=8, cast=int)
+CHART_RENDER_TIMEOUT = config('CHART_RENDER_TIMEOUT', default=30, cast=float)
+
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+# Uploads above this size are spooled to a temporary file instead of RAM;
+# ingestion then streams them from disk in chunks.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+FILE_UPLOAD_HANDLERS = [
+    'api.uploadhandlers.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Partially received chunked uploads
+UPLOAD_SESSION_DIR = MEDIA_ROOT / 'partial'
+os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+
+# Background upload processing
+UPLOAD_WORKERS = config('UPLOAD_WORKERS', default=2, cast=int)
+
+# Seconds an upload may stay processing without reporting progress before
+# its worker is presumed dead and process_uploads may claim it again
+UPLOAD_CLAIM_TIMEOUT = config('UPLOAD_CLAIM_TIMEOUT', default=600, cast=int)
+
+# Processes that parse the files of a batch upload in parallel
+UPLOAD_PARSE_PROCESSES = config('UPLOAD_PARSE_PROCESSES', default=os.cpu_count() or 1, cast=int)
+
+# Cache
+# Local memory is per process; with several server processes point
+# CACHE_BACKEND at django.core.cache.backends.filebased.FileBasedCache and
+# CACHE_LOCATION at a shared directory so invalidations reach every process.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='chemdata'),
+    }
+}
+
+# Seconds a dashboard statistics entry may live; writes invalidate it sooner
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
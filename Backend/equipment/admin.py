@@ -4,15 +4,23 @@ Admin configuration for Equipment models.
 from django.contrib import admin
 from .models import (
     EquipmentType, PlantLocation, Equipment,
-    EquipmentReading, Alert, UploadHistory
+    EquipmentReading, EquipmentStatusRollup, Alert,
+    UploadHistory, UploadSession, UploadBatch
 )
 
 
 @admin.register(EquipmentType)
 class EquipmentTypeAdmin(admin.ModelAdmin):
-    list_display = ['name', 'min_flowrate', 'max_flowrate', 'min_pressure', 'max_pressure', 'min_temperature', 'max_temperature']
+    list_display = ['name', 'min_flowrate', 'max_flowrate', 'min_pressure', 'max_pressure', 'min_temperature', 'max_temperature', 'critical_band', 'hysteresis']
     search_fields = ['name', 'description']
     list_filter = ['created_at']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Set by the post_save handler that re-evaluates the type's equipment
+        changed = getattr(obj, 'status_changes', 0)
+        if changed:
+            self.message_user(request, f"{changed} equipment status(es) updated for the new ranges.")
 
 
 @admin.register(PlantLocation)
@@ -43,6 +51,19 @@ class EquipmentAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(EquipmentStatusRollup)
+class EquipmentStatusRollupAdmin(admin.ModelAdmin):
+    list_display = ['plant_location', 'equipment_type', 'status', 'is_active', 'equipment_count', 'updated_at']
+    list_filter = ['status', 'is_active', 'plant_location', 'equipment_type']
+    
+    # Maintained by the writers; rebuild with the rebuild_rollup command
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(EquipmentReading)
 class EquipmentReadingAdmin(admin.ModelAdmin):
     list_display = ['equipment', 'flowrate', 'pressure', 'temperature', 'status', 'timestamp']
@@ -53,16 +74,16 @@ class EquipmentReadingAdmin(admin.ModelAdmin):
 
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
-    list_display = ['equipment', 'title', 'severity', 'status', 'parameter', 'value', 'created_at']
+    list_display = ['equipment', 'title', 'severity', 'status', 'parameter', 'value', 'occurrences', 'created_at']
     list_filter = ['severity', 'status', 'parameter', 'created_at']
     search_fields = ['equipment__name', 'title', 'description']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['occurrences', 'last_seen_at', 'created_at', 'updated_at']
     fieldsets = (
         ('Alert Information', {
             'fields': ('equipment', 'title', 'description', 'severity', 'status')
         }),
         ('Data', {
-            'fields': ('parameter', 'value', 'threshold')
+            'fields': ('parameter', 'value', 'threshold', 'occurrences', 'last_seen_at')
         }),
         ('Resolution', {
             'fields': ('acknowledged_by', 'acknowledged_at', 'resolved_by', 'resolved_at', 'resolution_notes')
@@ -79,3 +100,17 @@ class UploadHistoryAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at']
     search_fields = ['file_name', 'uploaded_by__username']
     readonly_fields = ['created_at', 'completed_at']
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'received_bytes', 'file_size', 'upload', 'uploaded_by', 'created_at']
+    search_fields = ['file_name', 'uploaded_by__username']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(UploadBatch)
+class UploadBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'uploaded_by', 'created_at']
+    search_fields = ['uploaded_by__username']
+    readonly_fields = ['created_at']
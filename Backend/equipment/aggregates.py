@@ -0,0 +1,227 @@
+"""
+Hourly and daily aggregates of equipment readings.
+
+Readings are folded into ``ReadingAggregate`` buckets per plant location
+and equipment type as they are written. Statistics over a time window
+then read daily buckets for its whole days and hourly buckets for the
+ragged hours at either end, so the rows read depend on the number of
+groups and days, never on the number of readings.
+"""
+import re
+from datetime import timedelta
+
+import pandas as pd
+from django.db.models import Count, F, FloatField, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, Trunc
+from django.utils import timezone
+
+from .models import EquipmentReading, ReadingAggregate
+from .status import PARAMETERS
+
+
+# Bucket name -> pandas frequency
+BUCKETS = {'hour': 'h', 'day': 'D'}
+
+KEY_FIELDS = ['plant_location_id', 'equipment_type_id', 'bucket', 'bucket_start']
+
+STATUS_COUNTS = {
+    'normal': 'normal_count',
+    'warning': 'warning_count',
+    'critical': 'critical_count',
+}
+
+COUNT_FIELDS = ['reading_count', *STATUS_COUNTS.values()]
+
+TOTAL_FIELDS = COUNT_FIELDS + [
+    f'{total}_{parameter}' for parameter in PARAMETERS for total in ('sum', 'min', 'max')
+]
+
+TIMEFRAME = re.compile(r'^(\d+)([hd])$')
+
+# Buckets written per query
+BATCH_SIZE = 500
+
+
+def parse_timeframe(value):
+    """
+    Length of a timeframe such as '24h' or '90d' as a ``timedelta``; None
+    for 'all'. Raises ``ValueError`` for anything else.
+    """
+    if value in (None, '', 'all'):
+        return None
+    match = TIMEFRAME.match(value)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid timeframe '{value}': use 'all' or a number of hours or days, e.g. '24h', '7d'")
+    amount, unit = int(match.group(1)), match.group(2)
+    return timedelta(hours=amount) if unit == 'h' else timedelta(days=amount)
+
+
+def _plain(key):
+    """A bucket key from a pandas index, with NumPy and pandas scalars made plain Python."""
+    plain = []
+    for value in key:
+        if isinstance(value, pd.Timestamp):
+            value = value.to_pydatetime()
+        elif hasattr(value, 'item'):
+            value = value.item()
+        plain.append(value)
+    return tuple(plain)
+
+
+def record_readings(readings):
+    """
+    Fold new readings into their hourly and daily buckets.
+
+    ``readings`` is a DataFrame with ``plant_location_id``,
+    ``equipment_type_id``, ``timestamp``, ``status`` and the reading columns.
+    Returns the number of buckets touched.
+    """
+    if readings.empty:
+        return 0
+
+    timestamps = pd.to_datetime(readings['timestamp'], utc=True)
+    frame = pd.concat([
+        readings.assign(bucket=bucket, bucket_start=timestamps.dt.floor(freq))
+        for bucket, freq in BUCKETS.items()
+    ])
+    for status, field in STATUS_COUNTS.items():
+        frame[field] = frame['status'] == status
+
+    grouped = frame.groupby(KEY_FIELDS)
+    totals = grouped.size().to_frame('reading_count')
+    for field in STATUS_COUNTS.values():
+        totals[field] = grouped[field].sum()
+    for parameter in PARAMETERS:
+        totals[f'sum_{parameter}'] = grouped[parameter].sum()
+        totals[f'min_{parameter}'] = grouped[parameter].min()
+        totals[f'max_{parameter}'] = grouped[parameter].max()
+    keys = [_plain(key) for key in totals.index]
+
+    # Create missing buckets empty, then add to every bucket in place, so
+    # concurrent writers never overwrite each other's totals
+    ReadingAggregate.objects.bulk_create(
+        [ReadingAggregate(**dict(zip(KEY_FIELDS, key))) for key in keys],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    ids = {
+        (location_id, type_id, bucket, start): pk
+        for pk, location_id, type_id, bucket, start in ReadingAggregate.objects.filter(
+            plant_location_id__in={key[0] for key in keys},
+            equipment_type_id__in={key[1] for key in keys},
+            bucket_start__in={key[3] for key in keys},
+        ).values_list('id', *KEY_FIELDS)
+    }
+
+    updates = []
+    for key, row in zip(keys, totals.itertuples(index=False)):
+        update = ReadingAggregate(pk=ids[key])
+        for field in COUNT_FIELDS:
+            setattr(update, field, F(field) + int(getattr(row, field)))
+        for parameter in PARAMETERS:
+            low, high, total = f'min_{parameter}', f'max_{parameter}', f'sum_{parameter}'
+            setattr(update, total, F(total) + float(getattr(row, total)))
+            low_value = Value(float(getattr(row, low)), output_field=FloatField())
+            high_value = Value(float(getattr(row, high)), output_field=FloatField())
+            setattr(update, low, Least(Coalesce(F(low), low_value), low_value))
+            setattr(update, high, Greatest(Coalesce(F(high), high_value), high_value))
+        updates.append(update)
+
+    ReadingAggregate.objects.bulk_update(updates, TOTAL_FIELDS, batch_size=BATCH_SIZE)
+    return len(updates)
+
+
+def _floor_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def window_buckets(since, until):
+    """
+    Q for the buckets covering ``since`` (rounded down to the hour) to
+    ``until``: whole days from daily buckets, the rest from hourly ones.
+    """
+    start = _floor_hour(since)
+    first_day = _floor_day(start)
+    if first_day < start:
+        first_day += timedelta(days=1)
+    last_day = _floor_day(until)
+
+    if first_day >= last_day:
+        return Q(bucket='hour', bucket_start__gte=start, bucket_start__lte=until)
+    return (
+        Q(bucket='day', bucket_start__gte=first_day, bucket_start__lt=last_day)
+        | Q(bucket='hour', bucket_start__gte=start, bucket_start__lt=first_day)
+        | Q(bucket='hour', bucket_start__gte=last_day, bucket_start__lte=until)
+    )
+
+
+def window_totals(since, until=None, plant_location=None, equipment_type=None):
+    """
+    Reading statistics between ``since`` and ``until`` (now by default), in
+    one query over the buckets: reading counts in total and per status,
+    average pressure and temperature, and the maximum flowrate.
+    """
+    until = until or timezone.now()
+    buckets = ReadingAggregate.objects.filter(window_buckets(since, until))
+    if plant_location is not None:
+        buckets = buckets.filter(plant_location_id=plant_location)
+    if equipment_type is not None:
+        buckets = buckets.filter(equipment_type_id=equipment_type)
+
+    totals = buckets.aggregate(
+        **{field: Sum(field) for field in COUNT_FIELDS},
+        sum_pressure=Sum('sum_pressure'),
+        sum_temperature=Sum('sum_temperature'),
+        max_flowrate=Max('max_flowrate'),
+    )
+    count = totals['reading_count'] or 0
+    return {
+        **{field: totals[field] or 0 for field in COUNT_FIELDS},
+        'avg_pressure': totals['sum_pressure'] / count if count else None,
+        'avg_temperature': totals['sum_temperature'] / count if count else None,
+        'max_flowrate': totals['max_flowrate'],
+    }
+
+
+def rebuild_aggregates(since=None):
+    """
+    Re-aggregate buckets from the readings table, from the day of ``since``
+    onwards (everything by default). Readings are attributed to the
+    current location and type of their equipment. Returns the number of
+    buckets written.
+    """
+    buckets = ReadingAggregate.objects.all()
+    readings = EquipmentReading.objects.order_by()
+    if since is not None:
+        day = _floor_day(since)
+        buckets = buckets.filter(bucket_start__gte=day)
+        readings = readings.filter(timestamp__gte=day)
+    buckets.delete()
+
+    aggregates = {
+        'reading_count': Count('id'),
+        **{
+            field: Count('id', filter=Q(status=status))
+            for status, field in STATUS_COUNTS.items()
+        },
+    }
+    for parameter in PARAMETERS:
+        aggregates[f'sum_{parameter}'] = Sum(parameter)
+        aggregates[f'min_{parameter}'] = Min(parameter)
+        aggregates[f'max_{parameter}'] = Max(parameter)
+
+    rows = []
+    for bucket in BUCKETS:
+        groups = readings.annotate(
+            bucket_start=Trunc('timestamp', bucket),
+            plant_location_id=F('equipment__plant_location_id'),
+            equipment_type_id=F('equipment__equipment_type_id'),
+        ).values('plant_location_id', 'equipment_type_id', 'bucket_start').annotate(**aggregates)
+        rows.extend(ReadingAggregate(bucket=bucket, **group) for group in groups)
+
+    ReadingAggregate.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
@@ -0,0 +1,162 @@
+"""
+Alert generation from equipment readings.
+
+Readings are checked against their type's safe ranges in bulk, with the
+same hysteresis as the equipment status. Each parameter outside its range
+raises one alert per equipment. While that
+alert is open, repeat violations update its value and occurrence count
+(escalating the severity if needed) instead of adding rows.
+"""
+import numpy as np
+import pandas as pd
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Alert
+from .stats_cache import invalidate_dashboard
+from .status import PARAMETERS
+
+
+UNITS = {'flowrate': 'L/min', 'pressure': 'bar', 'temperature': '°C'}
+
+SEVERITIES = np.array(['info', 'warning', 'critical'], dtype=object)
+
+SEVERITY_LEVEL = {severity: level for level, severity in enumerate(SEVERITIES)}
+
+# Equipment per open-alert lookup and alerts per INSERT
+BATCH_SIZE = 500
+
+
+def detect_alerts(ranges, readings, previous=None):
+    """
+    Find threshold crossings in a DataFrame of readings.
+
+    ``readings`` needs ``equipment_id``, ``equipment_type_id``, ``name`` and
+    the reading columns, in the order they were taken. ``previous`` holds the
+    status of each reading's equipment before these readings: a parameter
+    back in range but still within the deadband keeps offending, just as it
+    keeps the equipment's status. Returns one row per equipment and
+    parameter out of range, carrying the latest offending value, the worst
+    severity seen and the number of offending readings.
+    """
+    levels, low, high = ranges.parameter_levels(
+        readings['equipment_type_id'], readings['flowrate'],
+        readings['pressure'], readings['temperature'],
+        previous=previous, groups=None if previous is None else readings['equipment_id']
+    )
+    rows, columns = np.nonzero(levels)
+
+    values = readings[list(PARAMETERS)].to_numpy(dtype=float)[rows, columns]
+    # Held readings may sit just inside a limit, so take the nearer one
+    above = values > (low[rows, columns] + high[rows, columns]) / 2
+    crossings = pd.DataFrame({
+        'equipment_id': readings['equipment_id'].to_numpy()[rows],
+        'name': readings['name'].to_numpy()[rows],
+        'parameter': np.array(PARAMETERS, dtype=object)[columns],
+        'value': values,
+        'above': above,
+        'threshold': np.where(above, high[rows, columns], low[rows, columns]),
+        'level': levels[rows, columns],
+    })
+
+    keys = ['equipment_id', 'parameter']
+    groups = crossings.groupby(keys, sort=False)['level']
+    crossings['level'] = groups.transform('max')
+    crossings['occurrences'] = groups.transform('size')
+    return crossings.drop_duplicates(keys, keep='last').reset_index(drop=True)
+
+
+def _open_alerts(equipment_ids):
+    """Index the open alerts of ``equipment_ids`` as ``{(equipment_id, parameter): (id, severity)}``."""
+    index = {}
+    equipment_ids = list(equipment_ids)
+    for start in range(0, len(equipment_ids), BATCH_SIZE):
+        rows = Alert.objects.filter(
+            status='open', equipment_id__in=equipment_ids[start:start + BATCH_SIZE]
+        ).values_list('equipment_id', 'parameter', 'id', 'severity')
+        for equipment_id, parameter, pk, severity in rows:
+            index[equipment_id, parameter] = (pk, severity)
+    return index
+
+
+def _new_alert(c, now):
+    direction = 'above' if c.above else 'below'
+    limit = 'maximum' if c.above else 'minimum'
+    unit = UNITS[c.parameter]
+    return Alert(
+        equipment_id=c.equipment_id,
+        title=f"{c.parameter.title()} {direction} safe range",
+        description=(
+            f"{c.name}: {c.parameter} of {c.value:g} {unit} is {direction} "
+            f"the safe {limit} of {c.threshold:g} {unit}."
+        ),
+        severity=SEVERITIES[c.level],
+        parameter=c.parameter,
+        value=c.value,
+        threshold=c.threshold,
+        occurrences=c.occurrences,
+        last_seen_at=now,
+    )
+
+
+def raise_alerts(crossings):
+    """
+    Record crossings as alerts. Returns ``(created, updated)``.
+
+    Crossings with an open alert for the same equipment and parameter are
+    folded into it; the rest become new alerts. Should a concurrent upload
+    open one of those alerts first, the unique open-alert constraint rejects
+    the insert and the crossings left are matched again against the alerts
+    now open.
+    """
+    if crossings.empty:
+        return 0, 0
+
+    now = timezone.now()
+    updated = {}
+    pending = crossings
+    conflict = None
+    while True:
+        open_alerts = _open_alerts(pending['equipment_id'].unique().tolist())
+        matches = [
+            open_alerts.get(key)
+            for key in zip(pending['equipment_id'].tolist(), pending['parameter'].tolist())
+        ]
+        is_open = np.array([match is not None for match in matches], dtype=bool)
+        if conflict is not None and not is_open.any():
+            # Not a clash with another writer's alert
+            raise conflict
+
+        for c, match in zip(pending.itertuples(index=False), matches):
+            if match is None:
+                continue
+            pk, severity = match
+            updated.setdefault(c.occurrences, []).append(Alert(
+                pk=pk,
+                value=c.value,
+                severity=SEVERITIES[max(c.level, SEVERITY_LEVEL.get(severity, 0))],
+                last_seen_at=now,
+                updated_at=now,
+            ))
+
+        created = [_new_alert(c, now) for c in pending[~is_open].itertuples(index=False)]
+        try:
+            with transaction.atomic():
+                Alert.objects.bulk_create(created, batch_size=BATCH_SIZE)
+            break
+        except IntegrityError as e:
+            conflict = e
+            pending = pending[~is_open]
+
+    # bulk_update takes one expression per field, so group by how much to add
+    for occurrences, alerts in updated.items():
+        for alert in alerts:
+            alert.occurrences = F('occurrences') + occurrences
+        Alert.objects.bulk_update(
+            alerts, ['value', 'severity', 'occurrences', 'last_seen_at', 'updated_at'],
+            batch_size=BATCH_SIZE
+        )
+
+    invalidate_dashboard()
+    return len(created), sum(len(alerts) for alerts in updated.values())
@@ -5,3 +5,6 @@ class EquipmentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'equipment'
     verbose_name = 'Equipment Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
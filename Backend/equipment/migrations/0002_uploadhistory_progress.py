@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Processing progress (%)'),
+        ),
+    ]
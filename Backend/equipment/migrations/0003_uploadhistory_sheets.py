@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_uploadhistory_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='sheets',
+            field=models.CharField(blank=True, help_text="Excel sheets to ingest: comma separated names, '*' for all, blank for the first", max_length=255),
+        ),
+    ]
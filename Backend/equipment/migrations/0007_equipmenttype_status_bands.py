@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:51
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_uploadbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmenttype',
+            name='critical_band',
+            field=models.FloatField(default=0.25, help_text='How far past a safe limit a reading turns critical (fraction of the range width)', validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='equipmenttype',
+            name='hysteresis',
+            field=models.FloatField(default=0.05, help_text='How far back inside a limit a reading must be before its status steps down (fraction of the range width)', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(0.5)]),
+        ),
+    ]
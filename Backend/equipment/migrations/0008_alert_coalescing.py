@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:55
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_open_alerts(apps, schema_editor):
+    """Keep the newest open alert per equipment and parameter; resolve the rest."""
+    Alert = apps.get_model('equipment', 'Alert')
+    duplicates = Alert.objects.filter(status='open').values(
+        'equipment_id', 'parameter'
+    ).annotate(n=Count('id')).filter(n__gt=1)
+
+    for key in duplicates:
+        alerts = list(Alert.objects.filter(
+            status='open', equipment_id=key['equipment_id'], parameter=key['parameter']
+        ).order_by('-created_at', '-id'))
+        keeper = alerts[0]
+        keeper.occurrences = len(alerts)
+        keeper.save(update_fields=['occurrences'])
+        Alert.objects.filter(pk__in=[a.pk for a in alerts[1:]]).update(
+            status='resolved',
+            resolution_notes=f'Merged into alert #{keeper.pk}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_equipmenttype_status_bands'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1, help_text='Readings that hit this alert while open'),
+        ),
+        migrations.RunPython(merge_duplicate_open_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'open')), fields=('equipment', 'parameter'), name='unique_open_alert_per_parameter'),
+        ),
+    ]
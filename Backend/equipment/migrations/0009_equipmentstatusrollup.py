@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def populate_rollup(apps, schema_editor):
+    """Aggregate the existing fleet into the new rollup table."""
+    Equipment = apps.get_model('equipment', 'Equipment')
+    EquipmentStatusRollup = apps.get_model('equipment', 'EquipmentStatusRollup')
+
+    aggregates = {'equipment_count': Count('id')}
+    for parameter in ('flowrate', 'pressure', 'temperature'):
+        aggregates[f'sum_{parameter}'] = Sum(parameter)
+        aggregates[f'min_{parameter}'] = Min(parameter)
+        aggregates[f'max_{parameter}'] = Max(parameter)
+
+    groups = Equipment.objects.order_by().values(
+        'plant_location_id', 'equipment_type_id', 'status', 'is_active'
+    ).annotate(**aggregates)
+    EquipmentStatusRollup.objects.bulk_create(
+        [EquipmentStatusRollup(**group) for group in groups], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_alert_coalescing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('normal', 'Normal'), ('warning', 'Warning'), ('critical', 'Critical'), ('offline', 'Offline')], max_length=20)),
+                ('is_active', models.BooleanField()),
+                ('equipment_count', models.PositiveIntegerField(default=0)),
+                ('sum_flowrate', models.FloatField(default=0)),
+                ('min_flowrate', models.FloatField(null=True)),
+                ('max_flowrate', models.FloatField(null=True)),
+                ('sum_pressure', models.FloatField(default=0)),
+                ('min_pressure', models.FloatField(null=True)),
+                ('max_pressure', models.FloatField(null=True)),
+                ('sum_temperature', models.FloatField(default=0)),
+                ('min_temperature', models.FloatField(null=True)),
+                ('max_temperature', models.FloatField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('equipment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_rollups', to='equipment.equipmenttype')),
+                ('plant_location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_rollups', to='equipment.plantlocation')),
+            ],
+            options={
+                'verbose_name': 'Equipment Status Rollup',
+                'verbose_name_plural': 'Equipment Status Rollups',
+                'ordering': ['plant_location', 'equipment_type', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('plant_location', 'equipment_type', 'status', 'is_active'), name='unique_status_rollup_group')],
+            },
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
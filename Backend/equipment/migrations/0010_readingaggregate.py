@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Trunc
+
+
+def populate_aggregates(apps, schema_editor):
+    """Aggregate the existing readings into hourly and daily buckets."""
+    EquipmentReading = apps.get_model('equipment', 'EquipmentReading')
+    ReadingAggregate = apps.get_model('equipment', 'ReadingAggregate')
+
+    aggregates = {'reading_count': Count('id')}
+    for status in ('normal', 'warning', 'critical'):
+        aggregates[f'{status}_count'] = Count('id', filter=Q(status=status))
+    for parameter in ('flowrate', 'pressure', 'temperature'):
+        aggregates[f'sum_{parameter}'] = Sum(parameter)
+        aggregates[f'min_{parameter}'] = Min(parameter)
+        aggregates[f'max_{parameter}'] = Max(parameter)
+
+    for bucket in ('hour', 'day'):
+        groups = EquipmentReading.objects.order_by().annotate(
+            bucket_start=Trunc('timestamp', bucket),
+            plant_location_id=F('equipment__plant_location_id'),
+            equipment_type_id=F('equipment__equipment_type_id'),
+        ).values('plant_location_id', 'equipment_type_id', 'bucket_start').annotate(**aggregates)
+        ReadingAggregate.objects.bulk_create(
+            [ReadingAggregate(bucket=bucket, **group) for group in groups], batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_equipmentstatusrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('reading_count', models.PositiveIntegerField(default=0)),
+                ('normal_count', models.PositiveIntegerField(default=0)),
+                ('warning_count', models.PositiveIntegerField(default=0)),
+                ('critical_count', models.PositiveIntegerField(default=0)),
+                ('sum_flowrate', models.FloatField(default=0)),
+                ('min_flowrate', models.FloatField(null=True)),
+                ('max_flowrate', models.FloatField(null=True)),
+                ('sum_pressure', models.FloatField(default=0)),
+                ('min_pressure', models.FloatField(null=True)),
+                ('max_pressure', models.FloatField(null=True)),
+                ('sum_temperature', models.FloatField(default=0)),
+                ('min_temperature', models.FloatField(null=True)),
+                ('max_temperature', models.FloatField(null=True)),
+                ('equipment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_aggregates', to='equipment.equipmenttype')),
+                ('plant_location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_aggregates', to='equipment.plantlocation')),
+            ],
+            options={
+                'verbose_name': 'Reading Aggregate',
+                'verbose_name_plural': 'Reading Aggregates',
+                'ordering': ['-bucket_start'],
+                'indexes': [models.Index(fields=['bucket', 'bucket_start'], name='equipment_r_bucket_de49d2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('plant_location', 'equipment_type', 'bucket', 'bucket_start'), name='unique_reading_aggregate_bucket')],
+            },
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
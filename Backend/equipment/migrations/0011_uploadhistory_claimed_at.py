@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_readingaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker last claimed the upload or reported progress', null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 """
 Equipment models for chemical processing equipment monitoring.
 """
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -21,6 +23,18 @@ class EquipmentType(models.Model):
     min_temperature = models.FloatField(help_text="Minimum safe temperature (°C)")
     max_temperature = models.FloatField(help_text="Maximum safe temperature (°C)")
     
+    # Status bands, as fractions of each range's width
+    critical_band = models.FloatField(
+        default=0.25,
+        validators=[MinValueValidator(0)],
+        help_text="How far past a safe limit a reading turns critical (fraction of the range width)"
+    )
+    hysteresis = models.FloatField(
+        default=0.05,
+        validators=[MinValueValidator(0), MaxValueValidator(0.5)],
+        help_text="How far back inside a limit a reading must be before its status steps down (fraction of the range width)"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -113,16 +127,13 @@ class Equipment(models.Model):
         return f"{self.name} ({self.equipment_type.name})"
     
     def check_status(self):
-        """Check if equipment is operating within safe ranges."""
-        eq_type = self.equipment_type
-        
-        flowrate_ok = eq_type.min_flowrate <= self.flowrate <= eq_type.max_flowrate
-        pressure_ok = eq_type.min_pressure <= self.pressure <= eq_type.max_pressure
-        temp_ok = eq_type.min_temperature <= self.temperature <= eq_type.max_temperature
+        """Check if equipment is operating within safe ranges (normal, warning or critical)."""
+        from .status import RangeTable
         
-        if not (flowrate_ok and pressure_ok and temp_ok):
-            return 'warning'
-        return 'normal'
+        return RangeTable.from_types([self.equipment_type]).evaluate(
+            [self.equipment_type_id], [self.flowrate], [self.pressure], [self.temperature],
+            previous=[self.status]
+        )[0]
     
     def save(self, *args, **kwargs):
         """Override save to auto-update status."""
@@ -133,6 +144,51 @@ class Equipment(models.Model):
         super().save(*args, **kwargs)
 
 
+class EquipmentStatusRollup(models.Model):
+    """Equipment counts and metric totals per plant location, type and status."""
+    
+    plant_location = models.ForeignKey(
+        PlantLocation,
+        on_delete=models.CASCADE,
+        related_name='status_rollups'
+    )
+    equipment_type = models.ForeignKey(
+        EquipmentType,
+        on_delete=models.CASCADE,
+        related_name='status_rollups'
+    )
+    status = models.CharField(max_length=20, choices=Equipment.STATUS_CHOICES)
+    is_active = models.BooleanField()
+    
+    equipment_count = models.PositiveIntegerField(default=0)
+    
+    sum_flowrate = models.FloatField(default=0)
+    min_flowrate = models.FloatField(null=True)
+    max_flowrate = models.FloatField(null=True)
+    sum_pressure = models.FloatField(default=0)
+    min_pressure = models.FloatField(null=True)
+    max_pressure = models.FloatField(null=True)
+    sum_temperature = models.FloatField(default=0)
+    min_temperature = models.FloatField(null=True)
+    max_temperature = models.FloatField(null=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Equipment Status Rollup"
+        verbose_name_plural = "Equipment Status Rollups"
+        ordering = ['plant_location', 'equipment_type', 'status']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['plant_location', 'equipment_type', 'status', 'is_active'],
+                name='unique_status_rollup_group'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.plant_location} / {self.equipment_type}: {self.equipment_count} {self.status}"
+
+
 class EquipmentReading(models.Model):
     """Historical readings for equipment."""
     
@@ -163,6 +219,60 @@ class EquipmentReading(models.Model):
         return f"{self.equipment.name} - {self.timestamp}"
 
 
+class ReadingAggregate(models.Model):
+    """Readings of one plant location and equipment type summed over an hour or a day."""
+    
+    BUCKET_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    plant_location = models.ForeignKey(
+        PlantLocation,
+        on_delete=models.CASCADE,
+        related_name='reading_aggregates'
+    )
+    equipment_type = models.ForeignKey(
+        EquipmentType,
+        on_delete=models.CASCADE,
+        related_name='reading_aggregates'
+    )
+    bucket = models.CharField(max_length=10, choices=BUCKET_CHOICES)
+    bucket_start = models.DateTimeField()
+    
+    reading_count = models.PositiveIntegerField(default=0)
+    normal_count = models.PositiveIntegerField(default=0)
+    warning_count = models.PositiveIntegerField(default=0)
+    critical_count = models.PositiveIntegerField(default=0)
+    
+    sum_flowrate = models.FloatField(default=0)
+    min_flowrate = models.FloatField(null=True)
+    max_flowrate = models.FloatField(null=True)
+    sum_pressure = models.FloatField(default=0)
+    min_pressure = models.FloatField(null=True)
+    max_pressure = models.FloatField(null=True)
+    sum_temperature = models.FloatField(default=0)
+    min_temperature = models.FloatField(null=True)
+    max_temperature = models.FloatField(null=True)
+    
+    class Meta:
+        verbose_name = "Reading Aggregate"
+        verbose_name_plural = "Reading Aggregates"
+        ordering = ['-bucket_start']
+        indexes = [
+            models.Index(fields=['bucket', 'bucket_start']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['plant_location', 'equipment_type', 'bucket', 'bucket_start'],
+                name='unique_reading_aggregate_bucket'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.plant_location} / {self.equipment_type}: {self.bucket} of {self.bucket_start}"
+
+
 class Alert(models.Model):
     """Alerts for equipment issues."""
     
@@ -193,6 +303,8 @@ class Alert(models.Model):
     parameter = models.CharField(max_length=50)  # flowrate, pressure, temperature
     value = models.FloatField()
     threshold = models.FloatField()
+    occurrences = models.PositiveIntegerField(default=1, help_text="Readings that hit this alert while open")
+    last_seen_at = models.DateTimeField(null=True, blank=True)
     
     # Resolution tracking
     acknowledged_by = models.ForeignKey(
@@ -225,11 +337,42 @@ class Alert(models.Model):
             models.Index(fields=['status', 'severity']),
             models.Index(fields=['equipment', '-created_at']),
         ]
+        constraints = [
+            # Repeat violations update the open alert instead of adding rows
+            models.UniqueConstraint(
+                fields=['equipment', 'parameter'],
+                condition=models.Q(status='open'),
+                name='unique_open_alert_per_parameter'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.severity.upper()}: {self.title} - {self.equipment.name}"
 
 
+class UploadBatch(models.Model):
+    """Several files uploaded together and processed as one job."""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    uploaded_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='upload_batches'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Upload Batch"
+        verbose_name_plural = "Upload Batches"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Batch {self.pk}"
+
+
 class UploadHistory(models.Model):
     """Track file uploads."""
     
@@ -244,8 +387,32 @@ class UploadHistory(models.Model):
     file_name = models.CharField(max_length=255)
     file_path = models.FileField(upload_to='uploads/%Y/%m/%d/')
     file_size = models.BigIntegerField(help_text="File size in bytes")
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 of the file contents"
+    )
+    sheets = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Excel sheets to ingest: comma separated names, '*' for all, blank for the first"
+    )
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Processing progress (%)")
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a worker last claimed the upload or reported progress"
+    )
+    batch = models.ForeignKey(
+        UploadBatch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='uploads'
+    )
     
     # Processing results
     records_processed = models.IntegerField(default=0)
@@ -270,3 +437,37 @@ class UploadHistory(models.Model):
     
     def __str__(self):
         return f"{self.file_name} - {self.status}"
+
+
+class UploadSession(models.Model):
+    """Resumable chunked upload that has not been finalized yet."""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=255)
+    file_size = models.BigIntegerField(help_text="Expected file size in bytes")
+    sheets = models.CharField(max_length=255, blank=True)
+    received_bytes = models.BigIntegerField(default=0, help_text="Bytes confirmed so far")
+    
+    upload = models.ForeignKey(
+        UploadHistory,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sessions'
+    )
+    uploaded_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.received_bytes}/{self.file_size} bytes)"
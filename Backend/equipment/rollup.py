@@ -0,0 +1,227 @@
+"""
+Status rollup of the equipment table.
+
+``EquipmentStatusRollup`` keeps, per plant location, type, status and
+active flag, the number of equipment and the sum, minimum and maximum of
+each reading, so dashboards read a few dozen rows instead of scanning the
+fleet.
+
+Writers describe the equipment they change as it was before and after
+the write (``equipment_state``) and ``update_rollup`` folds the
+difference in: counts and sums move by the delta, minima and maxima only
+widen. A group is re-aggregated from the equipment table when it is new,
+empties, or loses the equipment holding one of its extremes.
+"""
+import pandas as pd
+from django.db import connection
+from django.db.models import Count, F, FloatField, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .models import Equipment, EquipmentStatusRollup
+from .status import PARAMETERS
+
+
+GROUP_FIELDS = ['plant_location_id', 'equipment_type_id', 'status', 'is_active']
+
+STATE_FIELDS = GROUP_FIELDS + list(PARAMETERS)
+
+TOTAL_FIELDS = ['equipment_count'] + [
+    f'{total}_{parameter}' for parameter in PARAMETERS for total in ('sum', 'min', 'max')
+]
+
+# Rollup rows written per query
+BATCH_SIZE = 500
+
+
+def equipment_state(equipment, key='pk'):
+    """The fields the rollup depends on for ``Equipment`` instances, indexed by ``key``."""
+    return pd.DataFrame(
+        [[getattr(e, field) for field in STATE_FIELDS] for e in equipment],
+        index=[getattr(e, key) for e in equipment],
+        columns=STATE_FIELDS,
+    )
+
+
+def conflict_target(fields):
+    """
+    ``unique_fields`` for an upsert on ``fields``. MySQL takes no conflict
+    target (ON DUPLICATE KEY UPDATE matches any unique key) and rejects one.
+    """
+    if connection.features.supports_update_conflicts_with_target:
+        return {'unique_fields': fields}
+    return {}
+
+
+def _summarise(state):
+    """Rollup totals of a state frame, indexed by group."""
+    grouped = state.groupby(GROUP_FIELDS)
+    totals = grouped.size().to_frame('equipment_count')
+    for parameter in PARAMETERS:
+        totals[f'sum_{parameter}'] = grouped[parameter].sum()
+        totals[f'min_{parameter}'] = grouped[parameter].min()
+        totals[f'max_{parameter}'] = grouped[parameter].max()
+    return totals
+
+
+def _aggregates():
+    aggregates = {'equipment_count': Count('id')}
+    for parameter in PARAMETERS:
+        aggregates[f'sum_{parameter}'] = Sum(parameter)
+        aggregates[f'min_{parameter}'] = Min(parameter)
+        aggregates[f'max_{parameter}'] = Max(parameter)
+    return aggregates
+
+
+def _group_key(row):
+    return tuple(row[field] for field in GROUP_FIELDS)
+
+
+def _plain(key):
+    """A group key from a pandas index, with NumPy scalars turned into Python ones."""
+    return tuple(value.item() if hasattr(value, 'item') else value for value in key)
+
+
+def _in_scope(queryset, keys):
+    """Narrow ``queryset`` to the locations and types of ``keys`` (a superset of them)."""
+    if keys is None:
+        return queryset
+    return queryset.filter(
+        plant_location_id__in={key[0] for key in keys},
+        equipment_type_id__in={key[1] for key in keys},
+    )
+
+
+def _refresh(keys=None, type_ids=None):
+    """
+    Re-aggregate rollup groups from the equipment table: the groups in
+    ``keys`` (tuples in ``GROUP_FIELDS`` order), every group of ``type_ids``,
+    or everything. Returns the number of groups written.
+    """
+    equipment = Equipment.objects.all()
+    rollup = EquipmentStatusRollup.objects.all()
+    if type_ids is not None:
+        equipment = equipment.filter(equipment_type_id__in=type_ids)
+        rollup = rollup.filter(equipment_type_id__in=type_ids)
+    keys = set(keys) if keys is not None else None
+
+    scanned = {}
+    for row in _in_scope(equipment, keys).order_by().values(*GROUP_FIELDS).annotate(**_aggregates()):
+        key = _group_key(row)
+        if keys is None or key in keys:
+            scanned[key] = row
+
+    # Rows of groups that no longer have any equipment
+    stale = [
+        row['id'] for row in _in_scope(rollup, keys).values('id', *GROUP_FIELDS)
+        if (keys is None or _group_key(row) in keys) and _group_key(row) not in scanned
+    ]
+    EquipmentStatusRollup.objects.filter(pk__in=stale).delete()
+
+    EquipmentStatusRollup.objects.bulk_create(
+        [EquipmentStatusRollup(**row) for row in scanned.values()],
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        update_fields=TOTAL_FIELDS + ['updated_at'],
+        **conflict_target(['plant_location', 'equipment_type', 'status', 'is_active'])
+    )
+    return len(scanned)
+
+
+def rebuild_rollup(type_ids=None):
+    """Rebuild the rollup from the equipment table (only the groups of ``type_ids`` if given)."""
+    return _refresh(type_ids=type_ids)
+
+
+def update_rollup(before, after):
+    """
+    Fold a write into the rollup.
+
+    ``before`` and ``after`` are ``equipment_state`` frames keyed the same
+    way; equipment only in ``after`` is new, equipment only in ``before``
+    was deleted. Returns the number of groups touched.
+    """
+    before = before.reindex(columns=STATE_FIELDS)
+    after = after.reindex(columns=STATE_FIELDS)
+
+    # Equipment written back unchanged does not move the rollup
+    common = before.index.intersection(after.index)
+    unchanged = common[(before.loc[common] == after.loc[common]).all(axis=1).to_numpy()]
+    before = before.drop(unchanged)
+    after = after.drop(unchanged)
+    if before.empty and after.empty:
+        return 0
+
+    removed = _summarise(before)
+    added = _summarise(after)
+    keys = {_plain(key) for key in removed.index.union(added.index)}
+
+    current = {
+        _group_key(row): row
+        for row in _in_scope(EquipmentStatusRollup.objects.all(), keys).values(
+            'id', *GROUP_FIELDS, *TOTAL_FIELDS
+        )
+    }
+
+    now = timezone.now()
+    rescan = []
+    updates = []
+    for key in keys:
+        row = current.get(key)
+        gone = removed.loc[key] if key in removed.index else None
+        new = added.loc[key] if key in added.index else None
+        if row is None:
+            rescan.append(key)
+            continue
+        if gone is not None and (
+            gone['equipment_count'] >= row['equipment_count'] or any(
+                gone[f'min_{p}'] <= row[f'min_{p}'] or gone[f'max_{p}'] >= row[f'max_{p}']
+                for p in PARAMETERS
+            )
+        ):
+            rescan.append(key)
+            continue
+
+        update = EquipmentStatusRollup(pk=row['id'], updated_at=now)
+        update.equipment_count = F('equipment_count') + int(_delta(new, gone, 'equipment_count'))
+        for parameter in PARAMETERS:
+            setattr(update, f'sum_{parameter}', F(f'sum_{parameter}') + _delta(new, gone, f'sum_{parameter}'))
+            low, high = f'min_{parameter}', f'max_{parameter}'
+            if new is None:
+                setattr(update, low, F(low))
+                setattr(update, high, F(high))
+            else:
+                setattr(update, low, Least(F(low), Value(float(new[low]), output_field=FloatField())))
+                setattr(update, high, Greatest(F(high), Value(float(new[high]), output_field=FloatField())))
+        updates.append(update)
+
+    EquipmentStatusRollup.objects.bulk_update(updates, TOTAL_FIELDS + ['updated_at'], batch_size=BATCH_SIZE)
+    if rescan:
+        _refresh(rescan)
+    return len(keys)
+
+
+def _delta(new, gone, field):
+    return (float(new[field]) if new is not None else 0) - (float(gone[field]) if gone is not None else 0)
+
+
+def rollup_drift(tolerance=1e-6):
+    """Groups whose rollup row disagrees with the equipment table, as ``{key: (stored, actual)}``."""
+    actual = {
+        _group_key(row): row
+        for row in Equipment.objects.order_by().values(*GROUP_FIELDS).annotate(**_aggregates())
+    }
+    stored = {
+        _group_key(row): row
+        for row in EquipmentStatusRollup.objects.values(*GROUP_FIELDS, *TOTAL_FIELDS)
+    }
+
+    drift = {}
+    for key in set(actual) | set(stored):
+        a, s = actual.get(key), stored.get(key)
+        if a is None or s is None or any(
+            abs((s[field] or 0) - (a[field] or 0)) > tolerance * max(1, abs(a[field] or 0))
+            for field in TOTAL_FIELDS
+        ):
+            drift[key] = (s, a)
+    return drift
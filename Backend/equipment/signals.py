@@ -0,0 +1,81 @@
+"""
+Signal handlers for the equipment app.
+"""
+import logging
+
+import pandas as pd
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .aggregates import record_readings
+from .models import EquipmentType, Equipment, EquipmentReading, Alert
+from .rollup import STATE_FIELDS, equipment_state, update_rollup
+from .stats_cache import invalidate_dashboard
+from .status import RANGE_FIELDS, recompute_type_status
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=EquipmentType)
+def recompute_status_on_range_change(sender, instance, created, update_fields=None, **kwargs):
+    """Bring the status of a type's equipment in line with its new ranges."""
+    if created or (update_fields is not None and not set(update_fields) & set(RANGE_FIELDS)):
+        instance.status_changes = 0
+        return
+
+    instance.status_changes = recompute_type_status(instance)
+    if instance.status_changes:
+        logger.info(
+            "Ranges of %s changed: %d equipment status(es) updated",
+            instance.name, instance.status_changes
+        )
+
+
+@receiver([post_save, post_delete], sender=Equipment)
+@receiver([post_save, post_delete], sender=EquipmentReading)
+@receiver([post_save, post_delete], sender=Alert)
+def invalidate_dashboard_on_write(sender, **kwargs):
+    """Cached dashboard statistics are stale once equipment or alerts change."""
+    invalidate_dashboard()
+
+
+@receiver(pre_save, sender=Equipment)
+def remember_rollup_state(sender, instance, raw=False, **kwargs):
+    """Keep the stored state of equipment about to be saved, to move it in the rollup."""
+    if raw or instance.pk is None:
+        stored = []
+    else:
+        stored = Equipment.objects.filter(pk=instance.pk).only(*STATE_FIELDS)
+    instance._rollup_before = equipment_state(stored)
+
+
+@receiver(post_save, sender=Equipment)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """Move a saved equipment between status rollup groups."""
+    if raw:
+        return
+    update_rollup(getattr(instance, '_rollup_before', equipment_state([])), equipment_state([instance]))
+
+
+@receiver(post_delete, sender=Equipment)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Take a deleted equipment out of the status rollup."""
+    update_rollup(equipment_state([instance]), equipment_state([]))
+
+
+@receiver(post_save, sender=EquipmentReading)
+def record_reading_on_create(sender, instance, created, raw=False, **kwargs):
+    """Add a reading created on its own to its hourly and daily buckets."""
+    if not created or raw:
+        return
+    equipment = instance.equipment
+    record_readings(pd.DataFrame([{
+        'plant_location_id': equipment.plant_location_id,
+        'equipment_type_id': equipment.equipment_type_id,
+        'timestamp': instance.timestamp,
+        'status': instance.status,
+        'flowrate': instance.flowrate,
+        'pressure': instance.pressure,
+        'temperature': instance.temperature,
+    }]))
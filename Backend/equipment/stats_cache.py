@@ -0,0 +1,81 @@
+"""
+Cache for dashboard statistics.
+
+Entries are keyed by the dashboard filters and a generation stamp.
+Writes to equipment or alerts replace the stamp once their transaction
+commits, which orphans every cached entry at once; orphans simply expire.
+Stamps are taken from the clock rather than counted, so a generation
+evicted from the cache is replaced by a new one instead of restarting a
+count that old entries may still carry. Signals cover ``save`` and
+``delete``; bulk writers call ``invalidate_dashboard`` themselves since
+bulk queries send no signals.
+
+The cache must be shared by every server process for invalidations to
+reach them all; see ``CACHES`` in the settings.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+GENERATION_KEY = 'dashboard_stats:generation'
+
+HITS_KEY = 'dashboard_stats:hits'
+
+MISSES_KEY = 'dashboard_stats:misses'
+
+
+def increment_counter(key):
+    """Add one to a counter in the shared cache, creating it if missing."""
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(key, 1, timeout=None)
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, timeout=None)
+
+
+def invalidate_dashboard():
+    """Drop every cached dashboard entry once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(GENERATION_KEY, time.time_ns(), timeout=None))
+
+
+def cached_stats(compute, **filters):
+    """
+    Return ``(stats, hit)`` for ``filters``, calling ``compute()`` on a miss.
+    """
+    params = ':'.join(f'{name}={filters[name]}' for name in sorted(filters))
+    key = f'dashboard_stats:{_generation()}:{params}'
+
+    stats = cache.get(key)
+    if stats is not None:
+        increment_counter(HITS_KEY)
+        return stats, True
+
+    increment_counter(MISSES_KEY)
+    stats = compute()
+    cache.set(key, stats, settings.DASHBOARD_CACHE_TIMEOUT)
+    return stats, False
+
+
+def cache_counters():
+    """Hit and miss counts since the counters were last reset."""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        'generation': _generation(),
+    }
+
+
+def reset_counters():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
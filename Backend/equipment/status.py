@@ -0,0 +1,278 @@
+"""
+Vectorised equipment status evaluation.
+
+Each parameter has a safe range. Readings outside it are a warning, and
+readings more than ``critical_band`` of the range width past a limit are
+critical. Stepping down a level additionally requires clearing the limit
+by ``hysteresis`` of the range width, so values hovering at a limit do
+not flap between states.
+
+``RangeTable`` holds the ranges of every equipment type as NumPy arrays,
+so the status of any number of readings is worked out in a handful of
+array operations. ``status_expression`` states the same rules in SQL for
+updates that never leave the database.
+"""
+import numpy as np
+import pandas as pd
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from .models import EquipmentType, Equipment
+from .stats_cache import invalidate_dashboard
+
+
+PARAMETERS = ('flowrate', 'pressure', 'temperature')
+
+RANGE_FIELDS = [
+    f'{bound}_{parameter}' for parameter in PARAMETERS for bound in ('min', 'max')
+] + ['critical_band', 'hysteresis']
+
+LEVELS = np.array(['normal', 'warning', 'critical'], dtype=object)
+
+LEVEL_OF = {'normal': 0, 'warning': 1, 'critical': 2}
+
+# Equipment rows read and written per query when recomputing the fleet
+BATCH_SIZE = 2000
+
+
+def _stack(flowrate, pressure, temperature):
+    return np.column_stack([
+        np.asarray(flowrate, dtype=float),
+        np.asarray(pressure, dtype=float),
+        np.asarray(temperature, dtype=float),
+    ])
+
+
+class RangeTable:
+    """Safe operating ranges and status bands of equipment types, indexed by type."""
+
+    def __init__(self, rows):
+        """``rows`` are tuples of the type id followed by ``RANGE_FIELDS``."""
+        table = np.array(sorted(rows), dtype=float).reshape(-1, len(RANGE_FIELDS) + 1)
+        self.type_ids = table[:, 0].astype(np.int64)
+        self.low = table[:, 1:7:2]
+        self.high = table[:, 2:7:2]
+        width = self.high - self.low
+        self.band = table[:, 7:8] * width
+        self.deadband = table[:, 8:9] * width
+
+    @classmethod
+    def load(cls, type_ids=None):
+        """Load the ranges of all equipment types (or just ``type_ids``) in one query."""
+        queryset = EquipmentType.objects.all()
+        if type_ids is not None:
+            queryset = queryset.filter(pk__in=type_ids)
+        return cls(queryset.values_list('id', *RANGE_FIELDS))
+
+    @classmethod
+    def from_types(cls, equipment_types):
+        """Build a table from ``EquipmentType`` instances already in memory."""
+        return cls(
+            (t.id, *(getattr(t, field) for field in RANGE_FIELDS)) for t in equipment_types
+        )
+
+    def _positions(self, type_ids):
+        type_ids = np.asarray(type_ids, dtype=np.int64)
+        positions = np.searchsorted(self.type_ids, type_ids)
+        positions = np.minimum(positions, len(self.type_ids) - 1)
+        if len(type_ids) and (
+            not len(self.type_ids) or (self.type_ids[positions] != type_ids).any()
+        ):
+            raise KeyError('Equipment type missing from the range table')
+        return positions
+
+    def _levels(self, positions, values, margin):
+        """Level of each parameter, with every limit pulled ``margin`` inwards."""
+        low = self.low[positions] + margin
+        high = self.high[positions] - margin
+        band = self.band[positions]
+
+        level = ((values < low) | (values > high) | np.isnan(values)).astype(np.int8)
+        level[(values < low - band) | (values > high + band)] = 2
+        return level
+
+    def _carry(self, level, cleared, previous, groups):
+        """
+        Level each reading's equipment held before it.
+
+        Without ``groups`` that is just ``previous``. Otherwise readings of
+        the same group are taken in order, each holding the level the one
+        before it left, so a chunk of readings ends where the same readings
+        would one at a time.
+        """
+        held = np.array([LEVEL_OF.get(s, 0) for s in previous], dtype=np.int8)
+        if groups is None or not len(held):
+            return held
+
+        codes = pd.factorize(np.asarray(groups, dtype=object))[0]
+        rank = pd.Series(codes).groupby(codes).cumcount().to_numpy()
+        by_rank = np.argsort(rank, kind='stable')
+        state = np.zeros(codes.max() + 1, dtype=np.int8)
+        state[codes[rank == 0]] = held[rank == 0]
+        # One step per reading of the busiest group, each across all groups
+        for at in np.split(by_rank, np.cumsum(np.bincount(rank))[:-1]):
+            held[at] = state[codes[at]]
+            state[codes[at]] = np.maximum(level[at], np.minimum(held[at], cleared[at]))
+        return held
+
+    def parameter_levels(self, type_ids, flowrate, pressure, temperature, previous=None, groups=None):
+        """
+        Level of every parameter of every reading (0 normal, 1 warning,
+        2 critical).
+
+        ``previous`` holds the status of each reading's equipment before it;
+        a parameter keeps the equipment at that level until it clears the
+        deadband. ``groups`` labels the readings of each equipment, in the
+        order they were taken, so each reading is held by the ones before it
+        rather than by ``previous`` alone.
+
+        Returns ``(levels, low, high)``, each with one column per parameter;
+        ``low`` and ``high`` are the safe limits the readings were held to.
+        """
+        positions = self._positions(type_ids)
+        values = _stack(flowrate, pressure, temperature)
+
+        levels = self._levels(positions, values, 0)
+        if previous is not None:
+            cleared = self._levels(positions, values, self.deadband[positions])
+            held = self._carry(levels.max(axis=1), cleared.max(axis=1), previous, groups)
+            levels = np.maximum(levels, np.minimum(held[:, None], cleared))
+        return levels, self.low[positions], self.high[positions]
+
+    def evaluate(self, type_ids, flowrate, pressure, temperature, is_active=None,
+                 previous=None, groups=None):
+        """
+        Status of every reading as an array of strings.
+
+        ``previous`` and ``groups`` apply hysteresis as in
+        ``parameter_levels``. Inactive equipment is 'offline'.
+        """
+        levels = self.parameter_levels(
+            type_ids, flowrate, pressure, temperature, previous, groups
+        )[0]
+        status = LEVELS[levels.max(axis=1)]
+        if is_active is not None:
+            status[~np.asarray(is_active, dtype=bool)] = 'offline'
+        return status
+
+
+def apply_status(equipment, ranges=None):
+    """Set ``status`` on a list of ``Equipment`` instances in one pass."""
+    if not equipment:
+        return equipment
+    if ranges is None:
+        ranges = RangeTable.load({e.equipment_type_id for e in equipment})
+
+    statuses = ranges.evaluate(
+        [e.equipment_type_id for e in equipment],
+        [e.flowrate for e in equipment],
+        [e.pressure for e in equipment],
+        [e.temperature for e in equipment],
+        [e.is_active for e in equipment],
+        previous=[e.status for e in equipment],
+    )
+    for e, status in zip(equipment, statuses):
+        e.status = status
+    return equipment
+
+
+def recompute_status(queryset=None, batch_size=BATCH_SIZE):
+    """
+    Re-evaluate the status of ``queryset`` (all equipment by default).
+
+    Reads the equipment in batches of plain values and writes back only the
+    statuses that changed, one UPDATE per batch and status, stamping
+    ``updated_at`` so chart fingerprints see the change. Returns the number
+    of equipment whose status changed.
+    """
+    from .rollup import update_rollup
+
+    if queryset is None:
+        queryset = Equipment.objects.all()
+    ranges = RangeTable.load()
+
+    changed = 0
+    rows = queryset.order_by('pk').values_list(
+        'pk', 'plant_location_id', 'equipment_type_id', *PARAMETERS, 'is_active', 'status'
+    )
+    last_pk = None
+    while True:
+        batch = rows.filter(pk__gt=last_pk) if last_pk is not None else rows
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+
+        pks, location_ids, type_ids, flowrate, pressure, temperature, is_active, current = zip(*batch)
+        statuses = ranges.evaluate(
+            type_ids, flowrate, pressure, temperature, is_active, previous=current
+        )
+
+        pks = np.asarray(pks)
+        flipped = statuses != np.asarray(current, dtype=object)
+        for status in np.unique(statuses[flipped]):
+            ids = pks[flipped & (statuses == status)].tolist()
+            changed += Equipment.objects.filter(pk__in=ids).update(
+                status=status, updated_at=timezone.now()
+            )
+
+        if flipped.any():
+            before = pd.DataFrame({
+                'plant_location_id': location_ids, 'equipment_type_id': type_ids,
+                'status': current, 'is_active': is_active,
+                'flowrate': flowrate, 'pressure': pressure, 'temperature': temperature,
+            }, index=pks)[flipped]
+            update_rollup(before, before.assign(status=statuses[flipped]))
+
+    if changed:
+        invalidate_dashboard()
+    return changed
+
+
+def _outside(equipment_type, band, margin):
+    """Q for readings beyond any limit widened by ``band`` and narrowed by ``margin``."""
+    outside = Q()
+    for parameter in PARAMETERS:
+        low = getattr(equipment_type, f'min_{parameter}')
+        high = getattr(equipment_type, f'max_{parameter}')
+        width = high - low
+        offset = (band - margin) * width
+        outside |= Q(**{f'{parameter}__lt': low - offset})
+        outside |= Q(**{f'{parameter}__gt': high + offset})
+    return outside
+
+
+def status_expression(equipment_type):
+    """The status rules for equipment of ``equipment_type`` as a SQL CASE on the current status."""
+    band = equipment_type.critical_band
+    deadband = equipment_type.hysteresis
+    return Case(
+        When(is_active=False, then=Value('offline')),
+        When(_outside(equipment_type, band, 0), then=Value('critical')),
+        When(Q(status='critical') & _outside(equipment_type, band, deadband), then=Value('critical')),
+        When(_outside(equipment_type, 0, 0), then=Value('warning')),
+        When(
+            Q(status__in=['warning', 'critical']) & _outside(equipment_type, 0, deadband),
+            then=Value('warning')
+        ),
+        default=Value('normal'),
+    )
+
+
+def recompute_type_status(equipment_type):
+    """
+    Re-evaluate the equipment of one type with a single UPDATE.
+
+    Only rows whose status actually changes are written, with their
+    ``updated_at`` stamped; returns how many.
+    """
+    from .rollup import rebuild_rollup
+
+    expression = status_expression(equipment_type)
+    changed = Equipment.objects.filter(
+        equipment_type=equipment_type
+    ).exclude(status=expression).update(status=expression, updated_at=timezone.now())
+    if changed:
+        rebuild_rollup(type_ids=[equipment_type.id])
+        invalidate_dashboard()
+    return changed
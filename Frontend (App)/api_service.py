@@ -9,16 +9,22 @@ Key fixes:
 """
 import requests
 import json
+import time
+from contextlib import ExitStack
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
 
 class ApiService:
+    # Bytes of a CSV sent for an upload preview
+    PREVIEW_HEAD_BYTES = 1024 * 1024
+    
     def __init__(self, base_url: str = 'http://localhost:8000/api', debug: bool = True):
         self.base_url = base_url
         self.access_token: Optional[str] = None
         self.refresh_token: Optional[str] = None
         self._token_refresh_in_progress = False
+        self._upload_sessions: Dict[tuple, str] = {}
         self.debug = debug
         
         if self.debug:
@@ -319,12 +325,35 @@ class ApiService:
         """Resolve an alert"""
         return self.fetch_with_auth(f'/alerts/{alert_id}/resolve/', method='POST')
     
+    def bulk_acknowledge_alerts(self, ids: Optional[List[int]] = None,
+                                filters: Optional[Dict] = None) -> Dict:
+        """Acknowledge alerts by id and/or filter (equipment, severity, created_after, created_before)"""
+        data = dict(filters or {})
+        if ids is not None:
+            data['ids'] = list(ids)
+        return self.fetch_with_auth('/alerts/bulk_acknowledge/', method='POST', data=data)
+    
+    def bulk_resolve_alerts(self, ids: Optional[List[int]] = None,
+                            filters: Optional[Dict] = None,
+                            resolution_notes: str = '') -> Dict:
+        """Resolve alerts by id and/or filter (equipment, severity, created_after, created_before)"""
+        data = dict(filters or {})
+        if ids is not None:
+            data['ids'] = list(ids)
+        if resolution_notes:
+            data['resolution_notes'] = resolution_notes
+        return self.fetch_with_auth('/alerts/bulk_resolve/', method='POST', data=data)
+    
     # ==================== DASHBOARD ENDPOINTS ====================
     
     def get_dashboard_stats(self, params: Optional[Dict] = None) -> Dict:
         """Get dashboard statistics"""
         return self.fetch_with_auth('/dashboard/stats/', params=params)
     
+    def get_dashboard_cache_stats(self) -> Dict:
+        """Get hit and miss counters of the dashboard statistics cache"""
+        return self.fetch_with_auth('/dashboard/stats/cache/')
+    
     def get_dashboard_overview(self, params: Optional[Dict] = None) -> Dict:
         """Get dashboard overview"""
         return self.fetch_with_auth('/dashboard/overview/', params=params)
@@ -333,7 +362,21 @@ class ApiService:
     
     def get_charts(self, params: Optional[Dict] = None) -> Dict:
         """Get chart data"""
-        return self.fetch_with_auth('/charts/', params=params)
+        # The endpoint returns the image itself unless JSON is asked for
+        return self.fetch_with_auth('/charts/', params={'format': 'json', **(params or {})})
+    
+    def get_chart_image(self, params: Optional[Dict] = None, image_format: str = 'png') -> bytes:
+        """Get a chart as PNG or SVG bytes"""
+        response = self.fetch_with_auth('/charts/', params={**(params or {}), 'format': image_format})
+        return response.content
+    
+    def get_chart_series(self, chart_type: str, params: Optional[Dict] = None) -> Dict:
+        """Get the data behind a chart as parallel arrays, for drawing it locally"""
+        return self.fetch_with_auth(f'/charts/series/{chart_type}/', params=params)
+    
+    def get_chart_cache_stats(self) -> Dict:
+        """Get hit, miss and eviction counters of the chart cache"""
+        return self.fetch_with_auth('/charts/cache/')
     
     def get_equipment_chart_data(self, params: Optional[Dict] = None) -> Dict:
         """Get equipment chart data"""
@@ -376,13 +419,188 @@ class ApiService:
             
             return response.json()
     
+    def upload_files(self, file_paths: List[str], sheets: str = '') -> Dict:
+        """Upload several files (or zip archives) as one batch"""
+        with ExitStack() as stack:
+            files = [
+                ('files', (Path(path).name, stack.enter_context(open(path, 'rb'))))
+                for path in file_paths
+            ]
+            
+            headers = {}
+            if self.access_token:
+                headers['Authorization'] = f'Bearer {self.access_token}'
+            
+            response = requests.post(
+                f"{self.base_url}/upload/batch/",
+                files=files,
+                data={'sheets': sheets},
+                headers=headers,
+                timeout=300
+            )
+            
+            if not response.ok:
+                try:
+                    error = response.json()
+                except ValueError:
+                    raise Exception('Batch upload failed')
+                raise Exception(error.get('error', error.get('detail', 'Batch upload failed')))
+            
+            return response.json()
+    
+    def get_upload_batch(self, batch_id: str) -> Dict:
+        """Get aggregate progress of a batch upload"""
+        return self.fetch_with_auth(f'/upload/batch/{batch_id}/')
+    
+    def preview_upload(self, file_path: str, sample_size: int = 1000, sheets: str = '') -> Dict:
+        """Dry run: map and validate a sample of rows without importing anything"""
+        path = Path(file_path)
+        with open(path, 'rb') as f:
+            # Only the head of a CSV is needed; the server extrapolates from the size
+            content = f.read(self.PREVIEW_HEAD_BYTES) if path.suffix.lower() == '.csv' else f.read()
+        
+        headers = {}
+        if self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        
+        response = requests.post(
+            f"{self.base_url}/upload/preview/",
+            files={'file': (path.name, content)},
+            data={'file_size': path.stat().st_size, 'sample_size': sample_size, 'sheets': sheets},
+            headers=headers,
+            timeout=60
+        )
+        
+        if not response.ok:
+            try:
+                error = response.json()
+            except ValueError:
+                raise Exception('Preview failed')
+            raise Exception(error.get('error', error.get('detail', 'Preview failed')))
+        
+        return response.json()
+    
+    def start_upload_session(self, file_name: str, file_size: int, sheets: str = '') -> Dict:
+        """Open a resumable chunked upload"""
+        return self.fetch_with_auth('/upload/sessions/', method='POST',
+                                    data={'file_name': file_name, 'file_size': file_size, 'sheets': sheets})
+    
+    def get_upload_session(self, session_id: str) -> Dict:
+        """Get the confirmed offset of a chunked upload"""
+        return self.fetch_with_auth(f'/upload/sessions/{session_id}/')
+    
+    def _confirmed_offset(self, session_id: str) -> int:
+        """Confirmed offset of a chunked upload; lets requests' connection errors through"""
+        headers = {}
+        if self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        
+        response = requests.get(
+            f"{self.base_url}/upload/sessions/{session_id}/",
+            headers=headers,
+            timeout=30
+        )
+        
+        if response.status_code == 401 and self.refresh_token:
+            self.refresh_access_token()
+            return self._confirmed_offset(session_id)
+        if not response.ok:
+            raise Exception(f'Upload session lookup failed: HTTP {response.status_code}')
+        return response.json()['offset']
+    
+    def upload_chunk(self, session_id: str, offset: int, chunk: bytes) -> Dict:
+        """Send one chunk; returns the new confirmed offset (409 means resync)"""
+        headers = {
+            'Content-Type': 'application/octet-stream',
+            'Upload-Offset': str(offset),
+        }
+        if self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        
+        response = requests.put(
+            f"{self.base_url}/upload/sessions/{session_id}/chunk/",
+            data=chunk,
+            headers=headers,
+            timeout=60
+        )
+        
+        if response.status_code == 401 and self.refresh_token:
+            self.refresh_access_token()
+            return self.upload_chunk(session_id, offset, chunk)
+        if response.status_code == 409:
+            return response.json()
+        if not response.ok:
+            raise Exception(f'Chunk upload failed: HTTP {response.status_code}')
+        return response.json()
+    
+    def finalize_upload_session(self, session_id: str, force: bool = False) -> Dict:
+        """Finish a chunked upload and queue it for processing"""
+        return self.fetch_with_auth(f'/upload/sessions/{session_id}/finalize/', method='POST',
+                                    data={'force': force})
+    
+    def upload_file_resumable(self, file_path: str, sheets: str = '',
+                              progress_callback=None, max_retries: int = 5) -> Dict:
+        """
+        Upload a file in chunks, resuming from the server's confirmed offset
+        after dropped connections. Retrying the same unchanged file later in
+        this session continues the earlier upload instead of starting over.
+        progress_callback(sent_bytes, total_bytes) is called after each chunk.
+        """
+        path = Path(file_path)
+        stat = path.stat()
+        key = (str(path.resolve()), stat.st_size, stat.st_mtime)
+        
+        session = None
+        session_id = self._upload_sessions.get(key)
+        if session_id:
+            try:
+                session = self.get_upload_session(session_id)
+            except Exception:
+                session = None
+        if session is None or session.get('upload_id'):
+            session = self.start_upload_session(path.name, stat.st_size, sheets)
+            session_id = session['session_id']
+            self._upload_sessions[key] = session_id
+        
+        offset = session['offset']
+        chunk_size = session['chunk_size']
+        retries = 0
+        resync = False
+        
+        with open(path, 'rb') as f:
+            while offset < stat.st_size:
+                try:
+                    # After a dropped connection, ask where to resume; the
+                    # lookup can fail the same way and is retried alike
+                    if resync:
+                        offset = self._confirmed_offset(session_id)
+                        resync = False
+                        continue
+                    f.seek(offset)
+                    chunk = f.read(chunk_size)
+                    offset = self.upload_chunk(session_id, offset, chunk)['offset']
+                    retries = 0
+                except (requests.ConnectionError, requests.Timeout):
+                    retries += 1
+                    if retries > max_retries:
+                        raise Exception("Upload interrupted; retry to resume from the last confirmed chunk")
+                    time.sleep(min(2 ** retries, 30))
+                    resync = True
+                    continue
+                if progress_callback:
+                    progress_callback(offset, stat.st_size)
+        
+        result = self.finalize_upload_session(session_id)
+        self._upload_sessions.pop(key, None)
+        return result
+    
     def upload_csv(self, file_path: str) -> Dict:
         """Upload CSV file"""
         return self.upload_file(file_path, {'file_type': 'csv'})
     
-    def upload_excel(self, file_path: str) -> Dict:
-        """Upload Excel file"""
-        return self.upload_file(file_path, {'file_type': 'excel'})
+    def upload_excel(self, file_path: str, sheets: str = '') -> Dict:
+        """Upload Excel file (sheets: comma separated names, '*' for all, '' for the first)"""
+        return self.upload_file(file_path, {'file_type': 'excel', 'sheets': sheets})
     
     def export_data(self, filters: Optional[Dict] = None, format: str = 'csv') -> bytes:
         """Export data"""
@@ -406,6 +624,10 @@ class ApiService:
         """Get specific upload"""
         return self.fetch_with_auth(f'/uploads/{upload_id}/')
     
+    def get_upload_progress(self, upload_id: int) -> Dict:
+        """Get processing progress of a queued upload"""
+        return self.fetch_with_auth(f'/uploads/{upload_id}/progress/')
+    
     def delete_upload(self, upload_id: int):
         """Delete upload"""
         return self.fetch_with_auth(f'/uploads/{upload_id}/', method='DELETE')
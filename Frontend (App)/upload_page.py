@@ -12,31 +12,76 @@ from datetime import datetime
 
 
 class UploadThread(QThread):
-    """Thread for uploading files"""
+    """Thread for uploading files and following their processing progress"""
     upload_complete = pyqtSignal(dict)
     upload_failed = pyqtSignal(str)
     progress_updated = pyqtSignal(int)
     
+    POLL_INTERVAL_MS = 500
+    
     def __init__(self, file_path: str):
         super().__init__()
         self.file_path = file_path
     
     def run(self):
         try:
-            # Simulate progress updates
-            for i in range(0, 100, 10):
-                self.progress_updated.emit(i)
-                self.msleep(100)
+            self.progress_updated.emit(0)
+            
+            # Send the file in resumable chunks: bytes sent drive the first half
+            # of the bar, server-side processing the second half
+            def on_bytes_sent(sent: int, total: int):
+                self.progress_updated.emit(int(sent * 50 / total))
             
-            # Determine file type
-            ext = Path(self.file_path).suffix.lower()
-            if ext == '.csv':
-                result = api_service.upload_csv(self.file_path)
-            elif ext in ['.xls', '.xlsx']:
-                result = api_service.upload_excel(self.file_path)
-            else:
-                result = api_service.upload_file(self.file_path)
+            result = api_service.upload_file_resumable(
+                self.file_path, progress_callback=on_bytes_sent
+            )
             
+            # The server processes the file in the background; poll until done.
+            # Identical files are not reprocessed: the earlier upload is returned.
+            duplicate = result.get('duplicate', False)
+            upload_id = result.get('upload_id')
+            while upload_id is not None:
+                result = api_service.get_upload_progress(upload_id)
+                self.progress_updated.emit(50 + result.get('progress', 0) // 2)
+                if result.get('status') in ('completed', 'failed'):
+                    break
+                self.msleep(self.POLL_INTERVAL_MS)
+            
+            result['duplicate'] = duplicate
+            self.progress_updated.emit(100)
+            self.upload_complete.emit(result)
+            
+        except Exception as e:
+            self.upload_failed.emit(str(e))
+
+
+class BatchUploadThread(QThread):
+    """Thread for uploading several files as one batch and following its progress"""
+    upload_complete = pyqtSignal(dict)
+    upload_failed = pyqtSignal(str)
+    progress_updated = pyqtSignal(int)
+    
+    POLL_INTERVAL_MS = 500
+    
+    def __init__(self, file_paths: list):
+        super().__init__()
+        self.file_paths = file_paths
+    
+    def run(self):
+        try:
+            self.progress_updated.emit(0)
+            result = api_service.upload_files(self.file_paths)
+            self.progress_updated.emit(50)
+            
+            # Files are parsed in parallel on the server; poll the batch summary
+            duplicates = result.get('duplicates', [])
+            while result.get('files') and result.get('status') == 'processing':
+                self.msleep(self.POLL_INTERVAL_MS)
+                result = api_service.get_upload_batch(result['batch_id'])
+                self.progress_updated.emit(50 + result.get('progress', 0) // 2)
+            
+            result['duplicates'] = duplicates
+            result['duplicate'] = bool(duplicates) and not result.get('files')
             self.progress_updated.emit(100)
             self.upload_complete.emit(result)
             
@@ -345,19 +390,23 @@ class UploadPage(QWidget):
         self.dropzone.style().polish(self.dropzone)
         
         files = [u.toLocalFile() for u in event.mimeData().urls()]
-        if files:
+        if len(files) > 1:
+            self.handle_batch_upload(files)
+        elif files:
             self.handle_file_upload(files[0])
     
     def browse_files(self):
-        file_path, _ = QFileDialog.getOpenFileName(
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "Select File to Upload",
+            "Select Files to Upload",
             "",
-            "Data Files (*.csv *.xls *.xlsx);;All Files (*.*)"
+            "Data Files (*.csv *.xls *.xlsx *.zip);;All Files (*.*)"
         )
         
-        if file_path:
-            self.handle_file_upload(file_path)
+        if len(file_paths) > 1 or (file_paths and file_paths[0].lower().endswith('.zip')):
+            self.handle_batch_upload(file_paths)
+        elif file_paths:
+            self.handle_file_upload(file_paths[0])
     
     def handle_file_upload(self, file_path: str):
         # Validate file
@@ -388,6 +437,33 @@ class UploadPage(QWidget):
         self.upload_thread.upload_failed.connect(self.on_upload_failed)
         self.upload_thread.start()
     
+    def handle_batch_upload(self, file_paths: list):
+        # Validate files
+        valid_extensions = ['.csv', '.xls', '.xlsx', '.zip']
+        invalid = [Path(p).name for p in file_paths if Path(p).suffix.lower() not in valid_extensions]
+        if invalid:
+            self.show_message(f"Invalid file type: {', '.join(invalid)}. Please upload CSV, Excel or ZIP files.", "error")
+            return
+        
+        # Check total size (200MB)
+        if sum(Path(p).stat().st_size for p in file_paths) > 200 * 1024 * 1024:
+            self.show_message("Files exceed the 200MB batch limit.", "error")
+            return
+        
+        # Start upload
+        self.uploading = True
+        self.dropzone_title.setText(f"Uploading {len(file_paths)} files...")
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.browse_btn.setEnabled(False)
+        self.message_label.hide()
+        
+        self.upload_thread = BatchUploadThread(file_paths)
+        self.upload_thread.progress_updated.connect(self.on_progress_updated)
+        self.upload_thread.upload_complete.connect(self.on_upload_complete)
+        self.upload_thread.upload_failed.connect(self.on_upload_failed)
+        self.upload_thread.start()
+    
     def on_progress_updated(self, value: int):
         self.progress_bar.setValue(value)
     
@@ -400,7 +476,17 @@ class UploadPage(QWidget):
         success = result.get('records_success', 0)
         failed = result.get('records_failed', 0)
         
-        if success > 0:
+        if result.get('duplicate') and 'batch_id' in result:
+            self.show_message("ℹ️ These files were already uploaded.", "success")
+        elif result.get('duplicate'):
+            message = f"ℹ️ This file was already uploaded: {success} records imported earlier. ({failed} skipped)"
+            self.show_message(message, "success")
+        elif 'batch_id' in result:
+            message = f"✅ Imported {success} records from {result.get('files', 0)} files. ({failed} skipped)"
+            if result.get('duplicates'):
+                message += f" {len(result['duplicates'])} already uploaded."
+            self.show_message(message, "warning" if result.get('failed') else "success")
+        elif success > 0:
             message = f"✅ Success! Imported {success} records. ({failed} skipped)"
             self.show_message(message, "success")
         elif failed > 0:
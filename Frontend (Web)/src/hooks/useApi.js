@@ -268,6 +268,8 @@ export const useAuth = () => {
 
 // ==================== FILE UPLOAD HOOK ====================
 
+const UPLOAD_POLL_INTERVAL = 500;
+
 export const useFileUpload = () => {
   const [uploading, setUploading] = useState(false);
   const [progress, setProgress] = useState(0);
@@ -279,17 +281,23 @@ export const useFileUpload = () => {
       setError(null);
       setProgress(0);
 
-      // Simulate progress (in real implementation, use XMLHttpRequest for progress)
-      const interval = setInterval(() => {
-        setProgress((prev) => Math.min(prev + 10, 90));
-      }, 200);
+      let result = await apiService.uploadFile(file, metadata);
+
+      // The server processes the file in the background; poll until done.
+      // Identical files are not reprocessed: the earlier upload is returned.
+      const duplicate = Boolean(result.duplicate);
+      while (result.upload_id != null) {
+        result = await apiService.getUploadProgress(result.upload_id);
+        setProgress(result.progress ?? 0);
+        if (result.status === 'completed' || result.status === 'failed') {
+          break;
+        }
+        await new Promise((resolve) => setTimeout(resolve, UPLOAD_POLL_INTERVAL));
+      }
 
-      const result = await apiService.uploadFile(file, metadata);
-      
-      clearInterval(interval);
       setProgress(100);
       
-      return result;
+      return { ...result, duplicate };
     } catch (err) {
       setError(err.message);
       throw err;
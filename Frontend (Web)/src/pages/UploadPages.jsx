@@ -57,7 +57,9 @@ const UploadPage = ({ isDarkMode }) => {
       }
 
       const result = await uploadFile(file, { file_type: fileExtension });
-      if (result.records_success > 0) {
+      if (result.duplicate) {
+        setUploadMessage(`This file was already uploaded: ${result.records_success} records imported earlier. (${result.records_failed} skipped)`);
+    } else if (result.records_success > 0) {
         setUploadMessage(`Success! Imported ${result.records_success} records. (${result.records_failed} skipped)`);
     } else if (result.records_failed > 0) {
         setUploadMessage(`Warning: File uploaded but all ${result.records_failed} records failed to import.`);
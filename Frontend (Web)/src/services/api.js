@@ -1,6 +1,9 @@
 // API Service - Centralized API calls with authentication and error handling
 const API_BASE_URL = 'http://localhost:8000/api';
 
+// Bytes of a CSV sent for an upload preview
+const PREVIEW_HEAD_BYTES = 1024 * 1024;
+
 class ApiService {
   constructor() {
     this.baseURL = API_BASE_URL;
@@ -110,6 +113,10 @@ class ApiService {
       throw new Error(error.detail || error.message || `HTTP error! status: ${response.status}`);
     }
 
+    if (options.blob) {
+      return response.blob();
+    }
+
     // Handle empty responses (like 204 No Content)
     const contentType = response.headers.get('content-type');
     if (contentType && contentType.includes('application/json')) {
@@ -348,6 +355,20 @@ class ApiService {
     });
   }
 
+  async bulkAcknowledgeAlerts({ ids, ...filters } = {}) {
+    return this.fetchWithAuth('/alerts/bulk_acknowledge/', {
+      method: 'POST',
+      body: JSON.stringify(ids ? { ids, ...filters } : filters),
+    });
+  }
+
+  async bulkResolveAlerts({ ids, ...filters } = {}) {
+    return this.fetchWithAuth('/alerts/bulk_resolve/', {
+      method: 'POST',
+      body: JSON.stringify(ids ? { ids, ...filters } : filters),
+    });
+  }
+
   async deleteAlert(id) {
     return this.fetchWithAuth(`/alerts/${id}/`, {
       method: 'DELETE',
@@ -375,10 +396,27 @@ class ApiService {
   // ==================== CHARTS ENDPOINTS ====================
   
   async getCharts(params = {}) {
+    // The endpoint returns the image itself unless JSON is asked for
+    const queryParams = new URLSearchParams(
+      Object.entries({ format: 'json', ...params }).filter(([_, v]) => v != null)
+    ).toString();
+    return this.fetchWithAuth(`/charts/?${queryParams}`);
+  }
+
+  // Chart as a PNG or SVG Blob, e.g. for URL.createObjectURL
+  async getChartImage(params = {}, format = 'png') {
+    const queryParams = new URLSearchParams(
+      Object.entries({ ...params, format }).filter(([_, v]) => v != null)
+    ).toString();
+    return this.fetchWithAuth(`/charts/?${queryParams}`, { blob: true });
+  }
+
+  // Data behind a chart as parallel arrays, for drawing it client-side
+  async getChartSeries(type, params = {}) {
     const queryParams = new URLSearchParams(
       Object.entries(params).filter(([_, v]) => v != null)
     ).toString();
-    const endpoint = queryParams ? `/charts/?${queryParams}` : '/charts/';
+    const endpoint = queryParams ? `/charts/series/${type}/?${queryParams}` : `/charts/series/${type}/`;
     return this.fetchWithAuth(endpoint);
   }
 
@@ -438,8 +476,36 @@ class ApiService {
     return this.uploadFile(file, { file_type: 'csv' });
   }
 
-  async uploadExcel(file) {
-    return this.uploadFile(file, { file_type: 'excel' });
+  // sheets: comma separated sheet names, '*' for all, '' for the first sheet
+  async uploadExcel(file, sheets = '') {
+    return this.uploadFile(file, { file_type: 'excel', sheets });
+  }
+
+  // Dry run: map and validate a sample of rows without importing anything.
+  // Only the head of a CSV is sent; the server extrapolates from its size.
+  async previewUpload(file, sampleSize = 1000, sheets = '') {
+    const isCsv = file.name.toLowerCase().endsWith('.csv');
+    const formData = new FormData();
+    formData.append('file', isCsv ? file.slice(0, PREVIEW_HEAD_BYTES) : file, file.name);
+    formData.append('file_size', file.size);
+    formData.append('sample_size', sampleSize);
+    formData.append('sheets', sheets);
+
+    const token = this.getToken();
+    const response = await fetch(`${this.baseURL}/upload/preview/`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+      body: formData,
+    });
+
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ error: 'Preview failed' }));
+      throw new Error(error.error || error.detail || 'Preview failed');
+    }
+
+    return response.json();
   }
 
   async exportData(filters = {}, format = 'csv') {
@@ -498,6 +564,10 @@ class ApiService {
     return this.fetchWithAuth(`/uploads/${id}/`);
   }
 
+  async getUploadProgress(id) {
+    return this.fetchWithAuth(`/uploads/${id}/progress/`);
+  }
+
   async deleteUpload(id) {
     return this.fetchWithAuth(`/uploads/${id}/`, {
       method: 'DELETE',